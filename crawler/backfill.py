@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+import os
+import gzip
+import json
+import time
+import zlib
+import hashlib
+import argparse
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pymysql
+from w3lib.encoding import html_to_unicode
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+import neardup
+from chunker import CHUNK_DUPLICATE
+from extract import ExtractPool
+from sources import (
+    BAD_URL_SUBSTRINGS,
+    DEFAULT_EXTRACT,
+    LRT_BASE_URL,
+    LRT_EXTRACT_RULES,
+    LRT_SCOPES,
+    Source,
+    UrlMatcher,
+    canonicalize_url,
+    load_sources,
+)
+
+# pymysql executemany sujungia INSERT ... VALUES (%s, ...) į vieną multi-row užklausą iki tiek baitų
+# (turi tilpti į serverio max_allowed_packet, MariaDB default 16MB)
+MAX_STMT_BYTES = 4 * 1024 * 1024
+MAX_BODY_CHARS = 200_000
+
+
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+        autocommit=False,
+    )
+
+
+def md5(s: str) -> bytes:
+    # == UNHEX(MD5(s)) MariaDB pusėje (utf8mb4 baitai)
+    return hashlib.md5(s.encode("utf-8")).digest()
+
+
+# -----------------------------
+# Archive readers
+# -----------------------------
+@dataclass
+class ArchivedPage:
+    url: str
+    status: int
+    content_type: str
+    html: str
+
+
+def _open(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _dechunk(body: bytes) -> bytes:
+    out, pos = [], 0
+    while pos < len(body):
+        eol = body.find(b"\r\n", pos)
+        if eol < 0:
+            break
+        size = int(body[pos:eol].split(b";")[0] or b"0", 16)
+        if size == 0:
+            break
+        out.append(body[eol + 2: eol + 2 + size])
+        pos = eol + 2 + size + 2
+    return b"".join(out)
+
+
+def parse_http_response(block: bytes) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    WARC response blokas (HTTP statusas + antraštės + body) -> (status, headers lowercase, dekoduotas body).
+    """
+    head, _, body = block.partition(b"\r\n\r\n")
+    lines = head.decode("iso-8859-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    status = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        k, sep, v = line.partition(":")
+        if sep:
+            headers[k.strip().lower()] = v.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = _dechunk(body)
+    encoding = headers.get("content-encoding", "").lower()
+    try:
+        if encoding in ("gzip", "x-gzip"):
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+    except zlib.error:
+        body = b""
+    return status, headers, body
+
+
+def iter_warc(path: str) -> Iterator[Optional[ArchivedPage]]:
+    """
+    WARC(.gz) -> ArchivedPage kiekvienam 'response' įrašui; kiti įrašai (request, metadata, ...) -> None,
+    kad checkpoint'o įrašų skaičius sutaptų su faile esančiais įrašais.
+    """
+    with _open(path) as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            if not line.startswith(b"WARC/"):
+                raise ValueError(f"{path}: expected WARC record header, got {line[:40]!r}")
+            headers: Dict[str, str] = {}
+            while True:
+                line = f.readline()
+                if not line or not line.strip():
+                    break
+                k, _, v = line.decode("utf-8", "replace").partition(":")
+                headers[k.strip().lower()] = v.strip()
+            block = f.read(int(headers.get("content-length", "0")))
+
+            if headers.get("warc-type") != "response":
+                yield None
+                continue
+            status, http_headers, body = parse_http_response(block)
+            content_type = http_headers.get("content-type", "")
+            _, html = html_to_unicode(content_type, body)
+            yield ArchivedPage(headers.get("warc-target-uri", "").strip("<>"), status, content_type, html)
+
+
+def iter_jsonl(path: str) -> Iterator[Optional[ArchivedPage]]:
+    """
+    JSONL(.gz): {"url": ..., "html" | "body": ..., "status"?: 200, "content_type"?: ...}
+    """
+    with _open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                yield None
+                continue
+            obj = json.loads(line)
+            html = obj.get("html") if obj.get("html") is not None else obj.get("body")
+            if not obj.get("url") or html is None:
+                yield None
+                continue
+            yield ArchivedPage(obj["url"], int(obj.get("status") or 200), obj.get("content_type") or "text/html", html)
+
+
+def iter_records(path: str) -> Iterator[Optional[ArchivedPage]]:
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith((".warc", ".arc")):
+        return iter_warc(path)
+    if name.endswith((".jsonl", ".json", ".ndjson")):
+        return iter_jsonl(path)
+    raise ValueError(f"Unknown archive format: {path} (expected .warc[.gz] or .jsonl[.gz])")
+
+
+# -----------------------------
+# Checkpoint
+# -----------------------------
+class Checkpoint:
+    """
+    JSON failas: kiek įrašų kiekviename archyve jau įrašyta į DB (po commit). Rašomas atomiškai.
+    Nutrūkus tarp commit ir checkpoint'o paketas importuojamas dar kartą: urls / articles – INSERT IGNORE,
+    pasikartoja tik fetches eilutės.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state: Dict[str, Any] = {"files": {}, "totals": {}}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def file(self, archive: str) -> Dict[str, Any]:
+        return self.state["files"].setdefault(os.path.abspath(archive), {"records": 0, "done": False})
+
+    def advance(self, archive: str, records: int, stats: Dict[str, int], done: bool = False) -> None:
+        entry = self.file(archive)
+        entry["records"] += records
+        entry["done"] = done
+        totals = self.state["totals"]
+        for k, v in stats.items():
+            totals[k] = totals.get(k, 0) + v
+        self.save()
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+# -----------------------------
+# Batch preparation
+# -----------------------------
+@dataclass
+class Page:
+    url: str            # kanoninis
+    final_url: str
+    source: Source
+    scope: str
+    url_hash: bytes
+    status: int
+    content_type: str
+    html: str
+
+
+def prepare_batch(records: Iterable[Optional[ArchivedPage]], matcher: UrlMatcher, stats: Dict[str, int]) -> List[Page]:
+    """
+    Filtrai be DB: tik 200 HTML, tik šaltinių scope; URL dublikatai paketo viduje – per hash set'ą
+    (tarp paketų ir su jau esamomis eilutėmis – unique raktai + INSERT IGNORE).
+    """
+    pages: List[Page] = []
+    seen = set()
+    for rec in records:
+        if rec is None:
+            continue
+        stats["records"] += 1
+        if rec.status != 200 or "html" not in (rec.content_type or "text/html").lower():
+            stats["skipped_non_html"] += 1
+            continue
+        url = canonicalize_url(rec.url)
+        hit = matcher.match(url)
+        if hit is None:
+            stats["skipped_off_scope"] += 1
+            continue
+        h = md5(url)
+        if h in seen:
+            stats["skipped_dup_urls"] += 1
+            continue
+        seen.add(h)
+        src, scope = hit
+        pages.append(Page(url, rec.url, src, scope, h, rec.status, rec.content_type, rec.html))
+    return pages
+
+
+# -----------------------------
+# Bulk writes
+# -----------------------------
+def _in_chunks(values: List[Any], size: int = 1000) -> Iterator[List[Any]]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def select_ids(cur, sql: str, keys: List[Any]) -> List[Tuple]:
+    out: List[Tuple] = []
+    for part in _in_chunks(keys):
+        cur.execute(sql.format(keys=", ".join(["%s"] * len(part))), part)
+        out.extend(cur.fetchall())
+    return out
+
+
+def write_batch(conn, pages: List[Page], results: List[Dict[str, Any]], store_body: bool, enqueue_links: bool) -> Dict[str, int]:
+    """
+    Vienas paketas = viena transakcija: urls -> (id lookup per paketą) -> fetches -> near-dup klasifikacija
+    -> articles -> simhash juostos -> paketo vidaus dublikatai.
+    Visi INSERT'ai tik su %s placeholder'iais, todėl pymysql executemany siunčia juos multi-row.
+    """
+    stats = {"articles": 0, "skipped_dup_articles": 0, "near_duplicates": 0, "links": 0}
+    if not pages:
+        return stats
+
+    with conn.cursor() as cur:
+        cur.max_stmt_length = MAX_STMT_BYTES
+
+        # 1) urls: archyvo puslapis jau turimas -> 'fetched'; live spider'io entrypoint'ai (priority >= 10) nekeičiami
+        cur.executemany(
+            """
+            INSERT INTO urls (source_id, url, url_hash, status, priority, scope)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE status = IF(status = 'queued' AND priority < 10, 'fetched', status)
+            """,
+            [(p.source.id, p.url, p.url_hash, "fetched", 0, p.scope) for p in pages],
+        )
+        url_ids = {bytes(h): int(i) for i, h in select_ids(cur, "SELECT id, url_hash FROM urls WHERE url_hash IN ({keys})", [p.url_hash for p in pages])}
+
+        # 2) fetches (body tik su --store-body: istorijai jo nereikia, o milijonams puslapių – šimtai GB)
+        cur.executemany(
+            """
+            INSERT INTO fetches (url_id, http_status, content_type, final_url, body)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            [
+                (url_ids[p.url_hash], p.status, p.content_type[:255], p.final_url, p.html[:MAX_BODY_CHARS] if store_body else None)
+                for p in pages
+            ],
+        )
+
+        # 3) articles: tekstų dublikatai paketo viduje – per hash set'ą, kiti – uq_articles_text_hash
+        pending = []
+        seen = set()
+        for p, r in zip(pages, results):
+            a = r["article"]
+            if a is None:
+                continue
+            th = md5(a["text"])
+            if th in seen:
+                stats["skipped_dup_articles"] += 1
+                continue
+            seen.add(th)
+            pending.append((p, a, th))
+
+        # near-duplicate (SimHash + LSH) kaip spider'yje (neardup.classify), tik visam paketui:
+        # perpublikuotos kopijos susiejamos su originalu ir nekapojamos / neembedinamos
+        classes = neardup.classify_batch(conn, [a.get("simhash") for _, a, _ in pending])
+        rows, batch_dups, hashes = [], [], {}
+        for (p, a, th), (duplicate_of, batch_original) in zip(pending, classes):
+            url_id = url_ids[p.url_hash]
+            row = [
+                p.source.id, url_id, p.url, a["title"], a["published_at"], (a["author"] or "")[:255] or None,
+                a["text"], th, a.get("simhash"), duplicate_of, CHUNK_DUPLICATE if duplicate_of is not None else 0,
+            ]
+            if batch_original is not None:
+                # originalas tame pačiame pakete: duplicate_of žinomas tik po jo INSERT'o
+                row[-1] = CHUNK_DUPLICATE
+                batch_dups.append((row, pending[batch_original][2]))
+                continue
+            # LSH juostos tik originalams (kaip spider'yje)
+            hashes[th] = (url_id, a.get("simhash") if duplicate_of is None else None)
+            rows.append(tuple(row))
+        stats["near_duplicates"] = sum(1 for d, b in classes if d is not None or b is not None)
+
+        insert_sql = """
+            INSERT IGNORE INTO articles (source_id, url_id, canonical_url, title, published_at, author,
+                                         text, text_hash, simhash, duplicate_of, chunk_status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        if rows:
+            stats["articles"] = cur.executemany(insert_sql, rows)
+
+            # 4) LSH juostos tik ką įdėtiems originalams (url_id sutampa) – kad vėlesni straipsniai su jais lygintųsi
+            bands, article_ids = [], {}
+            for article_id, th, url_id in select_ids(cur, "SELECT id, text_hash, url_id FROM articles WHERE text_hash IN ({keys})", list(hashes)):
+                article_ids[bytes(th)] = int(article_id)
+                mine_url_id, h = hashes[bytes(th)]
+                if int(url_id) == mine_url_id and h is not None:
+                    bands += [(i, v, int(article_id)) for i, v in enumerate(neardup.bands(h))]
+            if bands:
+                cur.executemany(
+                    "INSERT IGNORE INTO article_simhash_bands (band, band_value, article_id) VALUES (%s, %s, %s)",
+                    bands,
+                )
+
+            # paketo vidaus dublikatai -> originalo id (jei jo tekstas jau buvo DB, – ta eilutė)
+            if batch_dups:
+                for row, original_th in batch_dups:
+                    row[9] = article_ids.get(original_th)
+                    if row[9] is None:
+                        row[10] = 0
+                stats["articles"] += cur.executemany(insert_sql, [tuple(row) for row, _ in batch_dups])
+
+        # 5) (pasirinktinai) rastos nuorodos -> live eilė
+        if enqueue_links:
+            links = {}
+            for p, r in zip(pages, results):
+                for u, source_id, scope in r["links"]:
+                    links.setdefault(md5(u), (source_id, u, md5(u), "queued", 0, url_ids[p.url_hash], scope))
+            if links:
+                stats["links"] = cur.executemany(
+                    """
+                    INSERT IGNORE INTO urls (source_id, url, url_hash, status, priority, discovered_from_url_id, scope)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    list(links.values()),
+                )
+    conn.commit()
+    return stats
+
+
+# -----------------------------
+# Import loop
+# -----------------------------
+def lrt_source() -> Source:
+    return Source(1, "LRT", "lrt.lt", LRT_BASE_URL, dict(LRT_SCOPES), list(BAD_URL_SUBSTRINGS), {**DEFAULT_EXTRACT, **LRT_EXTRACT_RULES})
+
+
+def import_archive(path: str, pool: ExtractPool, matcher: UrlMatcher, conn, checkpoint: Checkpoint, args) -> Dict[str, int]:
+    """
+    Paketas N ekstraktinamas worker'iuose, kol paketas N-1 rašomas į DB.
+    """
+    state = checkpoint.file(path)
+    if state["done"]:
+        print(f"[backfill] {path}: already done, skipping")
+        return {}
+    records = iter_records(path)
+    if state["records"]:
+        print(f"[backfill] {path}: resuming after {state['records']} records")
+        for _ in islice(records, state["records"]):
+            pass
+
+    totals: Dict[str, int] = {}
+    pending = None  # (pages, results iterator, consumed records, stats)
+
+    def flush(item) -> None:
+        pages, results, consumed, stats = item
+        results = list(results)
+        if conn is not None:
+            stats.update(write_batch(conn, pages, results, args.store_body, args.enqueue_links))
+        else:
+            stats["articles"] = sum(1 for r in results if r["article"] is not None)
+        checkpoint.advance(path, consumed, stats)
+        for k, v in stats.items():
+            totals[k] = totals.get(k, 0) + v
+        print(
+            f"[backfill] {os.path.basename(path)}: records={totals.get('records', 0)} pages={totals.get('pages', 0)} "
+            f"articles={totals.get('articles', 0)} pages_per_s={totals.get('pages', 0) / max(time.perf_counter() - t0, 1e-9):.0f}",
+            flush=True,
+        )
+
+    t0 = time.perf_counter()
+    while True:
+        chunk = list(islice(records, args.batch))
+        if not chunk:
+            break
+        stats = {"records": 0, "skipped_non_html": 0, "skipped_off_scope": 0, "skipped_dup_urls": 0}
+        pages = prepare_batch(chunk, matcher, stats)
+        stats["pages"] = len(pages)
+        results = pool.imap([(p.url, p.html, p.source.extract) for p in pages], chunksize=args.chunksize)
+        if pending is not None:
+            flush(pending)
+        pending = (pages, results, len(chunk), stats)
+    if pending is not None:
+        flush(pending)
+    checkpoint.advance(path, 0, {}, done=True)
+    return totals
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Offline backfill: import WARC / JSONL archives of saved pages into urls / fetches / articles.")
+    parser.add_argument("archives", nargs="+", help="WARC(.gz) arba JSONL(.gz) failai")
+    parser.add_argument("--sources", type=str, default="", help="Šaltiniai (name / domain, per kablelį); tuščia = visi enabled")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Ištraukimo procesų skaičius (default: CPU skaičius)")
+    parser.add_argument("--batch", type=int, default=2000, help="Archyvo įrašų per paketą / transakciją (default: 2000)")
+    parser.add_argument("--chunksize", type=int, default=16, help="Puslapių per IPC žinutę worker'iams (default: 16)")
+    parser.add_argument("--checkpoint", type=str, default="backfill.checkpoint.json", help="Progreso failas (tęsiama nuo jo); tuščia = be checkpoint'o")
+    parser.add_argument("--store-body", action="store_true", help="Rašyti HTML į fetches.body (default: tik metadata)")
+    parser.add_argument("--enqueue-links", action="store_true", help="Rastas nuorodas dėti į live eilę (default: ne)")
+    parser.add_argument("--dry-run", action="store_true", help="Tik skaityti + ištraukti (LRT taisyklės iš sources.py), be DB")
+    args = parser.parse_args()
+
+    conn = None
+    if args.dry_run:
+        sources = [lrt_source()]
+    else:
+        required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+        missing = [k for k in required_env if not os.environ.get(k)]
+        if missing:
+            raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+        conn = db_connect()
+        names = [n.strip() for n in args.sources.split(",") if n.strip()] or None
+        sources = load_sources(conn, names)
+        if not sources:
+            raise SystemExit("No sources (see sources.py list)")
+        with conn.cursor() as cur:
+            # tėvinės eilutės (urls) įrašomos toje pačioje transakcijoje pirmos -> FK patikra per eilutę nereikalinga
+            cur.execute("SET SESSION foreign_key_checks = 0")
+
+    matcher = UrlMatcher(sources)
+    checkpoint = Checkpoint("" if args.dry_run else args.checkpoint)
+    pool = ExtractPool(args.workers, sources, simhash=True)
+    print(f"[backfill] sources={', '.join(s.name for s in sources)} workers={args.workers} batch={args.batch}")
+
+    t0 = time.perf_counter()
+    totals: Dict[str, int] = {}
+    try:
+        for path in args.archives:
+            for k, v in import_archive(path, pool, matcher, conn, checkpoint, args).items():
+                totals[k] = totals.get(k, 0) + v
+    finally:
+        pool.close()
+        if conn is not None:
+            conn.close()
+
+    took = time.perf_counter() - t0
+    print(
+        "[backfill] done. " + " ".join(f"{k}={v}" for k, v in sorted(totals.items()))
+        + f" took={took:.1f}s pages_per_s={totals.get('pages', 0) / max(took, 1e-9):.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+import json
+import time
+import argparse
+from typing import Dict, List
+
+import numpy as np
+
+from search import db_connect, load_index, vector_search
+from search_index import SearchIndex, allocate_index, ensure_codes, finalize_index
+from snapshot import load_search_index
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+# -----------------------------
+# Corpus
+# -----------------------------
+def synthetic_index(n: int, dims: int, clusters: int, noise: float, seed: int, block: int = 100_000) -> SearchIndex:
+    """
+    Klasterizuoti, anizotropiški (bendra kryptis + klasterio centras + triukšmas) normalizuoti vektoriai –
+    panašiai kaip sakinių embeddingai, kurių cosine tarpusavyje visada > 0.
+    """
+    rng = np.random.default_rng(seed)
+    common = rng.standard_normal(dims).astype(np.float32)
+    centers = (rng.standard_normal((clusters, dims)) + 1.5 * common).astype(np.float32)
+    index = allocate_index(n, dims)
+    for start in range(0, n, block):
+        end = min(n, start + block)
+        v = centers[rng.integers(0, clusters, end - start)]
+        v += noise * rng.standard_normal((end - start, dims)).astype(np.float32)
+        v /= np.linalg.norm(v, axis=1, keepdims=True)
+        index.vectors[start:end] = v
+    ids = np.arange(n, dtype=np.int64)
+    index.embedding_ids[:] = ids
+    index.chunk_ids[:] = ids
+    index.article_ids[:] = ids
+    index.published_ts[:] = 0
+    index.source_ids[:] = 1
+    index.topic_ids[:] = 0
+    index.section_codes[:] = 0
+    return finalize_index(index, n, {"": 0})
+
+
+def sample_queries(index: SearchIndex, n: int, noise: float, seed: int) -> np.ndarray:
+    """
+    Užklausa = atsitiktinė korpuso eilutė + triukšmas (perfrazuotas tas pats turinys).
+    """
+    rng = np.random.default_rng(seed + 1)
+    rows = rng.integers(0, index.size, n)
+    q = np.asarray(index.vectors[rows], dtype=np.float32)
+    q = q + noise * rng.standard_normal(q.shape).astype(np.float32) / np.sqrt(index.dims)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def percentile_ms(samples: List[float], p: float) -> float:
+    return float(np.percentile(np.asarray(samples) * 1000.0, p)) if samples else 0.0
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Exact float32 vs binary (Hamming) coarse + float32 rerank: latency and recall@k.")
+    parser.add_argument("--n", type=int, default=1_000_000, help="Sintetinio korpuso dydis")
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=5000)
+    parser.add_argument("--noise", type=float, default=1.0, help="Klasterio triukšmas (sintetinis korpusas)")
+    parser.add_argument("--db", action="store_true", help="Vietoj sintetinio: embeddingai iš DB")
+    parser.add_argument("--model", type=str, default="intfloat/multilingual-e5-small")
+    parser.add_argument("--from-snapshot", type=str, default=None, help="Vietoj sintetinio: embeddingai iš snapshot.py katalogo (be DB)")
+    parser.add_argument("--limit", type=int, default=0, help="--db / --from-snapshot: kiek embeddingų užkrauti, 0 = visus")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--query-noise", type=float, default=1.0, help="Užklausos triukšmo norma (1.0 -> cos(užklausa, eilutė) ~ 0.7)")
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--candidates", type=str, default="100,200,300,500,1000", help="Coarse kandidatų skaičiai per kablelį")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.db:
+        conn = db_connect()
+        try:
+            index = load_index(conn, args.model, args.limit, verbose=False)
+        finally:
+            conn.close()
+        if index is None:
+            raise SystemExit("[bench] No embeddings found for this model.")
+        corpus = f"db(model={args.model})"
+    elif args.from_snapshot:
+        index = load_search_index(args.from_snapshot, args.model, args.limit, verbose=False)
+        if index is None:
+            raise SystemExit("[bench] No embeddings found for this model in snapshot.")
+        corpus = f"snapshot(dir={args.from_snapshot}, model={args.model})"
+    else:
+        index = synthetic_index(args.n, args.dims, args.clusters, args.noise, args.seed)
+        corpus = f"synthetic(n={args.n}, dims={args.dims}, clusters={args.clusters}, noise={args.noise})"
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    ensure_codes(index)
+    binarize_s = time.perf_counter() - t0
+
+    queries = sample_queries(index, args.queries, args.query_noise, args.seed)
+    k = args.topk
+
+    # tikslus etalonas + latency
+    exact_lat, truth = [], []
+    vector_search(index, queries[0], None, k)
+    for q in queries:
+        t0 = time.perf_counter()
+        rows, _ = vector_search(index, q, None, k)
+        exact_lat.append(time.perf_counter() - t0)
+        truth.append(set(rows.tolist()))
+    exact_p50 = percentile_ms(exact_lat, 50)
+
+    report: Dict[str, Dict[str, float]] = {
+        "exact": {
+            f"recall@{k}": 1.0,
+            "p50_ms": round(exact_p50, 3),
+            "p95_ms": round(percentile_ms(exact_lat, 95), 3),
+            "speedup": 1.0,
+        }
+    }
+    for c in [int(x) for x in args.candidates.split(",") if x.strip()]:
+        vector_search(index, queries[0], None, k, candidates=c)
+        lat, hits = [], 0
+        for q, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            rows, _ = vector_search(index, q, None, k, candidates=c)
+            lat.append(time.perf_counter() - t0)
+            hits += len(expected & set(rows.tolist()))
+        p50 = percentile_ms(lat, 50)
+        report[f"binary@{c}"] = {
+            f"recall@{k}": round(hits / (k * len(queries)), 4),
+            "p50_ms": round(p50, 3),
+            "p95_ms": round(percentile_ms(lat, 95), 3),
+            "speedup": round(exact_p50 / max(p50, 1e-9), 2),
+        }
+
+    print(
+        json.dumps(
+            {
+                "corpus": corpus,
+                "rows": index.size,
+                "dims": index.dims,
+                "queries": len(queries),
+                "vectors_mb": round(index.vectors.nbytes / 1e6, 1),
+                "codes_mb": round(index.codes.nbytes / 1e6, 1),
+                "load_s": round(load_s, 3),
+                "binarize_s": round(binarize_s, 3),
+                "modes": report,
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
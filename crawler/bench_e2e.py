@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+DEFAULT_INIT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "db", "init")
+
+# fixture site: tos pačios sekcijos kaip LRT_ALLOWED_ROOTS + viena out-of-scope (spider'is turi ją atmesti)
+SECTIONS = ["lietuvoje", "verslas", "pasaulyje", "mokslas-ir-it"]
+OFF_SCOPE_SECTION = "sportas"
+WORDS = (
+    "seimas vyriausybė ministras biudžetas mokesčiai šildymas kainos infliacija bankas palūkanos "
+    "eksportas įmonė darbuotojai atlyginimai savivaldybė mokykla universitetas tyrimas mokslininkai "
+    "technologijos dirbtinis intelektas saugumas kariuomenė gynyba nato sąjungininkai rusija ukraina "
+    "europos sąjunga prezidentas rinkimai partija opozicija įstatymas pataisos komitetas posėdis "
+    "energetika elektra dujos vėjo jėgainės klimatas aplinkosauga miškai žemės ūkis ūkininkai "
+    "sveikatos apsauga ligoninė gydytojai vaistai transportas geležinkelis keliai statybos būstas"
+).split()
+
+
+def _percentiles_ms(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+# -----------------------------
+# Synthetic LRT-like site
+# -----------------------------
+class FixtureSite:
+    """
+    Deterministinis (seed) LRT-panašus saitas: sekcijų puslapiai + straipsniai su
+    <article><h1>..</h1><p>..</p></article>, og:published_time ir JSON-LD autoriumi.
+    Straipsnis i nuveda į fanout tos pačios sekcijos straipsnių (i + 4j) ir vieną atsitiktinį.
+    """
+
+    def __init__(self, pages: int, fanout: int, article_chars: int, off_scope: float, seed: int):
+        self.pages = pages
+        self.fanout = fanout
+        self.article_chars = article_chars
+        self.off_scope = off_scope
+        self.seed = seed
+        self.now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self._cache: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._paths = {self.article_path(i): i for i in range(pages)}
+
+    def section_of(self, i: int) -> str:
+        if (i * 2654435761 + self.seed) % 1000 < self.off_scope * 1000:
+            return OFF_SCOPE_SECTION
+        return SECTIONS[i % len(SECTIONS)]
+
+    def article_path(self, i: int) -> str:
+        return f"/naujienos/{self.section_of(i)}/{i % 17 + 1}/{1_000_000 + i}/straipsnis-{i}"
+
+    def links_for(self, i: int) -> List[int]:
+        out = [(i + j * len(SECTIONS)) % self.pages for j in range(1, self.fanout + 1)]
+        out.append(random.Random(self.seed * 31 + i).randrange(self.pages))
+        return out
+
+    def _paragraphs(self, rng: random.Random) -> List[str]:
+        paras, total = [], 0
+        while total < self.article_chars:
+            sentences = []
+            for _ in range(rng.randint(2, 5)):
+                words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+                sentences.append(" ".join(words).capitalize() + ".")
+            p = " ".join(sentences)
+            paras.append(p)
+            total += len(p)
+        return paras
+
+    def render_article(self, i: int) -> str:
+        rng = random.Random(self.seed * 1_000_003 + i)
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 9))).capitalize()
+        published = (self.now - timedelta(minutes=37 * i)).isoformat()
+        body = "\n".join(f"<p>{p}</p>" for p in self._paragraphs(rng))
+        links = "\n".join(f'<a href="{self.article_path(j)}">{j}</a>' for j in self.links_for(i))
+        jsonld = json.dumps({"@type": "NewsArticle", "datePublished": published, "author": {"name": f"Autorius {i % 23}"}})
+        return (
+            "<!doctype html><html><head>"
+            f"<title>{title}</title>"
+            f'<meta property="article:published_time" content="{published}">'
+            f'<script type="application/ld+json">{jsonld}</script>'
+            "</head><body>"
+            f"<article><h1>{title}</h1>\n{body}\n</article>"
+            f'<nav><a href="/naujienos/video/{i}">video</a>\n{links}</nav>'
+            "</body></html>"
+        )
+
+    def render_section(self, section: str) -> str:
+        first = [i for i in range(min(self.pages, self.fanout * 8 * len(SECTIONS))) if self.section_of(i) == section]
+        links = "\n".join(f'<a href="{self.article_path(i)}">{i}</a>' for i in first[: self.fanout * 4])
+        return f"<!doctype html><html><body><h1>{section}</h1>\n{links}</body></html>"
+
+    def route(self, path: str) -> Tuple[int, bytes]:
+        path = path.split("?")[0].rstrip("/") or "/"
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached is not None:
+            return 200, cached
+
+        if path == "/robots.txt":
+            body = "User-agent: *\nAllow: /\n"
+        elif path.startswith("/naujienos/") and path.count("/") == 2:
+            body = self.render_section(path.rsplit("/", 1)[-1])
+        elif path in self._paths:
+            body = self.render_article(self._paths[path])
+        else:
+            return 404, b"not found"
+
+        data = body.encode("utf-8")
+        with self._lock:
+            self._cache[path] = data
+        return 200, data
+
+
+def serve_fixture(site: FixtureSite, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, data = site.route(self.path)
+            self.send_response(status)
+            ctype = "text/plain" if self.path.startswith("/robots.txt") else "text/html; charset=utf-8"
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, name="fixture-http", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# -----------------------------
+# Disposable DB
+# -----------------------------
+def db_env(args) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "DB_HOST": os.environ.get("DB_HOST", "127.0.0.1"),
+            "DB_PORT": os.environ.get("DB_PORT", "3306"),
+            "DB_USER": args.user or "",
+            "DB_PASSWORD": args.password or "",
+            "DB_NAME": args.database,
+            "EMBED_MODEL": args.model,
+        }
+    )
+    # metrics / profiliai iš aplinkos nereikalingi benchmark'e
+    for k in ("METRICS_DIR", "METRICS_PORT", "PROFILE"):
+        env.pop(k, None)
+    return env
+
+
+def create_database(args, base_url: str) -> None:
+    import migrate
+
+    conn = pymysql.connect(
+        host=os.environ.get("DB_HOST", "127.0.0.1"),
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=args.user,
+        password=args.password,
+        charset="utf8mb4",
+        autocommit=True,
+    )
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+            cur.execute(f"CREATE DATABASE `{args.database}` CHARACTER SET utf8mb4")
+            cur.execute(f"USE `{args.database}`")
+
+        init_dir = os.environ.get("INIT_DIR") or DEFAULT_INIT_DIR
+        for fn in sorted(os.listdir(init_dir)):
+            if fn.endswith(".sql"):
+                with open(os.path.join(init_dir, fn), encoding="utf-8") as f:
+                    with conn.cursor() as cur:
+                        for stmt in migrate.split_sql(f.read()):
+                            cur.execute(stmt)
+
+        os.environ["EMBED_MODEL"] = args.model  # 007 sukuria particiją šitam modeliui
+        migrate.run_migrations(conn, log=lambda m: None)
+
+        with conn.cursor() as cur:
+            # fixture saitas lokalus -> be šaltinio politeness delay (matuojam pipeline, ne sleep)
+            cur.execute("UPDATE sources SET min_delay_ms = 0 WHERE id = 1")
+            cur.execute("DELETE FROM urls")
+            for section in SECTIONS:
+                url = f"{base_url}/naujienos/{section}"
+                cur.execute(
+                    """
+                    INSERT INTO urls (source_id, url, url_hash, status, priority, scope)
+                    VALUES (1, %s, UNHEX(MD5(%s)), 'queued', 10, %s)
+                    """,
+                    (url, url, section),
+                )
+    finally:
+        conn.close()
+
+
+def drop_database(args) -> None:
+    conn = pymysql.connect(
+        host=os.environ.get("DB_HOST", "127.0.0.1"),
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=args.user,
+        password=args.password,
+        autocommit=True,
+    )
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    finally:
+        conn.close()
+
+
+# -----------------------------
+# Stages (kiekviena – atskiras procesas, kad peak RSS būtų per stadiją)
+# -----------------------------
+def run_child(cmd: List[str], env: Dict[str, str], capture: bool, verbose: bool) -> Tuple[int, bytes, float, float]:
+    """
+    Grąžina (returncode, stdout, wall_s, peak_rss_mb); peak RSS iš os.wait4 rusage (Linux: KB).
+    """
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        cmd,
+        env=env,
+        stdout=subprocess.PIPE if capture else (None if verbose else subprocess.DEVNULL),
+        stderr=None if verbose else subprocess.DEVNULL,
+    )
+    out = proc.stdout.read() if capture else b""
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, out, time.perf_counter() - t0, round(usage.ru_maxrss / 1024.0, 1)
+
+
+def stage_chunk(cfg: Dict) -> Dict:
+    import chunker
+
+    conn = chunker.db_connect()
+    batches, articles, chunks = [], 0, 0
+    t0 = time.perf_counter()
+    try:
+        while True:
+            tb = time.perf_counter()
+            fetched, n_articles, n_chunks = chunker.chunk_batch(
+                conn, limit=cfg["chunk_limit"], target_chars=1800, max_chars=2600, overlap_paras=1, log=lambda m: None
+            )
+            if not fetched:
+                break
+            batches.append(time.perf_counter() - tb)
+            articles += n_articles
+            chunks += n_chunks
+    finally:
+        conn.close()
+    took = time.perf_counter() - t0
+    return {
+        "articles": articles,
+        "chunks": chunks,
+        "batches": len(batches),
+        "seconds": round(took, 3),
+        "chunks_per_s": round(chunks / max(took, 1e-9), 1),
+        "batch": _percentiles_ms(batches),
+    }
+
+
+def stage_embed(cfg: Dict) -> Dict:
+    import embedder
+    import metrics
+    from models import load_model
+
+    t0 = time.perf_counter()
+    st_model = load_model(cfg["model"])
+    model_load_s = time.perf_counter() - t0
+
+    conn = embedder.db_connect()
+    batches, embedded = [], 0
+    t0 = time.perf_counter()
+    try:
+        while True:
+            tb = time.perf_counter()
+            requested, inserted = embedder.embed_batch(
+                conn,
+                st_model=st_model,
+                model_name=cfg["model"],
+                limit=cfg["embed_limit"],
+                batch_size=cfg["batch_size"],
+                normalize=True,
+                prefix="passage: ",
+                log=lambda m: None,
+            )
+            if not requested:
+                break
+            batches.append(time.perf_counter() - tb)
+            embedded += inserted
+    finally:
+        conn.close()
+    took = time.perf_counter() - t0
+    encode = metrics.ENCODE_SECONDS.summary()
+    return {
+        "embeddings": embedded,
+        "batches": len(batches),
+        "model_load_s": round(model_load_s, 3),
+        "seconds": round(took, 3),
+        "embeddings_per_s": round(embedded / max(took, 1e-9), 1),
+        "batch": _percentiles_ms(batches),
+        "encode_share": round(sum(v["mean_ms"] * v["count"] for v in encode.values()) / 1000.0 / max(took, 1e-9), 3),
+    }
+
+
+def stage_search(cfg: Dict) -> Dict:
+    import search
+    from models import load_model
+
+    conn = search.db_connect()
+    try:
+        t0 = time.perf_counter()
+        index = search.load_index(conn, cfg["model"], 0, verbose=False)
+        load_s = time.perf_counter() - t0
+        if index is None:
+            return {"error": "no embeddings"}
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, title FROM articles ORDER BY RAND(%s) LIMIT %s", (cfg["seed"], cfg["queries"]))
+            queries = [(int(a), t) for a, t in cur.fetchall() if t]
+
+        st_model = load_model(cfg["model"])
+        lat, hits = [], 0
+        for article_id, q in queries:
+            tq = time.perf_counter()
+            q_vec = search.encode_query(st_model, q, normalize=True)
+            rows, _ = search.vector_search(index, q_vec, None, cfg["topk"])
+            hydrated = search.hydrate_chunks(conn, index.chunk_ids[rows].tolist(), cache=None)
+            lat.append(time.perf_counter() - tq)
+            if any(r["article_id"] == article_id for r in hydrated.values()):
+                hits += 1
+    finally:
+        conn.close()
+    return {
+        "corpus_chunks": index.size,
+        "load_s": round(load_s, 3),
+        "queries": len(queries),
+        "qps": round(len(lat) / max(sum(lat), 1e-9), 1),
+        "query": _percentiles_ms(lat),
+        f"title_hit@{cfg['topk']}": round(hits / max(len(queries), 1), 4),
+    }
+
+
+STAGES = {"chunk": stage_chunk, "embed": stage_embed, "search": stage_search}
+
+
+def run_python_stage(name: str, cfg: Dict, env: Dict[str, str], verbose: bool) -> Dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--_stage", name, "--_config", json.dumps(cfg)]
+    rc, out, wall, rss = run_child(cmd, env, capture=True, verbose=verbose)
+    if rc != 0:
+        raise RuntimeError(f"stage {name} failed with exit code {rc}")
+    result = json.loads(out.decode("utf-8").strip().splitlines()[-1])
+    result.update({"wall_s": round(wall, 3), "peak_rss_mb": rss})
+    return result
+
+
+def run_crawl(args, base_url: str, env: Dict[str, str]) -> Dict:
+    cmd = [
+        "scrapy", "crawl", "news_queue",
+        "-a", "sources=LRT",
+        "-a", f"base_url={base_url}",
+        "-s", "CLOSESPIDER_PAGECOUNT=0",
+        "-s", "AUTOTHROTTLE_ENABLED=False",
+        "-s", "DOWNLOAD_DELAY=0",
+        "-s", f"LOG_LEVEL={'INFO' if args.verbose else 'WARNING'}",
+    ]
+    rc, _, wall, rss = run_child(cmd, env, capture=False, verbose=args.verbose)
+    if rc != 0:
+        raise RuntimeError(f"scrapy exited with code {rc}")
+
+    conn = pymysql.connect(
+        host=env["DB_HOST"], port=int(env["DB_PORT"]), user=env["DB_USER"], password=env["DB_PASSWORD"],
+        database=env["DB_NAME"], charset="utf8mb4",
+    )
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT response_ms FROM fetches")
+            fetch_ms = [float(r[0]) / 1000.0 for r in cur.fetchall() if r[0] is not None]
+            cur.execute("SELECT COUNT(*) FROM articles")
+            articles = int(cur.fetchone()[0])
+            cur.execute("SELECT COUNT(*) FROM urls WHERE scope IS NOT NULL")
+            discovered = int(cur.fetchone()[0])
+    finally:
+        conn.close()
+    return {
+        "pages": len(fetch_ms),
+        "articles": articles,
+        "urls_in_scope": discovered,
+        "wall_s": round(wall, 3),
+        "pages_per_s": round(len(fetch_ms) / max(wall, 1e-9), 1),
+        "fetch": _percentiles_ms(fetch_ms),
+        "peak_rss_mb": rss,
+    }
+
+
+def git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark: fixture site -> spider -> chunker -> embedder -> search on a disposable DB.")
+    parser.add_argument("--database", type=str, default="factcheck_e2e", help="Disposable schema (DROP + CREATE)")
+    parser.add_argument("--user", type=str, default=os.environ.get("DB_USER"), help="Reikia CREATE / DROP DATABASE teisių (pvz. root)")
+    parser.add_argument("--password", type=str, default=os.environ.get("DB_PASSWORD"))
+    parser.add_argument("--pages", type=int, default=500, help="Straipsnių skaičius fixture saite")
+    parser.add_argument("--fanout", type=int, default=4, help="Kiek nuorodų į kitus straipsnius turi kiekvienas straipsnis")
+    parser.add_argument("--article-chars", type=int, default=4000, help="Apytikslis straipsnio teksto ilgis")
+    parser.add_argument("--off-scope", type=float, default=0.1, help="Dalis straipsnių ne whitelist sekcijoje")
+    parser.add_argument("--model", type=str, default="hash:384", help="Embedding modelis; hash:<dims> = mažas stand-in be torch")
+    parser.add_argument("--chunk-limit", type=int, default=200)
+    parser.add_argument("--embed-limit", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stages", type=str, default="crawl,chunk,embed,search")
+    parser.add_argument("--out", type=str, default=None, help="Pridėti rezultatą kaip JSONL eilutę (palyginimui tarp paleidimų)")
+    parser.add_argument("--keep-db", action="store_true", help="Neištrinti --database pabaigoje")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--yes", action="store_true", help="Patvirtinti, kad --database galima ištrinti ir sukurti iš naujo")
+    parser.add_argument("--_stage", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--_config", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._stage:
+        print(json.dumps(STAGES[args._stage](json.loads(args._config))))
+        return
+
+    if not args.yes:
+        raise SystemExit(f"Refusing to drop/recreate database '{args.database}' without --yes")
+    if args.database == os.environ.get("DB_NAME"):
+        raise SystemExit("--database must not be the live pipeline database")
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    site = FixtureSite(args.pages, args.fanout, args.article_chars, args.off_scope, args.seed)
+    server, base_url = serve_fixture(site)
+    env = db_env(args)
+    cfg = {
+        "model": args.model,
+        "chunk_limit": args.chunk_limit,
+        "embed_limit": args.embed_limit,
+        "batch_size": args.batch_size,
+        "queries": args.queries,
+        "topk": args.topk,
+        "seed": args.seed,
+    }
+
+    results: Dict[str, Dict] = {}
+    try:
+        create_database(args, base_url)
+        for name in stages:
+            print(f"[bench_e2e] stage {name} ...", file=sys.stderr, flush=True)
+            if name == "crawl":
+                results[name] = run_crawl(args, base_url, env)
+            else:
+                results[name] = run_python_stage(name, cfg, env, args.verbose)
+            print(f"[bench_e2e] {name}: {results[name]}", file=sys.stderr, flush=True)
+    finally:
+        server.shutdown()
+        if not args.keep_db:
+            drop_database(args)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_rev": git_rev(),
+        "config": {
+            "pages": args.pages,
+            "fanout": args.fanout,
+            "article_chars": args.article_chars,
+            "off_scope": args.off_scope,
+            **cfg,
+        },
+        "stages": results,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+import json
+import time
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from lexical import BM25Index, default_index_path, load_or_sync
+from models import load_model
+from search import (
+    db_connect,
+    encode_query,
+    hybrid_search,
+    lexical_search,
+    load_index,
+    vector_search,
+)
+from snapshot import article_titles, load_search_index, sync_lexical
+
+
+# -----------------------------
+# Labelled queries
+# -----------------------------
+def load_queries(path: str) -> List[Tuple[str, set]]:
+    """
+    JSONL: {"query": "...", "relevant_article_ids": [1, 2]}
+    """
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            out.append((obj["query"], {int(x) for x in obj["relevant_article_ids"]}))
+    return out
+
+
+def sample_title_queries(conn, model_name: str, n: int, seed: int) -> List[Tuple[str, set]]:
+    """
+    Known-item set: query = straipsnio antraštė, relevant = tas pats straipsnis.
+    Imam tik straipsnius, kurie turi embeddingų šitam modeliui.
+    """
+    sql = """
+        SELECT a.id, a.title
+        FROM articles a
+        WHERE EXISTS (
+            SELECT 1 FROM article_chunks c
+            JOIN embeddings e ON e.chunk_id = c.id AND e.model = %s
+            WHERE c.article_id = a.id
+        )
+        ORDER BY RAND(%s)
+        LIMIT %s
+    """
+    with conn.cursor() as cur:
+        cur.execute(sql, (model_name, seed, n))
+        return [(title, {int(aid)}) for aid, title in cur.fetchall() if title]
+
+
+def sample_snapshot_title_queries(snapshot_dir: str, article_ids: np.ndarray, n: int, seed: int) -> List[Tuple[str, set]]:
+    """
+    Tas pats known-item set'as, tik iš snapshot'o: straipsniai, kurie yra užkrautame vektorių indekse.
+    """
+    ids = np.unique(article_ids)
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(ids, size=min(n, ids.size), replace=False)
+    titles = article_titles(snapshot_dir, picked)
+    return [(titles[int(aid)], {int(aid)}) for aid in picked if titles.get(int(aid))]
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+def first_relevant_rank(article_ids: List[int], relevant: set) -> int:
+    seen = []
+    for aid in article_ids:
+        if aid not in seen:
+            seen.append(aid)
+        if aid in relevant:
+            return len(seen)
+    return 0
+
+
+def percentile_ms(samples: List[float], p: float) -> float:
+    return float(np.percentile(np.asarray(samples) * 1000.0, p)) if samples else 0.0
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Latency + quality benchmark: vector vs lexical vs hybrid search.")
+    parser.add_argument("--model", type=str, default="intfloat/multilingual-e5-small")
+    parser.add_argument("--limit", type=int, default=0, help="Kiek embeddingų užkrauti, 0 = visus (default: 0)")
+    parser.add_argument("--queries", type=str, default=None, help="Labelled JSONL (query + relevant_article_ids)")
+    parser.add_argument("--auto-queries", type=int, default=50, help="Jei nėra --queries: kiek antraščių imti kaip known-item užklausas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--fuse-depth", type=int, default=100)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument("--lexical-index", type=str, default=default_index_path())
+    parser.add_argument("--from-snapshot", type=str, default=None, help="Korpusas iš snapshot.py katalogo (be DB); BM25 statomas atmintyje")
+    args = parser.parse_args()
+
+    if args.device is not None and not str(args.device).strip():
+        args.device = None
+
+    if args.from_snapshot:
+        t0 = time.perf_counter()
+        index = load_search_index(args.from_snapshot, args.model, args.limit, verbose=False)
+        load_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        bm25 = BM25Index()
+        sync_lexical(args.from_snapshot, bm25)
+        lexical_s = time.perf_counter() - t0
+
+        queries = load_queries(args.queries) if args.queries else sample_snapshot_title_queries(
+            args.from_snapshot, index.article_ids if index is not None else np.zeros(0, dtype=np.int64), args.auto_queries, args.seed
+        )
+    else:
+        conn = db_connect()
+        try:
+            t0 = time.perf_counter()
+            index = load_index(conn, args.model, args.limit, verbose=False)
+            load_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            bm25 = load_or_sync(conn, args.lexical_index)
+            lexical_s = time.perf_counter() - t0
+
+            queries = load_queries(args.queries) if args.queries else sample_title_queries(
+                conn, args.model, args.auto_queries, args.seed
+            )
+        finally:
+            conn.close()
+
+    if index is None or not queries:
+        raise SystemExit("[bench] No embeddings or no queries.")
+
+    st_model = load_model(args.model, device=args.device)
+    t0 = time.perf_counter()
+    q_vecs = [encode_query(st_model, q, normalize=True) for q, _ in queries]
+    encode_s = time.perf_counter() - t0
+
+    runners = {
+        "vector": lambda q, v: vector_search(index, v, None, args.topk),
+        "lexical": lambda q, v: lexical_search(index, bm25, q, None, args.topk),
+        "hybrid": lambda q, v: hybrid_search(index, bm25, q, v, None, args.topk, args.fuse_depth, args.rrf_k),
+    }
+
+    report: Dict[str, Dict[str, float]] = {}
+    for mode, run in runners.items():
+        lat, hits, rr = [], 0, 0.0
+        for (q, relevant), v in zip(queries, q_vecs):
+            t0 = time.perf_counter()
+            top_rows, _ = run(q, v)
+            lat.append(time.perf_counter() - t0)
+
+            rank = first_relevant_rank(index.article_ids[top_rows].tolist(), relevant)
+            if rank:
+                hits += 1
+                rr += 1.0 / rank
+
+        report[mode] = {
+            f"recall@{args.topk}": round(hits / len(queries), 4),
+            "mrr": round(rr / len(queries), 4),
+            "p50_ms": round(percentile_ms(lat, 50), 3),
+            "p95_ms": round(percentile_ms(lat, 95), 3),
+        }
+
+    print(
+        json.dumps(
+            {
+                "model": args.model,
+                "corpus_chunks": index.size,
+                "lexical_docs": bm25.num_docs,
+                "queries": len(queries),
+                "query_set": args.queries or f"auto-titles(n={args.auto_queries}, seed={args.seed})",
+                "load_s": round(load_s, 3),
+                "lexical_sync_s": round(lexical_s, 3),
+                "encode_ms_per_query": round(encode_s * 1000.0 / len(queries), 3),
+                "modes": report,
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+import os
+import time
+import argparse
+from typing import Dict, List, Tuple
+from urllib.parse import urljoin
+
+import numpy as np
+import pymysql
+from parsel import Selector
+
+from sources import (
+    BAD_URL_SUBSTRINGS,
+    LRT_ALLOWED_ROOTS,
+    LRT_BASE_URL,
+    LRT_SCOPES,
+    Source,
+    UrlMatcher,
+    extract_links,
+)
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+    )
+
+
+# -----------------------------
+# Page sets
+# -----------------------------
+def load_pages_from_db(conn, limit: int) -> List[Tuple[str, str]]:
+    """
+    Realūs landing puslapiai: paskutiniai entrypoint'ų (priority >= 10) fetch'ai, po vieną per URL,
+    papildomai – fetch'ai su daugiausia nuorodų (ilgiausi body).
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT f.final_url, f.body
+            FROM fetches f
+            JOIN (
+              SELECT MAX(f2.id) AS id
+              FROM fetches f2
+              JOIN urls u ON u.id = f2.url_id
+              WHERE u.priority >= 10 AND f2.body IS NOT NULL
+              GROUP BY f2.url_id
+            ) last ON last.id = f.id
+            """
+        )
+        pages = [(u, b) for u, b in cur.fetchall() if u and b]
+        if len(pages) < limit:
+            cur.execute(
+                """
+                SELECT final_url, body
+                FROM fetches
+                WHERE body IS NOT NULL AND http_status = 200
+                ORDER BY LENGTH(body) DESC
+                LIMIT %s
+                """,
+                (limit - len(pages),),
+            )
+            pages += [(u, b) for u, b in cur.fetchall() if u and b]
+    return pages[:limit]
+
+
+def load_pages_from_files(paths: List[str], page_url: str) -> List[Tuple[str, str]]:
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append((page_url, f.read()))
+    return pages
+
+
+# -----------------------------
+# Old vs new
+# -----------------------------
+def old_extract(page_url: str, hrefs: List[str]) -> List[str]:
+    # buvęs LrtQueueSpider._extract_lrt_links + _is_allowed_url
+    out = []
+    for href in hrefs:
+        if not href:
+            continue
+        url = urljoin(page_url, href).split("#")[0]
+        if not url.startswith(LRT_BASE_URL + "/"):
+            continue
+        if any(bad in url for bad in BAD_URL_SUBSTRINGS):
+            continue
+        if not any(url.startswith(root) for root in LRT_ALLOWED_ROOTS):
+            continue
+        out.append(url)
+    return list(set(out))
+
+
+def time_per_page(fn, pages: List[Tuple[str, List[str]]], repeat: int) -> np.ndarray:
+    # kiekvienam puslapiui – geriausias iš repeat (mažiau triukšmo nei vidurkis)
+    out = np.zeros(len(pages))
+    for i, (url, hrefs) in enumerate(pages):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn(url, hrefs)
+            best = min(best, time.perf_counter() - t0)
+        out[i] = best
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Link extraction benchmark: urljoin + any() filters vs compiled matcher + canonicalization.")
+    parser.add_argument("--limit", type=int, default=200, help="Kiek puslapių paimti iš fetches (landing puslapiai pirmiausia)")
+    parser.add_argument("--html", action="append", default=[], help="Vietoj DB: išsaugotas HTML failas (galima kartoti)")
+    parser.add_argument("--page-url", type=str, default=LRT_BASE_URL + "/naujienos/lietuvoje", help="Puslapio URL --html failams")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.html:
+        raw_pages = load_pages_from_files(args.html, args.page_url)
+    else:
+        conn = db_connect()
+        try:
+            raw_pages = load_pages_from_db(conn, args.limit)
+        finally:
+            conn.close()
+    if not raw_pages:
+        raise SystemExit("No pages (crawl something first or pass --html)")
+
+    t0 = time.perf_counter()
+    pages = [(url, Selector(text=body).css("a::attr(href)").getall()) for url, body in raw_pages]
+    select_s = time.perf_counter() - t0
+
+    matcher = UrlMatcher([Source(1, "LRT", "lrt.lt", LRT_BASE_URL, dict(LRT_SCOPES), list(BAD_URL_SUBSTRINGS))])
+    new_extract = lambda url, hrefs: extract_links(url, hrefs, matcher)  # noqa: E731
+
+    old_t = time_per_page(old_extract, pages, args.repeat)
+    new_t = time_per_page(new_extract, pages, args.repeat)
+
+    n_hrefs = sum(len(h) for _, h in pages)
+    old_links = sum(len(old_extract(u, h)) for u, h in pages)
+    new_links = sum(len(new_extract(u, h)) for u, h in pages)
+
+    def row(name: str, t: np.ndarray) -> Dict[str, float]:
+        return {
+            "name": name,
+            "p50_us": float(np.percentile(t, 50) * 1e6),
+            "p95_us": float(np.percentile(t, 95) * 1e6),
+            "hrefs_per_s": n_hrefs / max(float(t.sum()), 1e-12),
+        }
+
+    print(f"pages={len(pages)} hrefs={n_hrefs} (avg {n_hrefs / len(pages):.0f}/page), css select {select_s / len(pages) * 1e6:.0f}us/page")
+    print(f"{'':<10} {'p50/page':>10} {'p95/page':>10} {'hrefs/s':>12}")
+    for r in (row("old", old_t), row("new", new_t)):
+        print(f"{r['name']:<10} {r['p50_us']:>8.0f}us {r['p95_us']:>8.0f}us {r['hrefs_per_s']:>12,.0f}")
+    print(f"speedup: {old_t.sum() / max(new_t.sum(), 1e-12):.2f}x")
+    print(
+        f"enqueued links: old={old_links} new={new_links} "
+        f"({(old_links - new_links) / max(old_links, 1):.1%} fewer after canonicalization)"
+    )
+
+
+if __name__ == "__main__":
+    main()
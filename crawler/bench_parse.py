@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import os
+import time
+import argparse
+from typing import Dict, List, Tuple
+
+from extract import ExtractPool, extract_page
+from sources import BAD_URL_SUBSTRINGS, DEFAULT_EXTRACT, LRT_BASE_URL, LRT_EXTRACT_RULES, LRT_SCOPES, Source, UrlMatcher
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+FIXTURE_BASE_URL = "http://fixture.local"
+
+
+# -----------------------------
+# Page sets
+# -----------------------------
+def load_fixture_pages(n: int, article_chars: int, seed: int) -> List[Tuple[str, str]]:
+    # bench_e2e fixture site: tas pats HTML, kurį gauna spider'is e2e benchmark'e
+    from bench_e2e import FixtureSite
+
+    site = FixtureSite(pages=n, fanout=8, article_chars=article_chars, off_scope=0.1, seed=seed)
+    return [(FIXTURE_BASE_URL + site.article_path(i), site.render_article(i)) for i in range(n)]
+
+
+def load_db_pages(limit: int) -> List[Tuple[str, str]]:
+    from bench_links import db_connect, load_pages_from_db
+
+    conn = db_connect()
+    try:
+        return load_pages_from_db(conn, limit)
+    finally:
+        conn.close()
+
+
+# -----------------------------
+# Runs
+# -----------------------------
+def run_inline(pages, source: Source, matcher: UrlMatcher) -> Tuple[float, List[Dict]]:
+    t0 = time.perf_counter()
+    out = [extract_page(url, html, source.extract, matcher) for url, html in pages]
+    return time.perf_counter() - t0, out
+
+
+def run_pool(pages, source: Source, workers: int, chunksize: int) -> Tuple[float, List[Dict]]:
+    pool = ExtractPool(workers, [source])
+    try:
+        # worker'ių paleidimas (spawn + importai) – ne į matavimą, spider'is tai daro vieną kartą
+        pool.map([(url, html, source.extract) for url, html in pages[:workers]])
+        t0 = time.perf_counter()
+        out = pool.map([(url, html, source.extract) for url, html in pages], chunksize=chunksize)
+        return time.perf_counter() - t0, out
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML extraction throughput: inline (reactor thread) vs PARSE_WORKERS process pool.")
+    parser.add_argument("--pages", type=int, default=2000, help="Fixture puslapių skaičius")
+    parser.add_argument("--article-chars", type=int, default=6000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", action="store_true", help="Vietoj fixture: puslapiai iš fetches (kaip bench_links)")
+    parser.add_argument("--limit", type=int, default=500, help="--db: kiek puslapių")
+    parser.add_argument("--workers", type=str, default="", help="Worker'ių skaičiai per kablelį (default 1,2,4,...,cpu)")
+    parser.add_argument("--chunksize", type=int, default=1, help="Puslapių per IPC žinutę (spider'is siunčia po 1)")
+    args = parser.parse_args()
+
+    source = Source(
+        1, "LRT", "lrt.lt", LRT_BASE_URL, dict(LRT_SCOPES), list(BAD_URL_SUBSTRINGS),
+        {**DEFAULT_EXTRACT, **LRT_EXTRACT_RULES},
+    )
+    if args.db:
+        pages = load_db_pages(args.limit)
+    else:
+        pages = load_fixture_pages(args.pages, args.article_chars, args.seed)
+        source = source.rebase(FIXTURE_BASE_URL)
+    if not pages:
+        raise SystemExit("No pages (crawl something first or drop --db)")
+    matcher = UrlMatcher([source])
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",") if w.strip()]
+    else:
+        worker_counts = sorted({w for w in (1, 2, 4, 8, 16) if w <= cpus} | {cpus})
+
+    mb = sum(len(html) for _, html in pages) / 1e6
+    print(f"pages={len(pages)} html={mb:.1f}MB cpus={cpus}")
+
+    took, expected = run_inline(pages, source, matcher)
+    base_rate = len(pages) / took
+    articles = sum(1 for r in expected if r["article"] is not None)
+    links = sum(len(r["links"]) for r in expected)
+    print(f"articles={articles} links={links}")
+    print(f"{'mode':<10} {'pages/s':>10} {'speedup':>8}")
+    print(f"{'inline':<10} {base_rate:>10,.0f} {1.0:>7.2f}x")
+
+    for w in worker_counts:
+        took, out = run_pool(pages, source, w, args.chunksize)
+        if out != expected:
+            raise SystemExit(f"workers={w}: results differ from inline")
+        rate = len(pages) / took
+        print(f"{f'pool x{w}':<10} {rate:>10,.0f} {rate / base_rate:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
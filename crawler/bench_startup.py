@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# šitie moduliai --help / "nėra darbo" kelyje neturi būti importuojami (torch = sekundės)
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers")
+
+HELP_CASES: Dict[str, List[str]] = {
+    "chunker --help": ["chunker.py", "--help"],
+    "embedder --help": ["embedder.py", "--help"],
+    "search --help": ["search.py", "--help"],
+    "orchestrator --help": ["orchestrator.py", "--help"],
+}
+
+# reikia DB be darbo (pvz. viskas jau sukapota / embedinta, arba bench_e2e --keep-db schema)
+NO_WORK_CASES: Dict[str, List[str]] = {
+    "chunker (no work)": ["chunker.py", "--limit", "1"],
+    "embedder (no work)": ["embedder.py", "--limit", "1"],
+}
+
+
+def parse_importtime(stderr: str) -> Tuple[List[Tuple[str, int]], List[str]]:
+    """
+    -X importtime išvestis ("import time: self | cumulative | name", vaikai įtraukti 2 tarpais).
+    Grąžina (top-level [(modulis, cumulative_us)], visi importuoti moduliai).
+    """
+    top, names = [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # antraštė "self [us] | cumulative | imported package"
+        raw = parts[2][1:]
+        name = raw.strip()
+        names.append(name)
+        if not raw.startswith(" "):
+            top.append((name, int(parts[1])))
+    return top, names
+
+
+def run_case(argv: List[str], env: Dict[str, str], repeat: int) -> Dict:
+    walls, top, names, rc = [], [], [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", *argv],
+            cwd=HERE,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        walls.append(time.perf_counter() - t0)
+        rc = proc.returncode
+        top, names = parse_importtime(proc.stderr)
+
+    heavy = sorted({n.split(".")[0] for n in names if n.split(".")[0] in HEAVY_MODULES})
+    return {
+        "wall_ms": statistics.median(walls) * 1000.0,
+        "import_ms": sum(us for _, us in top) / 1000.0,
+        "slowest": sorted(top, key=lambda x: -x[1])[:3],
+        "heavy": heavy,
+        "rc": rc,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark: CLI --help / no-work paths with python -X importtime.")
+    parser.add_argument("--repeat", type=int, default=5, help="Kiek kartų paleisti kiekvieną atvejį (imama mediana)")
+    parser.add_argument("--no-work", action="store_true", help="Taip pat matuoti chunker/embedder, kai DB nėra darbo")
+    parser.add_argument("--database", type=str, default=None, help="DB_NAME --no-work atvejams (default: iš env)")
+    parser.add_argument("--max-ms", type=float, default=None, help="Exit 1, jei kurio nors atvejo mediana viršija šitą")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    for k in ("METRICS_DIR", "METRICS_PORT", "PROFILE"):
+        env.pop(k, None)
+    if args.database:
+        env["DB_NAME"] = args.database
+
+    cases = dict(HELP_CASES)
+    if args.no_work:
+        cases.update(NO_WORK_CASES)
+
+    failed = False
+    print(f"{'case':<22} {'wall p50':>10} {'imports':>10}  slowest top-level imports")
+    for label, argv in cases.items():
+        r = run_case(argv, env, args.repeat)
+        slowest = ", ".join(f"{n} {us / 1000.0:.0f}ms" for n, us in r["slowest"])
+        print(f"{label:<22} {r['wall_ms']:>8.0f}ms {r['import_ms']:>8.0f}ms  {slowest}")
+        if r["rc"] != 0:
+            print(f"  !! exit code {r['rc']}")
+            failed = True
+        if r["heavy"]:
+            print(f"  !! imported {', '.join(r['heavy'])} on a path that does no work")
+            failed = True
+        if args.max_ms is not None and r["wall_ms"] > args.max_ms:
+            print(f"  !! {r['wall_ms']:.0f}ms > --max-ms {args.max_ms:.0f}ms")
+            failed = True
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import argparse
+from typing import Dict, List
+
+import numpy as np
+import pymysql
+
+from sources import LRT_ALLOWED_ROOTS, LRT_SCOPES
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+# -----------------------------
+# Seed (atskira schema, MariaDB Sequence engine)
+# -----------------------------
+SCHEMA = [
+    "DROP TABLE IF EXISTS urls",
+    """
+    CREATE TABLE urls (
+      id BIGINT PRIMARY KEY AUTO_INCREMENT,
+      source_id INT NOT NULL,
+      url TEXT NOT NULL,
+      url_hash BINARY(16) NOT NULL,
+      status ENUM('queued','fetching','fetched','failed') NOT NULL DEFAULT 'queued',
+      priority INT NOT NULL DEFAULT 0,
+      attempts INT NOT NULL DEFAULT 0,
+      next_fetch_at DATETIME NULL,
+      discovered_from_url_id BIGINT NULL,
+      last_error VARCHAR(255) NULL,
+      scope VARCHAR(64) NULL,
+      created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      UNIQUE KEY uq_urls_hash (url_hash),
+      KEY ix_urls_status_next (status, next_fetch_at),
+      KEY ix_urls_claim (status, scope, priority DESC, id, next_fetch_at)
+    ) CHARACTER SET utf8mb4
+    """,
+]
+
+# out-of-scope URL'ai, kurie (kaip ir realioj DB) guli eilėj, bet niekada neklaiminami
+OFF_SCOPE_ROOT = "https://www.lrt.lt/naujienos/sportas"
+
+
+def seed(conn, rows: int, fetched: float, off_scope: float) -> Dict[str, int]:
+    """
+    rows URL'ų: fetched dalis jau 'fetched', off_scope dalis – ne whitelist sekcijose (scope NULL),
+    likę 'queued' tolygiai per LRT_ALLOWED_ROOTS.
+    """
+    n_roots = len(LRT_ALLOWED_ROOTS)
+    # seq % 100 < off_scope*100 -> sportas, kitaip roots[seq % n_roots]
+    off_pct = int(round(off_scope * 100))
+    fetched_pct = int(round(fetched * 100))
+
+    case_root = "CASE WHEN seq %% 100 < %s THEN %s " + " ".join(
+        f"WHEN seq %% {n_roots} = {i} THEN %s" for i in range(n_roots)
+    ) + " END"
+    case_scope = "CASE WHEN seq %% 100 < %s THEN NULL " + " ".join(
+        f"WHEN seq %% {n_roots} = {i} THEN %s" for i in range(n_roots)
+    ) + " END"
+
+    t0 = time.perf_counter()
+    with conn.cursor() as cur:
+        for stmt in SCHEMA:
+            cur.execute(stmt)
+        cur.execute(
+            f"""
+            INSERT INTO urls (source_id, url, url_hash, status, priority, scope)
+            SELECT 1, u.url, UNHEX(MD5(u.url)),
+                   IF((seq * 7919) %% 100 < %s, 'fetched', 'queued'),
+                   IF(seq %% 997 = 0, 10, 0),
+                   u.scope
+            FROM (
+              SELECT seq,
+                     CONCAT({case_root}, '/', seq, '/straipsnis-', seq) AS url,
+                     {case_scope} AS scope
+              FROM seq_1_to_{int(rows)}
+            ) u
+            """,
+            (
+                fetched_pct,
+                off_pct, OFF_SCOPE_ROOT, *LRT_ALLOWED_ROOTS,
+                off_pct, *[LRT_SCOPES[r] for r in LRT_ALLOWED_ROOTS],
+            ),
+        )
+        cur.execute("ANALYZE TABLE urls")
+        cur.fetchall()
+        cur.execute("SELECT status, COUNT(*) FROM urls GROUP BY status")
+        counts = {k: int(v) for k, v in cur.fetchall()}
+    conn.commit()
+    return {
+        "urls": rows,
+        "queued": counts.get("queued", 0),
+        "fetched": counts.get("fetched", 0),
+        "seed_s": round(time.perf_counter() - t0, 2),
+    }
+
+
+# -----------------------------
+# Claim queries: LIKE-OR (senas) vs scope + ix_urls_claim (naujas)
+# -----------------------------
+def like_or_claim():
+    likes = [root + "%" for root in LRT_ALLOWED_ROOTS]
+    where_like = " OR ".join(["url LIKE %s"] * len(likes))
+    sql = f"""
+        SELECT id, url
+        FROM urls
+        WHERE status='queued'
+          AND (next_fetch_at IS NULL OR next_fetch_at <= NOW())
+          AND ({where_like})
+        ORDER BY priority DESC, id ASC
+        LIMIT 1
+    """
+    return sql, likes
+
+
+def scope_claim():
+    # tas pats SQL kaip NewsQueueSpider._claim_next_url
+    scopes = list(LRT_SCOPES.values())
+    part = """
+        (SELECT id, url, priority
+         FROM urls
+         WHERE status='queued'
+           AND scope = %s
+           AND (next_fetch_at IS NULL OR next_fetch_at <= NOW())
+         ORDER BY priority DESC, id ASC
+         LIMIT 1)
+    """
+    return " UNION ALL ".join([part] * len(scopes)) + " ORDER BY priority DESC, id ASC LIMIT 1", scopes
+
+
+QUERIES = {
+    "claim_like_or": like_or_claim,
+    "claim_scope": scope_claim,
+}
+
+
+def time_query(conn, sql: str, params, repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    with conn.cursor() as cur:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            samples.append(time.perf_counter() - t0)
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+    }
+
+
+def explain(conn, sql: str, params) -> List[str]:
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN " + sql, params)
+        return [f"{r[2]}: key={r[5]} rows={r[8]} extra={r[9]}" for r in cur.fetchall()]
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Seed a scratch MariaDB urls table at several sizes and compare URL-claim latency.")
+    parser.add_argument("--database", type=str, default="factcheck_bench", help="Scratch schema (bus sukurta; lentelės PERRAŠOMOS)")
+    parser.add_argument("--user", type=str, default=os.environ.get("DB_USER"), help="Reikia CREATE teisių (pvz. root)")
+    parser.add_argument("--password", type=str, default=os.environ.get("DB_PASSWORD"))
+    parser.add_argument("--sizes", type=str, default="10000,100000,1000000", help="Kiek urls eilučių, per kablelį")
+    parser.add_argument("--fetched", type=float, default=0.7, help="Kokia dalis jau fetched (default: 0.7)")
+    parser.add_argument("--off-scope", type=float, default=0.2, help="Kokia dalis ne whitelist sekcijose (default: 0.2)")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--yes", action="store_true", help="Patvirtinti, kad --database lenteles galima perrašyti")
+    args = parser.parse_args()
+
+    if not args.yes:
+        raise SystemExit(f"Refusing to drop/recreate tables in '{args.database}' without --yes")
+    if args.database == os.environ.get("DB_NAME"):
+        raise SystemExit("--database must not be the live pipeline database")
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    conn = pymysql.connect(
+        host=os.environ.get("DB_HOST", "127.0.0.1"),
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=args.user,
+        password=args.password,
+        charset="utf8mb4",
+        autocommit=False,
+    )
+    runs = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+            cur.execute(f"USE `{args.database}`")
+
+        for size in sizes:
+            seeded = seed(conn, size, args.fetched, args.off_scope)
+            results = {}
+            for name, build in QUERIES.items():
+                sql, params = build()
+                results[name] = time_query(conn, sql, params, args.repeat)
+                results[name]["plan"] = explain(conn, sql, params)
+                print(f"[bench] urls={size} {name}: p50={results[name]['p50_ms']}ms p95={results[name]['p95_ms']}ms", flush=True)
+            runs.append({"seed": seeded, "queries": results})
+    finally:
+        conn.close()
+
+    print(json.dumps({"repeat": args.repeat, "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import argparse
+from typing import Dict, List
+
+import numpy as np
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+import embedder
+from models import HashingEncoder
+
+
+# -----------------------------
+# Seed (atskira schema, MariaDB Sequence engine)
+# -----------------------------
+SCHEMA = [
+    "DROP TABLE IF EXISTS embedding_watermarks, embeddings, article_chunks, articles",
+    """
+    CREATE TABLE articles (
+      id BIGINT PRIMARY KEY AUTO_INCREMENT,
+      text MEDIUMTEXT NOT NULL,
+      chunk_status TINYINT NOT NULL DEFAULT 0,
+      created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      KEY ix_articles_chunk_status (chunk_status, id)
+    ) CHARACTER SET utf8mb4
+    """,
+    """
+    CREATE TABLE article_chunks (
+      id BIGINT PRIMARY KEY AUTO_INCREMENT,
+      article_id BIGINT NOT NULL,
+      chunk_index INT NOT NULL,
+      chunk_text MEDIUMTEXT NOT NULL,
+      created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      UNIQUE KEY uq_article_chunk (article_id, chunk_index),
+      KEY ix_chunks_article (article_id)
+    ) CHARACTER SET utf8mb4
+    """,
+    """
+    CREATE TABLE embeddings (
+      id BIGINT PRIMARY KEY AUTO_INCREMENT,
+      chunk_id BIGINT NOT NULL,
+      model VARCHAR(255) NOT NULL,
+      dims INT NOT NULL,
+      embedding LONGBLOB NOT NULL,
+      created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+      UNIQUE KEY uq_embeddings_chunk_model (chunk_id, model),
+      KEY ix_embeddings_model (model)
+    ) CHARACTER SET utf8mb4
+    """,
+    """
+    CREATE TABLE embedding_watermarks (
+      model VARCHAR(255) NOT NULL,
+      shards INT NOT NULL DEFAULT 1,
+      shard INT NOT NULL DEFAULT 0,
+      last_chunk_id BIGINT NOT NULL DEFAULT 0,
+      updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+      PRIMARY KEY (model, shards, shard)
+    ) CHARACTER SET utf8mb4
+    """,
+]
+
+MODEL = "bench-model"
+
+
+def seed(conn, rows: int, progress: float) -> Dict[str, int]:
+    """
+    rows straipsnių; pirmi progress*rows jau sukapoti (po 1 chunką),
+    pirmi progress*chunks jau embedinti – taip, kaip atrodo ilgai veikęs pipeline.
+    """
+    done_articles = int(rows * progress)
+    done_chunks = int(done_articles * progress)
+    t0 = time.perf_counter()
+    with conn.cursor() as cur:
+        for stmt in SCHEMA:
+            cur.execute(stmt)
+        cur.execute(
+            f"""
+            INSERT INTO articles (id, text, chunk_status, created_at)
+            SELECT seq, REPEAT('tekstas ', 8), seq <= %s, NOW() - INTERVAL 1 DAY
+            FROM seq_1_to_{int(rows)}
+            """,
+            (done_articles,),
+        )
+        cur.execute(
+            f"""
+            INSERT INTO article_chunks (id, article_id, chunk_index, chunk_text, created_at)
+            SELECT seq, seq, 0, REPEAT('tekstas ', 8), NOW() - INTERVAL 1 DAY
+            FROM seq_1_to_{max(done_articles, 1)}
+            WHERE seq <= %s
+            """,
+            (done_articles,),
+        )
+        cur.execute(
+            f"""
+            INSERT INTO embeddings (chunk_id, model, dims, embedding)
+            SELECT seq, %s, 4, REPEAT(CHAR(0), 16)
+            FROM seq_1_to_{max(done_chunks, 1)}
+            WHERE seq <= %s
+            """,
+            (MODEL, done_chunks),
+        )
+        cur.execute(
+            "INSERT INTO embedding_watermarks (model, shards, shard, last_chunk_id) VALUES (%s, 1, 0, %s)",
+            (MODEL, done_chunks),
+        )
+        cur.execute("ANALYZE TABLE articles, article_chunks, embeddings")
+        cur.fetchall()
+    conn.commit()
+    return {
+        "articles": rows,
+        "chunked_articles": done_articles,
+        "embedded_chunks": done_chunks,
+        "seed_s": round(time.perf_counter() - t0, 2),
+    }
+
+
+# -----------------------------
+# Batch-selection queries: anti-join (senas) vs state / watermark (naujas)
+# -----------------------------
+QUERIES = {
+    "chunk_antijoin": (
+        """
+        SELECT a.id, a.text
+        FROM articles a
+        LEFT JOIN article_chunks c ON c.article_id = a.id
+        WHERE c.id IS NULL
+          AND a.text IS NOT NULL
+          AND a.text <> ''
+        ORDER BY a.id ASC
+        LIMIT %s
+        """,
+        lambda limit, wm: (limit,),
+    ),
+    "chunk_status": (
+        """
+        SELECT a.id, a.text
+        FROM articles a
+        WHERE a.chunk_status = 0
+          AND a.id %% 1 = 0
+        ORDER BY a.id ASC
+        LIMIT %s
+        """,
+        lambda limit, wm: (limit,),
+    ),
+    "embed_antijoin": (
+        """
+        SELECT c.id, c.chunk_text
+        FROM article_chunks c
+        LEFT JOIN embeddings e
+          ON e.chunk_id = c.id AND e.model = %s
+        WHERE e.id IS NULL
+          AND c.chunk_text IS NOT NULL
+          AND c.chunk_text <> ''
+        ORDER BY c.id ASC
+        LIMIT %s
+        """,
+        lambda limit, wm: (MODEL, limit),
+    ),
+    "embed_watermark": (
+        """
+        SELECT c.id, c.chunk_text
+        FROM article_chunks c
+        LEFT JOIN embeddings e
+          ON e.chunk_id = c.id AND e.model = %s
+        WHERE c.id > %s
+          AND e.id IS NULL
+          AND c.chunk_text <> ''
+          AND c.id %% 1 = 0
+        ORDER BY c.id ASC
+        LIMIT %s
+        """,
+        lambda limit, wm: (MODEL, wm, limit),
+    ),
+}
+
+
+def time_query(conn, sql: str, params, repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    rows = 0
+    with conn.cursor() as cur:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            cur.execute(sql, params)
+            rows = len(cur.fetchall())
+            samples.append(time.perf_counter() - t0)
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "rows": rows,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+    }
+
+
+# -----------------------------
+# Watermark check: įprastas embed_batch ciklas ant šviežių chunkų
+# -----------------------------
+def current_watermark(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MIN(last_chunk_id), 0) FROM embedding_watermarks WHERE model = %s", (MODEL,))
+        return int(cur.fetchone()[0])
+
+
+def insert_fresh_chunks(conn, n: int) -> int:
+    """
+    n chunkų su created_at = NOW() (kaip chunkeris live pipeline'e). Grąžina didžiausią id.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM article_chunks")
+        base = int(cur.fetchone()[0])
+        cur.executemany(
+            "INSERT INTO article_chunks (article_id, chunk_index, chunk_text) VALUES (0, %s, %s)",
+            [(base + i, f"šviežias chunkas {base + i}") for i in range(1, n + 1)],
+        )
+        cur.execute("SELECT MAX(id) FROM article_chunks")
+        top = int(cur.fetchone()[0])
+    conn.commit()
+    return top
+
+
+def drain(conn, st_model, limit: int) -> int:
+    total = 0
+    while True:
+        requested, _ = embedder.embed_batch(
+            conn, st_model, MODEL, limit=limit, batch_size=32, normalize=True, prefix="", log=lambda m: None,
+        )
+        if not requested:
+            return total
+        total += requested
+
+
+def check_watermark(conn, rounds: int, per_round: int, limit: int) -> Dict[str, int]:
+    """
+    Kiekvienas raundas: šviežūs chunkai -> embed_batch iki tuščio -> chunkai "pasensta"
+    (created_at atgal už WATERMARK_SAFETY_SEC). Kito raundo metu watermark'as turi pereiti
+    per ankstesnio raundo chunkus, o paskutinis tuščias embed_batch – pasiekti MAX(id).
+    Be to embed_backlog (chunks_max - watermark) orchestratoriuje augtų be galo.
+    """
+    st_model = HashingEncoder(4)
+    drain(conn, st_model, limit)
+    prev_top = current_watermark(conn)
+    for r in range(rounds):
+        top = insert_fresh_chunks(conn, per_round)
+        embedded = drain(conn, st_model, limit)
+        wm = current_watermark(conn)
+        print(f"[bench] watermark round={r} embedded={embedded} watermark={wm} prev_round_max={prev_top} chunks_max={top}", flush=True)
+        if embedded != per_round:
+            raise SystemExit(f"round {r}: embedded {embedded}, expected {per_round}")
+        if wm < prev_top:
+            raise SystemExit(f"round {r}: watermark {wm} did not pass previous round's chunks (<= {prev_top})")
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE article_chunks SET created_at = NOW() - INTERVAL %s SECOND WHERE id > %s",
+                (embedder.WATERMARK_SAFETY_SEC + 1, prev_top),
+            )
+        conn.commit()
+        prev_top = top
+
+    drain(conn, st_model, limit)  # nėra darbo -> watermark'as vis tiek pasistumia
+    wm = current_watermark(conn)
+    if wm != prev_top:
+        raise SystemExit(f"idle embed_batch left watermark at {wm}, expected chunks_max={prev_top}")
+    print(f"[bench] watermark OK: {wm} == chunks_max", flush=True)
+    return {"rounds": rounds, "per_round": per_round, "watermark": wm}
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Seed a scratch MariaDB schema and compare work-queue batch selection latency.")
+    parser.add_argument("--database", type=str, default="factcheck_bench", help="Scratch schema (bus sukurta; lentelės PERRAŠOMOS)")
+    parser.add_argument("--user", type=str, default=os.environ.get("DB_USER"), help="Reikia CREATE teisių (pvz. root)")
+    parser.add_argument("--password", type=str, default=os.environ.get("DB_PASSWORD"))
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Kiek articles eilučių (default: 1M)")
+    parser.add_argument("--progress", type=float, default=0.9, help="Kokia dalis jau apdorota (default: 0.9)")
+    parser.add_argument("--limit", type=int, default=200, help="Paketo dydis (kaip CHUNK_LIMIT / EMBED_LIMIT)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true", help="Naudoti jau užseedintą schemą")
+    parser.add_argument("--check-watermark", type=int, default=3, metavar="ROUNDS", help="Po matavimų: tiek raundų šviežių chunkų per embed_batch, tikrinant, kad watermark'as juda (0 = praleisti)")
+    parser.add_argument("--check-chunks", type=int, default=500, help="Šviežių chunkų per watermark raundą")
+    parser.add_argument("--yes", action="store_true", help="Patvirtinti, kad --database lenteles galima perrašyti")
+    args = parser.parse_args()
+
+    if not args.skip_seed and not args.yes:
+        raise SystemExit(f"Refusing to drop/recreate tables in '{args.database}' without --yes")
+    if args.database == os.environ.get("DB_NAME"):
+        raise SystemExit("--database must not be the live pipeline database")
+
+    conn = pymysql.connect(
+        host=os.environ.get("DB_HOST", "127.0.0.1"),
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=args.user,
+        password=args.password,
+        charset="utf8mb4",
+        autocommit=False,
+    )
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+            cur.execute(f"USE `{args.database}`")
+
+        seeded = {} if args.skip_seed else seed(conn, args.rows, args.progress)
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MIN(last_chunk_id), 0) FROM embedding_watermarks WHERE model = %s", (MODEL,))
+            wm = int(cur.fetchone()[0])
+
+        results = {}
+        for name, (sql, params) in QUERIES.items():
+            results[name] = time_query(conn, sql, params(args.limit, wm), args.repeat)
+            print(f"[bench] {name}: {results[name]}", flush=True)
+
+        watermark = check_watermark(conn, args.check_watermark, args.check_chunks, args.limit) if args.check_watermark > 0 else {}
+    finally:
+        conn.close()
+
+    print(json.dumps({"seed": seeded, "limit": args.limit, "repeat": args.repeat, "queries": results, "watermark_check": watermark}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
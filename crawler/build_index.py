@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+import os
+import time
+import argparse
+
+from embedder import settled_id
+from search import db_connect, load_index
+from search_index import concat_indexes, default_snapshot_path, ensure_codes, load_snapshot, save_snapshot
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Build / update on-disk vector snapshot (float32 vectors + sign-binarized codes) for search.py --snapshot.")
+    parser.add_argument("--model", type=str, default="intfloat/multilingual-e5-small", help="Model name (must match embeddings.model)")
+    parser.add_argument("--path", type=str, default=None, help="Snapshot katalogas (default: $SEARCH_INDEX_DIR/vectors/<model>)")
+    parser.add_argument("--rebuild", action="store_true", help="Statyti iš naujo (perskaičiuoja ir binarizacijos centrą)")
+    parser.add_argument("--page-size", type=int, default=50_000, help="Keyset puslapio dydis kraunant embeddingus (default: 50000)")
+    parser.add_argument("--from-snapshot", type=str, default=None, help="Skaityti iš snapshot.py katalogo (Parquet/Arrow), ne iš DB")
+    args = parser.parse_args()
+
+    if args.from_snapshot:
+        # pyarrow reikia tik čia
+        from snapshot import load_search_index
+
+        # DB nereikia: tas pats load_index kontraktas, tik šaltinis – stulpelinis snapshot'as
+        # (snapshot.py jį jau eksportuoja tik iki nusistovėjusių id)
+        def load(model_name, after_id=0, verbose=True):
+            return load_search_index(args.from_snapshot, model_name, verbose=verbose, after_id=after_id)
+
+        conn = None
+        upto = None
+    else:
+        required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+        missing = [k for k in required_env if not os.environ.get(k)]
+        if missing:
+            raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+
+        def load(model_name, after_id=0, verbose=True):
+            return load_index(conn, model_name, 0, page_size=args.page_size, verbose=verbose, after_id=after_id, upto_id=upto)
+
+        conn = db_connect()
+        # tik iki nusistovėjusio id: vėliau commitinęs žemesnis id kitaip niekada nepatektų į snapshot'ą
+        upto = settled_id(conn, "embeddings", args.model)
+
+    path = args.path or default_snapshot_path(args.model)
+    t0 = time.perf_counter()
+    try:
+        if args.rebuild or not os.path.exists(os.path.join(path, "index.json")):
+            index = load(args.model)
+            if index is None:
+                raise SystemExit("[build_index] No embeddings found for this model.")
+            added = index.size
+        else:
+            # inkrementiškai: tik embeddings.id > watermark; centras lieka senas (--rebuild jį perskaičiuoja)
+            index, info = load_snapshot(path, mmap=False)
+            if info["model"] != args.model:
+                raise SystemExit(f"Snapshot {path} is for model {info['model']}, not {args.model}")
+            delta = load(args.model, after_id=info["watermark"], verbose=False) if upto is None or upto > info["watermark"] else None
+            if delta is None:
+                print(f"[build_index] up to date. rows={index.size} watermark={info['watermark']}")
+                return
+            added = delta.size
+            index = concat_indexes(index, delta)
+    finally:
+        if conn is not None:
+            conn.close()
+
+    ensure_codes(index)
+    save_snapshot(index, path, args.model, watermark=upto)
+    print(
+        f"[build_index] done. path={path} rows={index.size} added={added} dims={index.dims} "
+        f"vectors_mb={index.vectors.nbytes / 1e6:.1f} codes_mb={index.codes.nbytes / 1e6:.1f} "
+        f"took={time.perf_counter() - t0:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ try:
 except Exception:
     pass
 
+import metrics
+
 
 # -----------------------------
 # Chunking helpers
@@ -131,21 +133,34 @@ def db_connect():
 def md5_bin16(s: str) -> bytes:
     return hashlib.md5(s.encode("utf-8")).digest()
 
-def fetch_articles_without_chunks(conn, limit: int) -> List[Tuple[int, str]]:
+# articles.chunk_status (žr. db/migrations/004_work_queue_state.sql)
+CHUNK_PENDING = 0
+CHUNK_DONE = 1
+CHUNK_EMPTY = 2
+CHUNK_DUPLICATE = 3   # near-duplicate (articles.duplicate_of, žr. neardup.py) – nekapojamas
+
+def fetch_articles_without_chunks(conn, limit: int, shard: int = 0, shards: int = 1) -> List[Tuple[int, str]]:
+    """
+    Straipsniai su chunk_status = PENDING – range scan per ix_articles_chunk_status (chunk_status, id),
+    vietoj LEFT JOIN article_chunks anti-join'o nuo lentelės pradžios.
+    shard / shards: kai keli chunker workeriai dirba lygiagrečiai, kiekvienas ima tik savo a.id % shards.
+    """
     sql = """
         SELECT a.id, a.text
         FROM articles a
-        LEFT JOIN article_chunks c ON c.article_id = a.id
-        WHERE c.id IS NULL
-          AND a.text IS NOT NULL
-          AND a.text <> ''
+        WHERE a.chunk_status = %s
+          AND a.id %% %s = %s
         ORDER BY a.id ASC
         LIMIT %s
     """
     with conn.cursor() as cur:
-        cur.execute(sql, (limit,))
+        cur.execute(sql, (CHUNK_PENDING, shards, shard, limit))
         return list(cur.fetchall())
 
+def mark_chunk_status(conn, article_id: int, status: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute("UPDATE articles SET chunk_status = %s WHERE id = %s", (status, article_id))
+
 def insert_chunks(conn, article_id: int, chunks: List[str]) -> int:
     """
     Įrašo chunkus į article_chunks.
@@ -170,6 +185,61 @@ def insert_chunks(conn, article_id: int, chunks: List[str]) -> int:
     return inserted
 
 
+def chunk_batch(
+    conn,
+    limit: int,
+    target_chars: int,
+    max_chars: int,
+    overlap_paras: int,
+    shard: int = 0,
+    shards: int = 1,
+    log=print,
+) -> Tuple[int, int, int]:
+    """
+    Vienas darbo paketas: paima iki limit straipsnių be chunkų, sukapoja, įrašo.
+    Grąžina (fetched, articles_processed, chunks_inserted); fetched == 0 -> nėra darbo.
+    """
+    with metrics.DB_READ_SECONDS.time(stage="chunk"):
+        articles = fetch_articles_without_chunks(conn, limit, shard, shards)
+    if not articles:
+        return 0, 0, 0
+
+    total_articles = 0
+    total_chunks = 0
+
+    for (article_id, text) in articles:
+        text = normalize_text(text or "")
+        if not text:
+            # kitaip liktų PENDING ir būtų imamas kiekviename pakete
+            mark_chunk_status(conn, article_id, CHUNK_EMPTY)
+            conn.commit()
+            metrics.ITEMS.inc(stage="chunk", kind="empty_articles")
+            continue
+
+        with metrics.CHUNK_SECONDS.time(stage="chunk"):
+            paras = split_paragraphs(text)
+            chunks = build_chunks(
+                paragraphs=paras,
+                target_chars=target_chars,
+                max_chars=max_chars,
+                overlap_paras=overlap_paras,
+            )
+
+        # chunkai + būsena vienoje transakcijoje
+        with metrics.DB_WRITE_SECONDS.time(stage="chunk", op="insert_chunks"):
+            inserted = insert_chunks(conn, article_id, chunks)
+            mark_chunk_status(conn, article_id, CHUNK_DONE if chunks else CHUNK_EMPTY)
+            conn.commit()
+
+        total_articles += 1
+        total_chunks += inserted
+        metrics.ITEMS.inc(stage="chunk", kind="articles")
+        metrics.ITEMS.inc(inserted, stage="chunk", kind="chunks")
+        log(f"[chunker] article_id={article_id} chunks={len(chunks)} inserted={inserted}")
+
+    return len(articles), total_articles, total_chunks
+
+
 # -----------------------------
 # Main
 # -----------------------------
@@ -179,6 +249,7 @@ def main():
     parser.add_argument("--target-chars", type=int, default=1500, help="Target chunk dydis simboliais (default: 1500)")
     parser.add_argument("--max-chars", type=int, default=2200, help="Max chunk dydis simboliais (default: 2200)")
     parser.add_argument("--overlap-paras", type=int, default=1, help="Kiek paskutinių pastraipų persidengia (default: 1)")
+    parser.add_argument("--profile", action="store_true", help="cProfile / pyinstrument (PROFILER env) -> $PROFILE_DIR")
     args = parser.parse_args()
 
     required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
@@ -186,35 +257,20 @@ def main():
     if missing:
         raise SystemExit(f"Missing env vars: {', '.join(missing)}")
 
+    metrics.configure("chunker")
     conn = db_connect()
     try:
-        articles = fetch_articles_without_chunks(conn, args.limit)
-        if not articles:
-            print("[chunker] No articles without chunks. Nothing to do.")
-            return
-
-        total_articles = 0
-        total_chunks = 0
-
-        for (article_id, text) in articles:
-            text = normalize_text(text)
-            if not text:
-                continue
-
-            paras = split_paragraphs(text)
-            chunks = build_chunks(
-                paragraphs=paras,
+        with metrics.profiled("chunk", enabled=args.profile or None):
+            fetched, total_articles, total_chunks = chunk_batch(
+                conn,
+                limit=args.limit,
                 target_chars=args.target_chars,
                 max_chars=args.max_chars,
                 overlap_paras=args.overlap_paras,
             )
-
-            inserted = insert_chunks(conn, article_id, chunks)
-            conn.commit()
-
-            total_articles += 1
-            total_chunks += inserted
-            print(f"[chunker] article_id={article_id} chunks={len(chunks)} inserted={inserted}")
+        if not fetched:
+            print("[chunker] No articles without chunks. Nothing to do.")
+            return
 
         print(f"[chunker] Done. articles_processed={total_articles} chunks_inserted={total_chunks}")
 
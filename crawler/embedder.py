@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import os
 import argparse
-from typing import List, Tuple
+from typing import Any, Callable, List, Optional, Tuple, Union
 
 import pymysql
 import numpy as np
@@ -12,7 +12,8 @@ try:
 except Exception:
     pass
 
-from sentence_transformers import SentenceTransformer
+import metrics
+from models import load_model
 
 
 # -----------------------------
@@ -30,26 +31,133 @@ def db_connect():
     )
 
 
-def fetch_chunks_without_embedding(conn, model_name: str, limit: int) -> List[Tuple[int, str]]:
+# chunkai, sukurti seniau nei tiek sekundžių, laikomi "nusistovėjusiais": jei tarp jų
+# nėra tarpų, watermark gali per juos pereiti (jaunesni id dar gali būti necommitinti)
+WATERMARK_SAFETY_SEC = 30
+
+
+def settled_id(conn, table: str, model: Optional[str] = None) -> int:
+    """
+    Didžiausias table.id, sukurtas seniau nei WATERMARK_SAFETY_SEC (model -> tik to modelio embeddings).
+    Chunk / embed workeriai ir reembed commitina lygiagrečiai, todėl žemesnis id gali atsirasti vėliau
+    už aukštesnį: išsaugomi watermark'ai (snapshot'ai, BM25, rezultatų cache, backfill_upto) eina tik
+    iki šito id, o jaunesnė uodega paimama kitą kartą.
+    """
+    where = "model = %s AND " if model is not None else ""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT id FROM {table}
+            WHERE {where}created_at <= NOW() - INTERVAL %s SECOND
+            ORDER BY id DESC LIMIT 1
+            """,
+            ((model,) if model is not None else ()) + (WATERMARK_SAFETY_SEC,),
+        )
+        row = cur.fetchone()
+        return int(row[0]) if row else 0
+
+
+def get_watermark(conn, model_name: str, shard: int = 0, shards: int = 1) -> int:
     """
-    Grąžina chunkus, kurie dar neturi embeddings įrašo su šituo modeliu.
+    Paskutinis article_chunks.id, iki kurio (imtinai) šitas modelis / shard'as viską apdorojo.
+    Naujam shard'ų išdėstymui – konservatyviai MIN per visus modelio watermark'us.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT last_chunk_id FROM embedding_watermarks WHERE model = %s AND shards = %s AND shard = %s",
+            (model_name, shards, shard),
+        )
+        row = cur.fetchone()
+        if row:
+            return int(row[0])
+        cur.execute("SELECT COALESCE(MIN(last_chunk_id), 0) FROM embedding_watermarks WHERE model = %s", (model_name,))
+        return int(cur.fetchone()[0])
+
+
+def set_watermark(conn, model_name: str, last_chunk_id: int, shard: int = 0, shards: int = 1) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO embedding_watermarks (model, shards, shard, last_chunk_id)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE last_chunk_id = GREATEST(last_chunk_id, VALUES(last_chunk_id))
+            """,
+            (model_name, shards, shard, last_chunk_id),
+        )
+
+
+def fetch_chunks_without_embedding(
+    conn,
+    model_name: str,
+    limit: int,
+    after_id: int = 0,
+    shard: int = 0,
+    shards: int = 1,
+) -> List[Tuple[int, str]]:
+    """
+    Grąžina chunkus (id, text), kurie dar neturi embeddings įrašo su šituo modeliu.
+    Skenuojama tik nuo watermark'o (c.id > after_id, PK range), anti-join lieka tik
+    siauram langui virš watermark'o, todėl kaina nebeauga su lentelės dydžiu.
+    shard / shards: lygiagretiems workeriams (c.id % shards).
     """
     sql = """
         SELECT c.id, c.chunk_text
         FROM article_chunks c
         LEFT JOIN embeddings e
           ON e.chunk_id = c.id AND e.model = %s
-        WHERE e.id IS NULL
-          AND c.chunk_text IS NOT NULL
+        WHERE c.id > %s
+          AND e.id IS NULL
           AND c.chunk_text <> ''
+          AND c.id %% %s = %s
         ORDER BY c.id ASC
         LIMIT %s
     """
     with conn.cursor() as cur:
-        cur.execute(sql, (model_name, limit))
+        cur.execute(sql, (model_name, after_id, shards, shard, limit))
         return list(cur.fetchall())
 
 
+def advance_watermark(conn, model_name: str, watermark: int, shard: int = 0, shards: int = 1) -> int:
+    """
+    Pastumia watermark'ą iki didžiausio nusistovėjusio chunk id žemiau pirmo dar neembedinto chunko.
+    Skenuojami ir jau embedinti chunkai: anti-join jų nebegrąžina, todėl iš fetch'o rezultato
+    watermark'as per šviežiai (< WATERMARK_SAFETY_SEC) embedintus chunkus niekada nepasistumtų.
+    Kviečiama toje pačioje transakcijoje po insert_embeddings (ką tik įrašyti matomi). Grąžina naują reikšmę.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT MIN(c.id)
+            FROM article_chunks c
+            LEFT JOIN embeddings e
+              ON e.chunk_id = c.id AND e.model = %s
+            WHERE c.id > %s
+              AND e.id IS NULL
+              AND c.chunk_text <> ''
+              AND c.id %% %s = %s
+            """,
+            (model_name, watermark, shards, shard),
+        )
+        row = cur.fetchone()
+        frontier = int(row[0]) if row and row[0] is not None else None
+        cur.execute(
+            """
+            SELECT MAX(id)
+            FROM article_chunks
+            WHERE id > %s
+              AND id < %s
+              AND created_at <= NOW() - INTERVAL %s SECOND
+            """,
+            (watermark, frontier if frontier is not None else 2 ** 63 - 1, WATERMARK_SAFETY_SEC),
+        )
+        row = cur.fetchone()
+    if not row or row[0] is None:
+        return watermark
+    new_watermark = int(row[0])
+    set_watermark(conn, model_name, new_watermark, shard, shards)
+    return new_watermark
+
+
 def insert_embeddings(
     conn,
     rows: List[Tuple[int, np.ndarray]],
@@ -83,7 +191,7 @@ def insert_embeddings(
 # Embedding helpers
 # -----------------------------
 def embed_texts(
-    st_model: SentenceTransformer,
+    st_model,
     texts: List[str],
     batch_size: int,
     normalize: bool,
@@ -106,6 +214,66 @@ def embed_texts(
     return emb.astype(np.float32)
 
 
+def embed_batch(
+    conn,
+    st_model: Union[Any, Callable[[], Any]],
+    model_name: str,
+    limit: int,
+    batch_size: int,
+    normalize: bool,
+    prefix: str,
+    shard: int = 0,
+    shards: int = 1,
+    log=print,
+) -> Tuple[int, int]:
+    """
+    Vienas darbo paketas: iki limit chunkų be embeddingo -> encode -> insert -> commit.
+    Grąžina (requested, inserted); requested == 0 -> nėra darbo.
+    st_model gali būti ir funkcija be argumentų (pvz. lambda: load_model(...)) – tada modelis
+    (torch import + svoriai, kelios sekundės) užkraunamas tik radus darbo.
+    """
+    with metrics.DB_READ_SECONDS.time(stage="embed"):
+        watermark = get_watermark(conn, model_name, shard, shards)
+        chunks = fetch_chunks_without_embedding(conn, model_name, limit, watermark, shard, shards)
+    if not chunks:
+        # darbo nėra, bet ankstesni paketai galėjo nusistovėti -> watermark'as vis tiek juda
+        with metrics.DB_WRITE_SECONDS.time(stage="embed", op="advance_watermark"):
+            advance_watermark(conn, model_name, watermark, shard, shards)
+            conn.commit()
+        return 0, 0
+
+    ids = [cid for (cid, _) in chunks]
+    texts = [txt for (_, txt) in chunks]
+
+    if not hasattr(st_model, "encode"):
+        st_model = st_model()
+
+    log(f"[embedder] chunks_to_embed={len(texts)} batch_size={batch_size} normalize={normalize}")
+    with metrics.ENCODE_SECONDS.time(model=model_name):
+        vectors = embed_texts(
+            st_model=st_model,
+            texts=texts,
+            batch_size=batch_size,
+            normalize=normalize,
+            prefix=prefix,
+        )
+
+    # dims
+    if vectors.ndim != 2:
+        raise RuntimeError(f"Unexpected embeddings shape: {vectors.shape}")
+    dims = int(vectors.shape[1])
+
+    rows = list(zip(ids, list(vectors)))
+    with metrics.DB_WRITE_SECONDS.time(stage="embed", op="insert_embeddings"):
+        inserted = insert_embeddings(conn, rows, model_name, dims)
+        advance_watermark(conn, model_name, watermark, shard, shards)
+        conn.commit()
+    metrics.ITEMS.inc(inserted, stage="embed", kind="embeddings")
+
+    log(f"[embedder] done. dims={dims} inserted={inserted} requested={len(rows)}")
+    return len(rows), inserted
+
+
 # -----------------------------
 # Main
 # -----------------------------
@@ -122,6 +290,7 @@ def main():
         default="passage: ",
         help="Prefix dokumentams (E5: 'passage: '), užklausoms vėliau naudosi 'query: '",
     )
+    parser.add_argument("--profile", action="store_true", help="cProfile / pyinstrument (PROFILER env) -> $PROFILE_DIR")
     args = parser.parse_args()
     
     if args.device is not None and not str(args.device).strip():
@@ -132,39 +301,27 @@ def main():
     if missing:
         raise SystemExit(f"Missing env vars: {', '.join(missing)}")
 
-    print(f"[embedder] loading model: {args.model}")
-    st_model = SentenceTransformer(args.model, device=args.device)
+    def get_model():
+        print(f"[embedder] loading model: {args.model}")
+        return load_model(args.model, device=args.device)
 
+    metrics.configure("embedder")
     conn = db_connect()
     try:
-        chunks = fetch_chunks_without_embedding(conn, args.model, args.limit)
-        if not chunks:
+        with metrics.profiled("embed", enabled=args.profile or None):
+            requested, _ = embed_batch(
+                conn,
+                st_model=get_model,
+                model_name=args.model,
+                limit=args.limit,
+                batch_size=args.batch_size,
+                normalize=args.normalize,
+                prefix=args.prefix,
+            )
+        if not requested:
             print("[embedder] No chunks without embeddings. Nothing to do.")
             return
 
-        ids = [cid for (cid, _) in chunks]
-        texts = [txt for (_, txt) in chunks]
-
-        print(f"[embedder] chunks_to_embed={len(texts)} batch_size={args.batch_size} normalize={args.normalize}")
-        vectors = embed_texts(
-            st_model=st_model,
-            texts=texts,
-            batch_size=args.batch_size,
-            normalize=args.normalize,
-            prefix=args.prefix,
-        )
-
-        # dims
-        if vectors.ndim != 2:
-            raise RuntimeError(f"Unexpected embeddings shape: {vectors.shape}")
-        dims = int(vectors.shape[1])
-
-        rows = list(zip(ids, list(vectors)))
-        inserted = insert_embeddings(conn, rows, args.model, dims)
-        conn.commit()
-
-        print(f"[embedder] done. dims={dims} inserted={inserted} requested={len(rows)}")
-
     except Exception:
         conn.rollback()
         raise
@@ -0,0 +1,212 @@
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from parsel import Selector
+from w3lib.html import get_base_url
+
+import neardup
+from sources import Source, UrlMatcher, extract_links
+
+
+# -----------------------------
+# Page extraction (HTML -> kompaktiškas rezultatas)
+# -----------------------------
+# Tas pats kodas veikia ir spider'io procese (PARSE_WORKERS=0), ir worker procesuose:
+# įeina URL + HTML tekstas + šaltinio extract taisyklės, išeina tik tai, ką spider'is rašo į DB.
+#
+#   {"links": [(url, source_id, scope), ...],
+#    "article": None | {"title", "text", "published_at", "author"}}
+
+
+def extract_page(url: str, html: str, rules: Dict[str, Any], matcher: UrlMatcher) -> Dict[str, Any]:
+    sel = Selector(text=html or "")
+    # <base href> kaip scrapy get_base_url (žiūri tik į pirmus 4096 simbolius)
+    base_url = get_base_url(html[:4096] if html else "", url)
+    links = [
+        (u, src.id, scope)
+        for u, src, scope in extract_links(base_url, sel.css("a::attr(href)").getall(), matcher)
+    ]
+
+    article = None
+    if looks_like_article(url, sel, rules):
+        article = {
+            "title": extract_title(sel, rules),
+            "text": extract_article_text(sel, rules),
+            "published_at": extract_published_at(sel),
+            "author": extract_author(sel, rules),
+        }
+    return {"links": links, "article": article}
+
+
+# ---------- Article detection / extraction ----------
+def looks_like_article(url: str, sel: Selector, rules: Dict[str, Any]) -> bool:
+    if any(x in url for x in rules["skip"]):
+        return False
+
+    if rules["container"] and not sel.css(rules["container"]):
+        return False
+
+    title = extract_title(sel, rules)
+    text = extract_article_text(sel, rules)
+    if not title or not text:
+        return False
+    if len(text) < rules["min_chars"]:
+        return False
+
+    return True
+
+
+def extract_title(sel: Selector, rules: Dict[str, Any]) -> Optional[str]:
+    t = sel.css(rules["title"]).get()
+    return t.strip() if t else None
+
+
+def extract_article_text(sel: Selector, rules: Dict[str, Any]) -> Optional[str]:
+    paras = sel.css(rules["text"]).getall()
+    text = "\n".join([p.strip() for p in paras if p and p.strip()])
+    return text if text else None
+
+
+# ---------- published_at / author (meta + JSON-LD) ----------
+def parse_iso_datetime_to_utc_naive(s: Optional[str]) -> Optional[datetime]:
+    if not s:
+        return None
+    s = s.strip()
+    try:
+        # handle "Z"
+        if s.endswith("Z"):
+            s = s[:-1] + "+00:00"
+        dt = datetime.fromisoformat(s)
+        if dt.tzinfo is None:
+            # jei be timezone – paliekam kaip local-naive (geriau nei NULL)
+            return dt
+        dt_utc = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt_utc
+    except Exception:
+        return None
+
+
+def extract_published_at(sel: Selector) -> Optional[datetime]:
+    # 1) OpenGraph
+    og = sel.css('meta[property="article:published_time"]::attr(content)').get()
+    dt = parse_iso_datetime_to_utc_naive(og)
+    if dt:
+        return dt
+
+    # 2) JSON-LD
+    for obj in extract_jsonld_objects(sel):
+        val = obj.get("datePublished") or obj.get("dateCreated")
+        if isinstance(val, str):
+            dt = parse_iso_datetime_to_utc_naive(val)
+            if dt:
+                return dt
+
+    # 3) fallback (never NULL if you want): use fetch time is not available here, so return None
+    return None
+
+
+def extract_author(sel: Selector, rules: Dict[str, Any]) -> Optional[str]:
+    # 1) meta author
+    a = sel.css('meta[name="author"]::attr(content)').get()
+    if a and a.strip():
+        return a.strip()
+
+    # 2) JSON-LD
+    for obj in extract_jsonld_objects(sel):
+        auth = obj.get("author")
+        name = None
+        if isinstance(auth, dict):
+            name = auth.get("name")
+        elif isinstance(auth, list):
+            # take first author name if list
+            for it in auth:
+                if isinstance(it, dict) and it.get("name"):
+                    name = it.get("name")
+                    break
+                if isinstance(it, str) and it.strip():
+                    name = it.strip()
+                    break
+        elif isinstance(auth, str):
+            name = auth
+
+        if name and str(name).strip():
+            return str(name).strip()
+
+    # 3) fallback (šaltinio default_author, pvz. "LRT.lt")
+    return rules["default_author"]
+
+
+def extract_jsonld_objects(sel: Selector) -> List[Dict[str, Any]]:
+    out = []
+    scripts = sel.css('script[type="application/ld+json"]::text').getall()
+    for s in scripts:
+        if not s:
+            continue
+        s = s.strip()
+        try:
+            data = json.loads(s)
+            if isinstance(data, dict):
+                out.append(data)
+            elif isinstance(data, list):
+                out.extend([x for x in data if isinstance(x, dict)])
+        except Exception:
+            continue
+    return out
+
+
+# -----------------------------
+# Worker pool
+# -----------------------------
+# Kiekvienas worker'is vieną kartą (initializer) susikuria savo UrlMatcher; per IPC keliauja tik
+# (url, html, rules) į vieną pusę ir extract_page rezultatas į kitą.
+_worker_matcher: Optional[UrlMatcher] = None
+_worker_simhash = False
+
+
+def _init_worker(sources: Sequence[Source], simhash: bool = False) -> None:
+    global _worker_matcher, _worker_simhash
+    _worker_matcher = UrlMatcher(sources)
+    _worker_simhash = simhash
+
+
+def _extract_in_worker(url: str, html: str, rules: Dict[str, Any]) -> Dict[str, Any]:
+    result = extract_page(url, html, rules, _worker_matcher)
+    if _worker_simhash and result["article"] is not None:
+        result["article"]["simhash"] = neardup.simhash(result["article"]["text"] or "")
+    return result
+
+
+class ExtractPool:
+    """
+    ProcessPoolExecutor su extract_page. spawn (ne fork): Scrapy procese jau veikia reactor'iaus
+    ir DNS thread'ai, o worker'iams reikia tik parsel / lxml ir sources.
+    simhash=True -> straipsniui dar ir article["simhash"] (backfill.py; spider'is skaičiuoja pats).
+    """
+
+    def __init__(self, workers: int, sources: Sequence[Source], simhash: bool = False):
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(list(sources), simhash),
+        )
+
+    def submit(self, url: str, html: str, rules: Dict[str, Any]):
+        return self._executor.submit(_extract_in_worker, url, html, rules)
+
+    def imap(self, pages: Sequence[Tuple[str, str, Dict[str, Any]]], chunksize: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        Visi puslapiai pateikiami iškart (worker'iai pradeda dirbti), rezultatai – iteratorius ta pačia tvarka.
+        """
+        urls, htmls, rules = zip(*pages) if pages else ((), (), ())
+        return self._executor.map(_extract_in_worker, urls, htmls, rules, chunksize=chunksize)
+
+    def map(self, pages: Sequence[Tuple[str, str, Dict[str, Any]]], chunksize: int = 1) -> List[Dict[str, Any]]:
+        return list(self.imap(pages, chunksize))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
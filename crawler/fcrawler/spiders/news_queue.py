@@ -0,0 +1,450 @@
+import os
+import time
+import logging
+import random
+import asyncio
+import pymysql
+import scrapy
+from scrapy.exceptions import IgnoreRequest
+from scrapy.spidermiddlewares.httperror import HttpError
+from twisted.internet.error import ConnectError, ConnectionLost, DNSLookupError, TCPTimedOutError, TimeoutError
+
+import metrics
+import neardup
+from extract import ExtractPool, extract_page
+from sources import UrlMatcher, canonicalize_url, load_sources
+
+# Nepavykę fetch'ai (po Scrapy RETRY_TIMES): urls.next_fetch_at = NOW() + backoff su jitter,
+# po URL_MAX_ATTEMPTS -> status 'failed'. Perrašoma per -s URL_MAX_ATTEMPTS=... ir pan.
+URL_MAX_ATTEMPTS = 5
+URL_BACKOFF_BASE_SEC = 60
+URL_BACKOFF_MAX_SEC = 6 * 3600
+# šitie iškart 'failed' (entrypoint'ams – tik backoff, jie niekada nežymimi 'failed')
+PERMANENT_HTTP_STATUSES = (404, 410, 451)
+
+
+def classify_failure(failure):
+    """
+    Twisted Failure -> (error_type, http_status, message) fetches.error_type / urls.last_error.
+    """
+    if failure.check(HttpError):
+        status = failure.value.response.status
+        return ("http_5xx" if status >= 500 else "http_4xx"), status, f"HTTP {status}"
+    if failure.check(IgnoreRequest):
+        return "ignored", None, str(failure.value) or "ignored (robots.txt)"
+    if failure.check(TimeoutError, TCPTimedOutError):
+        error_type = "timeout"
+    elif failure.check(DNSLookupError):
+        error_type = "dns"
+    elif failure.check(ConnectError, ConnectionLost):
+        error_type = "connection"
+    else:
+        error_type = "other"
+    return error_type, None, f"{type(failure.value).__name__}: {failure.getErrorMessage()}"
+
+
+def backoff_seconds(attempts: int, base: float, cap: float) -> int:
+    """
+    Eksponentinis backoff su "equal jitter": [d/2, d), d = min(cap, base * 2^(attempts-1)).
+    Jitter išsklaido vienu metu nukritusius URL (pvz. viso host'o timeout'ą), kad negrįžtų vienu metu.
+    """
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return int(delay / 2 + random.uniform(0, delay / 2))
+
+
+class NewsQueueSpider(scrapy.Spider):
+    """
+    Vienas spider'is visiems enabled šaltiniams iš sources lentelės.
+    Kiekvienas šaltinis turi max_concurrency nepriklausomų "grandinių" (claim -> fetch -> claim ...),
+    todėl didelė vieno šaltinio eilė neužblokuoja kitų, o politeness (delay / concurrency)
+    taikoma per šaltinio download slot'ą.
+    """
+    name = "news_queue"
+
+    custom_settings = {
+        "DOWNLOAD_TIMEOUT": 20,
+        "RETRY_TIMES": 2,
+        "REDIRECT_ENABLED": True,
+        "AUTOTHROTTLE_ENABLED": True,
+        "AUTOTHROTTLE_START_DELAY": 0.5,
+        "AUTOTHROTTLE_MAX_DELAY": 5.0,
+        "ROBOTSTXT_OBEY": True,
+        "LOG_LEVEL": "INFO",
+    }
+
+    # -a sources=LRT,delfi.lt (name arba domain); None -> visi enabled
+    default_sources = None
+
+    def __init__(self, *args, sources=None, base_url=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = sources if sources is not None else self.default_sources
+        self.source_names = [n.strip() for n in names.split(",") if n.strip()] if names else None
+        # -a base_url=http://127.0.0.1:8765 -> to paties šaltinio taisyklės kitam host'ui (bench_e2e fixture site)
+        self.base_url = base_url
+        self.sources = []
+        self.sources_by_id = {}
+        self.matcher = UrlMatcher([])
+        self.pool = None
+        # spider'is – atskiras procesas (orchestrator paleidžia scrapy subprocess), todėl savas exportas
+        metrics.configure("crawl")
+
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        # per-šaltinio politeness: DOWNLOAD_SLOTS {slot: {concurrency, delay}}; Request.meta["download_slot"]
+        try:
+            conn = cls._connect()
+            try:
+                slots = {
+                    s.slot: {"concurrency": s.max_concurrency, "delay": s.min_delay_ms / 1000.0, "randomize_delay": True}
+                    for s in load_sources(conn)
+                }
+            finally:
+                conn.close()
+        except (pymysql.err.OperationalError, KeyError) as e:
+            # DB nepasiekiama / nėra DB_* env -> numatytieji slot'ai; kitos klaidos krenta
+            logging.getLogger(cls.name).warning("DOWNLOAD_SLOTS not loaded from sources: %r", e)
+            return
+        settings.set("DOWNLOAD_SLOTS", {**settings.getdict("DOWNLOAD_SLOTS"), **slots}, priority="spider")
+
+    # ---------- DB ----------
+    @staticmethod
+    def _connect():
+        return pymysql.connect(
+            host=os.environ["DB_HOST"],
+            port=int(os.environ.get("DB_PORT", "3306")),
+            user=os.environ["DB_USER"],
+            password=os.environ["DB_PASSWORD"],
+            database=os.environ["DB_NAME"],
+            charset="utf8mb4",
+            autocommit=True,
+        )
+
+    def _db(self):
+        return self._connect()
+
+    def _load_sources(self, conn):
+        sources = load_sources(conn, self.source_names)
+        if self.base_url:
+            if len(sources) != 1:
+                raise ValueError(f"base_url needs exactly one source, got {[s.name for s in sources]}")
+            sources = [sources[0].rebase(self.base_url)]
+        self.sources = sources
+        self.sources_by_id = {s.id: s for s in sources}
+        self.matcher = UrlMatcher(sources)
+        self.logger.info(
+            "Sources: %s",
+            ", ".join(f"{s.name} (x{s.max_concurrency}, {s.min_delay_ms}ms)" for s in sources) or "none",
+        )
+
+    # ---------- Scrapy entry ----------
+    def start_requests(self):
+        conn = self._db()
+        try:
+            self._load_sources(conn)
+            self._reset_stuck_fetching(conn)
+            self._start_pool()
+
+            requests = []
+            for src in self.sources:
+                for _ in range(src.max_concurrency):
+                    req = self._next_request(conn, src)
+                    if req is None:
+                        break
+                    requests.append(req)
+        finally:
+            conn.close()
+
+        if not requests:
+            self.logger.info("No queued URLs.")
+        yield from requests
+
+    def _next_request(self, conn, src):
+        with metrics.DB_READ_SECONDS.time(stage="crawl"):
+            next_row = self._claim_next_url(conn, src)
+        if not next_row:
+            return None
+        url_id, url = next_row
+        return scrapy.Request(
+            url=url,
+            callback=self.parse,
+            errback=self.on_error,
+            meta={
+                "url_id": url_id,
+                "source_id": src.id,
+                "download_slot": src.slot,
+                "start_ms": int(time.time() * 1000),
+            },
+        )
+
+    async def parse(self, response):
+        url_id = response.meta["url_id"]
+        src = self.sources_by_id[response.meta["source_id"]]
+        start_ms = response.meta["start_ms"]
+        elapsed = int(time.time() * 1000) - start_ms
+        metrics.FETCH_SECONDS.observe(response.meta.get("download_latency", elapsed / 1000.0), stage="crawl")
+        metrics.ITEMS.inc(stage="crawl", kind="pages", status=response.status, source=src.name)
+
+        # ✅ Hard guard: jei out-of-scope (pvz. redirect'as ar DB liko šiukšlių) – neapdorojam
+        hit = self.matcher.match(response.url)
+        extracted = await self._extract(response, hit[0]) if hit is not None else None
+
+        conn = self._db()
+        try:
+            if hit is None:
+                self._mark_fetched(conn, url_id, src)  # kad nebesuktų
+            else:
+                self._process(conn, response, url_id, src, page_source=hit[0], elapsed_ms=elapsed, extracted=extracted)
+
+            next_req = self._next_request(conn, src)
+        finally:
+            conn.close()
+
+        if next_req is not None:
+            yield next_req
+        else:
+            self.logger.info("Queue empty for %s.", src.name)
+
+    def on_error(self, failure):
+        # timeout / DNS / 5xx (po RETRY_TIMES) / robots.txt: įrašom klaidą, atidedam su backoff, grandinė tęsiasi
+        request = failure.request
+        url_id = request.meta["url_id"]
+        src = self.sources_by_id[request.meta["source_id"]]
+        elapsed = int(time.time() * 1000) - request.meta["start_ms"]
+        error_type, status, message = classify_failure(failure)
+        metrics.ERRORS.inc(stage="crawl", error=error_type, source=src.name)
+
+        conn = self._db()
+        try:
+            with metrics.DB_WRITE_SECONDS.time(stage="crawl", op="record_failure"):
+                self._save_failed_fetch(conn, url_id, request.url, status, error_type, message, elapsed)
+                outcome = self._reschedule_failed(conn, url_id, error_type, status, message)
+            self.logger.warning("%s %s -> %s (%s)", error_type, request.url, outcome, message)
+
+            next_req = self._next_request(conn, src)
+        finally:
+            conn.close()
+
+        if next_req is not None:
+            yield next_req
+
+    def closed(self, reason):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def _process(self, conn, response, url_id, src, page_source, elapsed_ms, extracted):
+        with metrics.DB_WRITE_SECONDS.time(stage="crawl", op="save_fetch"):
+            self._save_fetch(conn, url_id, response, elapsed_ms)
+            self._mark_fetched(conn, url_id, src)
+
+        new_urls = extracted["links"]
+        with metrics.DB_WRITE_SECONDS.time(stage="crawl", op="enqueue"):
+            self._enqueue_urls(conn, new_urls, discovered_from_url_id=url_id)
+        metrics.ITEMS.inc(len(new_urls), stage="crawl", kind="links")
+
+        article = extracted["article"]
+        if article is not None:
+            with metrics.DB_WRITE_SECONDS.time(stage="crawl", op="save_article"):
+                self._save_article(
+                    conn,
+                    source_id=page_source.id,
+                    url_id=url_id,
+                    canonical_url=canonicalize_url(response.url),
+                    **article,
+                )
+            metrics.ITEMS.inc(stage="crawl", kind="articles", source=page_source.name)
+
+    # ---------- HTML extraction (inline arba worker procesuose) ----------
+    def _start_pool(self):
+        # -s PARSE_WORKERS=N: selektoriai / JSON-LD / nuorodos – N procesų, reactor'ius tik siunčia ir rašo
+        workers = self.settings.getint("PARSE_WORKERS", 0)
+        if workers > 0 and self.sources and self.pool is None:
+            self.pool = ExtractPool(workers, self.sources)
+            self.logger.info("Parse workers: %d", workers)
+
+    async def _extract(self, response, page_source):
+        if self.pool is None:
+            with metrics.PARSE_SECONDS.time(stage="crawl", op="extract"):
+                return extract_page(response.url, response.text, page_source.extract, self.matcher)
+        # laikas su eile + IPC; reactor'ius tuo metu aptarnauja kitus download'us
+        t0 = time.perf_counter()
+        result = await asyncio.wrap_future(self.pool.submit(response.url, response.text, page_source.extract))
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - t0, stage="crawl", op="extract_pool")
+        return result
+
+    # ---------- Queue / status ----------
+    def _reset_stuck_fetching(self, conn):
+        scopes = [scope for s in self.sources for scope in s.scopes]
+        if not scopes:
+            return
+        with conn.cursor() as cur:
+            cur.execute(
+                f"UPDATE urls SET status='queued' WHERE status='fetching' AND scope IN ({', '.join(['%s'] * len(scopes))})",
+                scopes,
+            )
+
+    def _claim_next_url(self, conn, src, attempts: int = 3):
+        # ✅ DB-level whitelist: urls.scope užpildomas tik leidžiamiems URL (žr. UrlMatcher).
+        # Po vieną LIMIT 1 kiekvienam šaltinio scope per ix_urls_claim (status, scope, priority DESC, id):
+        # kiekviena dalis sustoja ties pirma tinkama eilute, todėl nėra filesort per visą eilę.
+        scopes = src.scopes
+        part = """
+            (SELECT id, url, priority
+             FROM urls
+             WHERE status='queued'
+               AND scope = %s
+               AND (next_fetch_at IS NULL OR next_fetch_at <= NOW())
+             ORDER BY priority DESC, id ASC
+             LIMIT 1)
+        """
+        sql = " UNION ALL ".join([part] * len(scopes)) + " ORDER BY priority DESC, id ASC LIMIT 1"
+
+        with conn.cursor() as cur:
+            for _ in range(attempts):
+                cur.execute(sql, scopes)
+                row = cur.fetchone()
+                if not row:
+                    return None
+
+                url_id, url, _ = row
+                # kitas crawler procesas galėjo tą pačią eilutę paimti tarp SELECT ir UPDATE
+                n = cur.execute(
+                    "UPDATE urls SET status='fetching', attempts=attempts+1 WHERE id=%s AND status='queued'",
+                    (url_id,),
+                )
+                if n:
+                    return url_id, url
+        return None
+
+    def _mark_fetched(self, conn, url_id, src):
+        # entrypoint’ai (priority>=10) – refetch; straipsniai – fetched once
+        with conn.cursor() as cur:
+            cur.execute("SELECT priority FROM urls WHERE id=%s", (url_id,))
+            row = cur.fetchone()
+            priority = int(row[0]) if row else 0
+
+            if priority >= 10:
+                # attempts skaičiuoja nesėkmes iš eilės (backoff'ui), todėl po sėkmės – iš naujo
+                cur.execute(
+                    """
+                    UPDATE urls
+                    SET status='queued', attempts=0, last_error=NULL, next_fetch_at = NOW() + INTERVAL %s MINUTE
+                    WHERE id=%s
+                    """,
+                    (src.refetch_min, url_id),
+                )
+            else:
+                cur.execute("UPDATE urls SET status='fetched', last_error=NULL WHERE id=%s", (url_id,))
+
+    def _reschedule_failed(self, conn, url_id, error_type, http_status, message) -> str:
+        """
+        urls.attempts jau padidintas claim metu. Grąžina 'failed' arba 'retry in Ns'.
+        """
+        max_attempts = self.settings.getint("URL_MAX_ATTEMPTS", URL_MAX_ATTEMPTS)
+        base = self.settings.getfloat("URL_BACKOFF_BASE_SEC", URL_BACKOFF_BASE_SEC)
+        cap = self.settings.getfloat("URL_BACKOFF_MAX_SEC", URL_BACKOFF_MAX_SEC)
+        last_error = f"{error_type}: {message}"[:255]
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT priority, attempts FROM urls WHERE id=%s", (url_id,))
+            row = cur.fetchone()
+            priority, attempts = (int(row[0]), int(row[1])) if row else (0, max_attempts)
+
+            permanent = error_type == "ignored" or http_status in PERMANENT_HTTP_STATUSES
+            if priority < 10 and (permanent or attempts >= max_attempts):
+                cur.execute(
+                    "UPDATE urls SET status='failed', last_error=%s, next_fetch_at=NULL WHERE id=%s",
+                    (last_error, url_id),
+                )
+                metrics.ITEMS.inc(stage="crawl", kind="failed_urls")
+                return "failed"
+
+            delay = backoff_seconds(attempts, base, cap)
+            cur.execute(
+                """
+                UPDATE urls
+                SET status='queued', last_error=%s, next_fetch_at = NOW() + INTERVAL %s SECOND
+                WHERE id=%s
+                """,
+                (last_error, delay, url_id),
+            )
+            return f"retry in {delay}s"
+
+    def _enqueue_urls(self, conn, links, discovered_from_url_id):
+        # links: [(kanoninis url, source_id, scope)] iš extract_page (jau praėję matcher'į)
+        rows = [(source_id, u, u, discovered_from_url_id, scope) for u, source_id, scope in links]
+        if not rows:
+            return
+        with conn.cursor() as cur:
+            cur.executemany(
+                """
+                INSERT IGNORE INTO urls (source_id, url, url_hash, status, priority, discovered_from_url_id, scope)
+                VALUES (%s, %s, UNHEX(MD5(%s)), 'queued', 0, %s, %s)
+                """,
+                rows,
+            )
+
+    # ---------- Fetch save ----------
+    def _save_fetch(self, conn, url_id, response, elapsed_ms):
+        body = response.text
+        MAX_CHARS = 200_000
+        if body and len(body) > MAX_CHARS:
+            body = body[:MAX_CHARS]
+
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO fetches (url_id, http_status, content_type, final_url, response_ms, body)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (
+                    url_id,
+                    response.status,
+                    response.headers.get("Content-Type", b"").decode("utf-8", "ignore"),
+                    response.url,
+                    elapsed_ms,
+                    body,
+                ),
+            )
+
+    def _save_failed_fetch(self, conn, url_id, url, http_status, error_type, message, elapsed_ms):
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO fetches (url_id, http_status, final_url, response_ms, error_type, error_message)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (url_id, http_status, url, elapsed_ms, error_type[:32], message[:255]),
+            )
+
+    # ---------- Article save ----------
+    def _save_article(self, conn, source_id, url_id, canonical_url, title, published_at, author, text):
+        # near-duplicate (SimHash + LSH): susiejamas su originalu ir nekapojamas / neembedinamas
+        with metrics.PARSE_SECONDS.time(stage="crawl", op="simhash"):
+            h, duplicate_of, chunk_status = neardup.classify(conn, text)
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO articles (source_id, url_id, canonical_url, title, published_at, author, text, text_hash,
+                                      simhash, duplicate_of, chunk_status)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, UNHEX(MD5(%s)), %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                  title = VALUES(title),
+                  published_at = VALUES(published_at),
+                  author = VALUES(author),
+                  text = VALUES(text),
+                  updated_at = CURRENT_TIMESTAMP
+                """,
+                (source_id, url_id, canonical_url, title, published_at, author, text, text, h, duplicate_of, chunk_status),
+            )
+            inserted = cur.rowcount == 1  # 2 = ON DUPLICATE KEY UPDATE (tas pats text_hash)
+            article_id = cur.lastrowid
+
+        if not inserted:
+            return
+        if duplicate_of is not None:
+            metrics.ITEMS.inc(stage="crawl", kind="near_duplicates")
+            self.logger.info("Near-duplicate of article %s: %s", duplicate_of, canonical_url)
+        elif h is not None:
+            neardup.index_article(conn, article_id, h)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+import os
+import re
+import time
+import argparse
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+from embedder import settled_id
+
+
+# -----------------------------
+# Tokenizer (LT)
+# -----------------------------
+_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)*|[^\W\d_]+", re.UNICODE)
+
+# dažniausios lietuviškos galūnės (ilgiausios pirmos); nukerpam tik vieną
+LT_SUFFIXES = tuple(
+    sorted(
+        (
+            "iesiems", "iuose", "iams", "iems", "uose", "omis", "amis", "emis", "imis", "ėmis",
+            "iais", "iaus", "ojoje", "ajame", "ėse", "ose", "yse", "iai", "iui", "ams", "oms",
+            "ėms", "ims", "ums", "ais", "ias", "ios", "ius", "aus", "oje", "ėje", "yje", "uje",
+            "ame", "ių", "ės", "iu", "ui", "as", "is", "ys", "us", "ai", "ei", "os",
+            "ą", "ę", "į", "ų", "ū", "a", "e", "ė", "i", "o", "u", "y",
+        ),
+        key=len,
+        reverse=True,
+    )
+)
+MIN_STEM = 3
+
+LT_STOPWORDS = frozenset(
+    """
+    ir ar bet o kad kai kaip jei nes tai tas ta tie tos to tą jo jos jų jam jai juos jas
+    yra buvo bus būti esu esame yra nėra ne taip tik dar jau net gal per prie nuo iki apie
+    su be dėl po už į iš ant pagal tarp virš kur kas kuris kuri kurie kurios kurio kurių
+    mes jūs jie jos aš tu savo šis ši šie šios šio šių tačiau taip pat arba
+    """.split()
+)
+
+
+def stem_lt(token: str) -> str:
+    if token[0].isdigit():
+        return token.replace(",", ".")
+    for suf in LT_SUFFIXES:
+        if token.endswith(suf) and len(token) - len(suf) >= MIN_STEM:
+            return token[: -len(suf)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    lower -> žodžiai / skaičiai -> be stopwords -> galūnių nukirpimas.
+    'Nausėdos', 'Nausėdai', 'Nausėda' -> 'nausėd'.
+    """
+    out = []
+    for tok in _TOKEN_RE.findall((text or "").lower()):
+        if tok in LT_STOPWORDS:
+            continue
+        out.append(stem_lt(tok))
+    return out
+
+
+# -----------------------------
+# BM25 index
+# -----------------------------
+class BM25Index:
+    """
+    Inverted index virš article_chunks.chunk_text.
+    Bazinis segmentas laikomas CSR forma (offsets / post_docs int32 / post_tfs uint16),
+    nauji dokumentai krenta į delta segmentą, kol compact() jų nesulieja.
+    Update'as pagal chunk_id = senas dokumentas pažymimas mirusiu + pridedamas naujas.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.watermark = 0  # article_chunks.id, iki kurio (imtinai) viskas indeksuota
+        self.vocab: Dict[str, int] = {}
+
+        # doc -> chunk_id / ilgis / ar gyvas
+        self.doc_chunk_ids: List[int] = []
+        self.doc_lens: List[int] = []
+        self._doc_lens_np: Optional[np.ndarray] = None  # search() kešas, numetamas add / compact
+        self.alive = np.zeros(0, dtype=bool)
+        self._doc_of_chunk: Dict[int, int] = {}
+
+        # bazinis (sukompaktintas) segmentas
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.post_docs = np.zeros(0, dtype=np.int32)
+        self.post_tfs = np.zeros(0, dtype=np.uint16)
+
+        # delta segmentas: term_id -> [(doc, tf), ...]
+        self._delta: Dict[int, List[Tuple[int, int]]] = {}
+
+        self._alive_docs = 0
+        self._alive_len = 0
+
+    # ---------- updates ----------
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_chunk_ids)
+
+    def add(self, chunk_id: int, text: str) -> None:
+        chunk_id = int(chunk_id)
+        self.remove(chunk_id)
+
+        terms = Counter(tokenize(text))
+        doc = self.num_docs
+        self.doc_chunk_ids.append(chunk_id)
+        self.doc_lens.append(sum(terms.values()))
+        self._doc_lens_np = None
+        self._doc_of_chunk[chunk_id] = doc
+        if doc >= self.alive.size:
+            grown = np.zeros(max(1024, self.alive.size * 2), dtype=bool)
+            grown[: self.alive.size] = self.alive
+            self.alive = grown
+        self.alive[doc] = True
+        self._alive_docs += 1
+        self._alive_len += self.doc_lens[doc]
+
+        for term, tf in terms.items():
+            tid = self.vocab.setdefault(term, len(self.vocab))
+            self._delta.setdefault(tid, []).append((doc, min(tf, 65535)))
+
+        self.watermark = max(self.watermark, chunk_id)
+
+    def remove(self, chunk_id: int) -> bool:
+        doc = self._doc_of_chunk.pop(int(chunk_id), None)
+        if doc is None:
+            return False
+        self.alive[doc] = False
+        self._alive_docs -= 1
+        self._alive_len -= self.doc_lens[doc]
+        return True
+
+    def compact(self) -> None:
+        """
+        Sulieja delta segmentą į CSR ir išmeta mirusius dokumentus (doc id perindeksuojami).
+        """
+        n_docs = self.num_docs
+        vocab_size = len(self.vocab)
+
+        base_terms = np.repeat(np.arange(self.offsets.size - 1, dtype=np.int64), np.diff(self.offsets))
+        d_terms, d_docs, d_tfs = [], [], []
+        for tid, posts in self._delta.items():
+            d_terms.extend([tid] * len(posts))
+            d_docs.extend(p[0] for p in posts)
+            d_tfs.extend(p[1] for p in posts)
+
+        terms = np.concatenate([base_terms, np.asarray(d_terms, dtype=np.int64)])
+        docs = np.concatenate([self.post_docs, np.asarray(d_docs, dtype=np.int32)])
+        tfs = np.concatenate([self.post_tfs, np.asarray(d_tfs, dtype=np.uint16)])
+
+        alive = self.alive[:n_docs]
+        keep = alive[docs]
+        terms, docs, tfs = terms[keep], docs[keep], tfs[keep]
+
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        docs = remap[docs].astype(np.int32)
+
+        order = np.lexsort((docs, terms))
+        self.post_docs = docs[order]
+        self.post_tfs = tfs[order]
+        counts = np.bincount(terms, minlength=vocab_size)
+        self.offsets = np.zeros(vocab_size + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+        alive_idx = np.flatnonzero(alive)
+        self.doc_chunk_ids = [self.doc_chunk_ids[i] for i in alive_idx]
+        self.doc_lens = [self.doc_lens[i] for i in alive_idx]
+        self._doc_lens_np = None
+        self.alive = np.ones(len(self.doc_chunk_ids), dtype=bool)
+        self._doc_of_chunk = {cid: i for i, cid in enumerate(self.doc_chunk_ids)}
+        self._delta = {}
+
+    # ---------- query ----------
+    def _postings(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        lo, hi = (self.offsets[tid], self.offsets[tid + 1]) if tid + 1 < self.offsets.size else (0, 0)
+        docs, tfs = self.post_docs[lo:hi], self.post_tfs[lo:hi]
+        delta = self._delta.get(tid)
+        if delta:
+            dd = np.fromiter((p[0] for p in delta), dtype=np.int32, count=len(delta))
+            dt = np.fromiter((p[1] for p in delta), dtype=np.uint16, count=len(delta))
+            docs, tfs = np.concatenate([docs, dd]), np.concatenate([tfs, dt])
+        return docs, tfs
+
+    def search(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 per visus dokumentus, kuriuose yra bent vienas query terminas.
+        Grąžina (chunk_ids int64, scores float32), nesurūšiuota.
+        """
+        tids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not tids or self._alive_docs == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        if self._doc_lens_np is None:
+            self._doc_lens_np = np.asarray(self.doc_lens, dtype=np.float32)
+        doc_lens = self._doc_lens_np
+        avgdl = self._alive_len / max(self._alive_docs, 1)
+        n = self._alive_docs
+
+        all_docs, all_contrib = [], []
+        for tid in tids:
+            docs, tfs = self._postings(tid)
+            live = self.alive[docs]
+            docs, tfs = docs[live], tfs[live].astype(np.float32)
+            if docs.size == 0:
+                continue
+            df = docs.size
+            idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lens[docs] / avgdl)
+            all_docs.append(docs)
+            all_contrib.append((idf * tfs * (self.k1 + 1.0) / (tfs + norm)).astype(np.float32))
+
+        if not all_docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        docs = np.concatenate(all_docs)
+        uniq, inv = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inv, weights=np.concatenate(all_contrib)).astype(np.float32)
+        chunk_ids = np.asarray(self.doc_chunk_ids, dtype=np.int64)[uniq]
+        return chunk_ids, scores
+
+    # ---------- persistence ----------
+    def save(self, path: str) -> None:
+        self.compact()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        terms = [""] * len(self.vocab)
+        for term, tid in self.vocab.items():
+            terms[tid] = term
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp,
+            terms=np.asarray(terms, dtype=str),
+            doc_chunk_ids=np.asarray(self.doc_chunk_ids, dtype=np.int64),
+            doc_lens=np.asarray(self.doc_lens, dtype=np.int32),
+            offsets=self.offsets,
+            post_docs=self.post_docs,
+            post_tfs=self.post_tfs,
+            params=np.asarray([self.k1, self.b, self.watermark], dtype=np.float64),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as z:
+            k1, b, watermark = z["params"].tolist()
+            idx = cls(k1=k1, b=b)
+            idx.watermark = int(watermark)
+            idx.vocab = {str(t): i for i, t in enumerate(z["terms"].tolist())}
+            idx.doc_chunk_ids = z["doc_chunk_ids"].tolist()
+            idx.doc_lens = z["doc_lens"].tolist()
+            idx.offsets = z["offsets"]
+            idx.post_docs = z["post_docs"]
+            idx.post_tfs = z["post_tfs"]
+        idx.alive = np.ones(len(idx.doc_chunk_ids), dtype=bool)
+        idx._doc_of_chunk = {cid: i for i, cid in enumerate(idx.doc_chunk_ids)}
+        idx._alive_docs = len(idx.doc_chunk_ids)
+        idx._alive_len = int(sum(idx.doc_lens))
+        return idx
+
+
+# -----------------------------
+# DB sync
+# -----------------------------
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+        autocommit=True,
+    )
+
+
+def iter_new_chunks(conn, after_id: int, batch: int, upto_id: int) -> Iterable[List[Tuple[int, str]]]:
+    """
+    Keyset puslapiai per article_chunks.id intervalą (after_id, upto_id].
+    """
+    sql = """
+        SELECT id, chunk_text
+        FROM article_chunks
+        WHERE id > %s AND id <= %s
+        ORDER BY id ASC
+        LIMIT %s
+    """
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(sql, (after_id, upto_id, batch))
+            rows = list(cur.fetchall())
+        if not rows:
+            return
+        yield rows
+        after_id = int(rows[-1][0])
+
+
+def sync_index(conn, index: BM25Index, batch: int = 5000) -> int:
+    """
+    Prideda chunkus tik iki nusistovėjusio id: watermark'as = embedder.settled_id, ne didžiausias matytas
+    id, todėl vėliau commitintas mažesnis id (lygiagretūs chunk workeriai) nepraleidžiamas.
+    """
+    upto = settled_id(conn, "article_chunks")
+    added = 0
+    for rows in iter_new_chunks(conn, index.watermark, batch, upto):
+        for chunk_id, text in rows:
+            index.add(chunk_id, text)
+        added += len(rows)
+    index.watermark = max(index.watermark, upto)
+    return added
+
+
+def default_index_path() -> str:
+    return os.path.join(os.environ.get("SEARCH_INDEX_DIR", ".index"), "bm25.npz")
+
+
+def load_or_sync(conn, path: str) -> BM25Index:
+    """
+    Užkrauna indeksą iš disko ir naujus chunkus prideda tik atmintyje (delta segmentas).
+    Užklausos kelias į diską nerašo: compact() + save() – lexical.py main darbas.
+    """
+    index = BM25Index.load(path) if os.path.exists(path) else BM25Index()
+    sync_index(conn, index)
+    return index
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Build / update BM25 inverted index over article_chunks.")
+    parser.add_argument("--path", type=str, default=default_index_path(), help="Indekso failas (default: $SEARCH_INDEX_DIR/bm25.npz)")
+    parser.add_argument("--rebuild", action="store_true", help="Statyti iš naujo (ignoruoti esamą failą)")
+    parser.add_argument("--batch", type=int, default=5000, help="Kiek chunkų traukti per vieną užklausą (default: 5000)")
+    parser.add_argument("--remove", type=int, action="append", default=None, help="Išimti chunk_id iš indekso (galima kartoti)")
+    args = parser.parse_args()
+
+    required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+    missing = [k for k in required_env if not os.environ.get(k)]
+    if missing:
+        raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+
+    index = BM25Index() if args.rebuild or not os.path.exists(args.path) else BM25Index.load(args.path)
+
+    t0 = time.perf_counter()
+    conn = db_connect()
+    try:
+        added = sync_index(conn, index, args.batch)
+    finally:
+        conn.close()
+
+    removed = sum(index.remove(cid) for cid in (args.remove or []))
+    index.save(args.path)
+
+    print(
+        f"[lexical] done. added={added} removed={removed} docs={index.num_docs} terms={len(index.vocab)} "
+        f"postings={index.post_docs.size} watermark={index.watermark} took={time.perf_counter() - t0:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+# Bendras instrumentavimas visoms stadijoms (spider, chunker, embedder, orchestrator, search).
+#
+# Counter / Gauge / Histogram su label'iais, eksportas Prometheus text formatu:
+#   - METRICS_DIR=/tmp/metrics -> <dir>/<process>.prom (atomic rename, node_exporter textfile stilius)
+#   - METRICS_PORT=9100 -> HTTP /metrics (orchestrator; sujungia ir kitų procesų .prom failus)
+# Profiliavimas (pasirinktinai): PROFILE=chunk,embed (arba all), PROFILER=cprofile|pyinstrument,
+# PROFILE_DIR=.profiles -> per stadiją .prof (pstats / snakeviz) arba .html.
+import os
+import time
+import atexit
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# sekundės; nuo greitų DB write iki lėtų fetch / encode
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+# -----------------------------
+# Metric types
+# -----------------------------
+class _Metric:
+    """
+    Bazė: viena reikšmė label'ių rinkiniui (Counter, Gauge); Histogram render'ina savo bucket'us.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def render(self, const: LabelKey = ()) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_fmt_labels(const + k)} {_fmt_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, n: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + n
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, v: float, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = float(v)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts (ne kumuliatyvūs) + overflow, sum, count]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, v: float, **labels) -> None:
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, v)
+        with self._lock:
+            st = self._values.get(key)
+            if st is None:
+                st = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            st[0][i] += 1
+            st[1] += v
+            st[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def quantile(self, q: float, **labels) -> float:
+        """
+        Apytikslis kvantilis iš bucket'ų (tiesinė interpoliacija, kaip histogram_quantile).
+        """
+        with self._lock:
+            st = self._values.get(_label_key(labels))
+            if not st or not st[2]:
+                return 0.0
+            counts, _, total = list(st[0]), st[1], st[2]
+        rank = q * total
+        cum, lo = 0, 0.0
+        for i, c in enumerate(counts):
+            hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if cum + c >= rank and c:
+                return lo + (hi - lo) * ((rank - cum) / c)
+            cum += c
+            lo = hi
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            keys = list(self._values)
+        out = {}
+        for key in keys:
+            labels = dict(key)
+            with self._lock:
+                _, s, n = self._values[key]
+            name = ",".join(f"{k}={v}" for k, v in key) or "_"
+            out[name] = {
+                "count": n,
+                "mean_ms": round(s / n * 1000.0, 2) if n else 0.0,
+                "p95_ms": round(self.quantile(0.95, **labels) * 1000.0, 2),
+            }
+        return out
+
+    def render(self, const: LabelKey = ()) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, s, n) in items:
+            key = const + key
+            cum = 0
+            for b, c in zip(self.buckets, counts):
+                cum += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, [('le', _fmt_value(b))])} {cum}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(key, [('le', '+Inf')])} {n}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(s)}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {n}")
+        return lines
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help, **kw)
+            elif not isinstance(m, cls):
+                raise ValueError(f"metric {name} already registered as {m.kind}")
+            return m
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def histograms(self) -> Iterable[Histogram]:
+        with self._lock:
+            return [m for m in self._metrics.values() if isinstance(m, Histogram)]
+
+    def render(self, const_labels: Optional[Dict[str, str]] = None) -> str:
+        """
+        Prometheus text exposition; const_labels (pvz. process) pridedami kiekvienai eilutei,
+        kad kelių procesų failai nesusidurtų tomis pačiomis serijomis.
+        """
+        const = tuple((k, str(v)) for k, v in (const_labels or {}).items())
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for m in metrics:
+            body = m.render(const)
+            if not body:
+                continue
+            if m.help:
+                lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(body)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+# -----------------------------
+# Pipeline metrics (vardai vienoje vietoje, kad stadijos nesusikurtų skirtingų)
+# -----------------------------
+FETCH_SECONDS = histogram("pipeline_fetch_seconds", "HTTP fetch latency (download_latency)")
+PARSE_SECONDS = histogram("pipeline_parse_seconds", "HTML parse / extraction time per page")
+DB_WRITE_SECONDS = histogram("pipeline_db_write_seconds", "DB write time per operation")
+DB_READ_SECONDS = histogram("pipeline_db_read_seconds", "DB batch selection time")
+CHUNK_SECONDS = histogram("pipeline_chunk_seconds", "Paragraph split + chunk build time per article")
+ENCODE_SECONDS = histogram("pipeline_encode_seconds", "Embedding encode time per batch")
+SEARCH_SECONDS = histogram("pipeline_search_seconds", "Search latency by phase")
+BATCH_SECONDS = histogram("pipeline_batch_seconds", "Orchestrator stage batch time (non-empty batches)")
+ITEMS = counter("pipeline_items_total", "Items produced by stage (pages, articles, chunks, embeddings, ...)")
+ERRORS = counter("pipeline_errors_total", "Stage errors")
+QUEUE_DEPTH = gauge("pipeline_queue_depth", "Work waiting per queue (urls_due, chunk_backlog, embed_backlog)")
+QUEUE_LAG = gauge("pipeline_queue_lag_seconds", "Age of the oldest unprocessed upstream row")
+
+
+def summary() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Trumpa histogramų santrauka logams: {metric: {labels: {count, mean_ms, p95_ms}}}.
+    """
+    return {h.name: h.summary() for h in REGISTRY.histograms() if h.summary()}
+
+
+# -----------------------------
+# Export
+# -----------------------------
+_process = "main"
+
+
+def merge_exposition(texts: Iterable[str]) -> str:
+    """
+    Kelių .prom tekstų sujungimas: viena HELP/TYPE antraštė per metriką, visos jos serijos kartu
+    (Prometheus atmeta pasikartojančius TYPE ir išmėtytas tos pačios metrikos eilutes).
+    """
+    families: Dict[str, Tuple[Dict[str, str], List[str]]] = {}
+    order: List[str] = []
+    for text in texts:
+        current = None
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            if line.startswith("#"):
+                parts = line.split(None, 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    current = parts[2]
+                    if current not in families:
+                        families[current] = ({}, [])
+                        order.append(current)
+                    families[current][0].setdefault(parts[1], line)
+                continue
+            if current is not None:
+                families[current][1].append(line)
+    out = []
+    for name in order:
+        headers, samples = families[name]
+        out.extend(headers[k] for k in ("HELP", "TYPE") if k in headers)
+        out.extend(samples)
+    return "\n".join(out) + "\n"
+
+
+def _textfiles(path: Optional[str], skip: Optional[str] = None) -> List[str]:
+    if not path or not os.path.isdir(path):
+        return []
+    out = []
+    for fn in sorted(os.listdir(path)):
+        full = os.path.join(path, fn)
+        if fn.endswith(".prom") and fn != skip:
+            try:
+                with open(full, encoding="utf-8") as f:
+                    out.append(f.read())
+            except OSError:
+                continue
+    return out
+
+
+def render(process: Optional[str] = None) -> str:
+    return REGISTRY.render({"process": process or _process})
+
+
+def write_textfile(path: str, process: Optional[str] = None) -> str:
+    """
+    <path>/<process>.prom; rašoma per tmp + rename, kad skaitytojas nepamatytų pusinio failo.
+    """
+    process = process or _process
+    os.makedirs(path, exist_ok=True)
+    target = os.path.join(path, f"{process}.prom")
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render(process))
+    os.replace(tmp, target)
+    return target
+
+
+def start_http_server(port: int, textfile_dir: Optional[str] = None, host: str = "0.0.0.0"):
+    """
+    GET /metrics -> šito proceso registry + kitų procesų (pvz. scrapy subprocess) textfile'ai.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            own = f"{_process}.prom"
+            body = merge_exposition([render()] + _textfiles(textfile_dir, skip=own)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+_configured = False
+
+
+def configure(process: str, interval_sec: float = 15.0, serve_http: bool = False) -> None:
+    """
+    Įjungia eksportą pagal env (kviesti vieną kartą proceso pradžioje):
+      METRICS_DIR  -> periodiškai + atexit rašo <dir>/<process>.prom
+      METRICS_PORT -> HTTP /metrics, jei serve_http (orchestrator; vienas portas per konteinerį)
+    Be env – nieko nedaro (metrikos vis tiek kaupiamos ir matomos per summary()).
+    """
+    global _configured, _process
+    if _configured:
+        return
+    _configured = True
+    _process = process
+
+    textfile_dir = os.environ.get("METRICS_DIR", "").strip()
+    port = os.environ.get("METRICS_PORT", "").strip()
+
+    if textfile_dir:
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval_sec):
+                try:
+                    write_textfile(textfile_dir)
+                except OSError:
+                    pass
+
+        threading.Thread(target=loop, name="metrics-textfile", daemon=True).start()
+
+        def flush():
+            stop.set()
+            try:
+                write_textfile(textfile_dir)
+            except OSError:
+                pass
+
+        atexit.register(flush)
+
+    if port and serve_http:
+        start_http_server(int(port), textfile_dir or None)
+
+
+# -----------------------------
+# Profiling
+# -----------------------------
+def profile_enabled(stage: str) -> bool:
+    wanted = {s.strip() for s in os.environ.get("PROFILE", "").split(",") if s.strip()}
+    return "all" in wanted or stage in wanted
+
+
+@contextmanager
+def profiled(stage: str, enabled: Optional[bool] = None):
+    """
+    cProfile (default) arba pyinstrument (PROFILER=pyinstrument, jei įdiegtas) apie bloką.
+    Abu profiliuoja tik einamąjį thread'ą, todėl orchestratoriuje apgaubiamas kiekvieno
+    workerio ciklas atskirai -> PROFILE_DIR/<stage>-<pid>-<thread>.prof|.html.
+    """
+    if enabled is None:
+        enabled = profile_enabled(stage)
+    if not enabled:
+        yield
+        return
+
+    out_dir = os.environ.get("PROFILE_DIR", ".profiles")
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{stage}-{os.getpid()}-{threading.current_thread().name}")
+
+    if os.environ.get("PROFILER", "cprofile").strip().lower() == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            Profiler = None
+        if Profiler is not None:
+            prof = Profiler()
+            prof.start()
+            try:
+                yield
+            finally:
+                prof.stop()
+                with open(base + ".html", "w", encoding="utf-8") as f:
+                    f.write(prof.output_html())
+                print(f"[metrics] profile written: {base}.html", flush=True)
+            return
+        print("[metrics] pyinstrument not installed, falling back to cProfile", flush=True)
+
+    import cProfile
+
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(base + ".prof")
+        print(f"[metrics] profile written: {base}.prof", flush=True)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+import os
+import time
+import hashlib
+import argparse
+import importlib.util
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+# db/init/*.sql = bazinė schema (tik tuščiam volume); viskas po to – db/migrations/
+DEFAULT_MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "db", "migrations")
+LOCK_NAME = "schema_migrations"
+
+
+def migrations_dir() -> str:
+    return os.environ.get("MIGRATIONS_DIR") or DEFAULT_MIGRATIONS_DIR
+
+
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+        autocommit=True,
+    )
+
+
+# -----------------------------
+# Migration files
+# -----------------------------
+def list_migrations(path: str) -> List[Tuple[str, str]]:
+    """
+    NNN_name.sql / NNN_name.py, surūšiuota pagal vardą.
+    Grąžina [(version, file_path)], version = failo vardas be plėtinio.
+    """
+    if not os.path.isdir(path):
+        return []
+    out = []
+    for fn in sorted(os.listdir(path)):
+        stem, ext = os.path.splitext(fn)
+        if ext in (".sql", ".py") and stem[:1].isdigit():
+            out.append((stem, os.path.join(path, fn)))
+    return out
+
+
+def file_checksum(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def split_sql(text: str) -> List[str]:
+    """
+    Paprastas skaidymas: sakinys baigiasi ';' eilutės gale, '--' eilutės praleidžiamos.
+    (Migracijose nerašom ';' string'ų viduje ir DELIMITER blokų.)
+    """
+    stmts, buf = [], []
+    for line in text.splitlines():
+        if line.strip().startswith("--"):
+            continue
+        buf.append(line)
+        if line.rstrip().endswith(";"):
+            stmt = "\n".join(buf).strip().rstrip(";").strip()
+            if stmt:
+                stmts.append(stmt)
+            buf = []
+    tail = "\n".join(buf).strip()
+    if tail:
+        stmts.append(tail)
+    return stmts
+
+
+def _apply_sql(conn, path: str, log: Callable[[str], None]) -> None:
+    with open(path, encoding="utf-8") as f:
+        stmts = split_sql(f.read())
+    with conn.cursor() as cur:
+        for stmt in stmts:
+            cur.execute(stmt)
+            # ANALYZE ir pan. grąžina result set
+            cur.fetchall()
+
+
+def _apply_py(conn, path: str, log: Callable[[str], None]) -> None:
+    """
+    Python migracija: modulis su up(conn, log) – kai vieno SQL failo neužtenka
+    (pvz. shadow_swap su batch'ais, schema priklauso nuo duomenų).
+    """
+    spec = importlib.util.spec_from_file_location(f"migration_{os.path.basename(path)[:-3]}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.up(conn, log)
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def ensure_migrations_table(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+              version VARCHAR(255) PRIMARY KEY,
+              checksum CHAR(64) NOT NULL,
+              duration_ms INT NOT NULL,
+              applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            ) CHARACTER SET utf8mb4
+            """
+        )
+
+
+def applied_migrations(conn) -> Dict[str, str]:
+    with conn.cursor() as cur:
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        return {v: c for v, c in cur.fetchall()}
+
+
+def run_migrations(
+    conn,
+    path: Optional[str] = None,
+    dry_run: bool = False,
+    lock_timeout: int = 600,
+    log: Callable[[str], None] = print,
+) -> List[str]:
+    """
+    Pritaiko dar nepritaikytas migracijas eilės tvarka; grąžina pritaikytų version'us.
+
+    MariaDB DDL daro implicit commit, todėl migracija nėra atominė: kiekviena turi būti
+    idempotentiška (IF NOT EXISTS / patikrinimas prieš darant), kad po nutrūkimo ją būtų
+    galima tiesiog paleisti iš naujo. Įrašas į schema_migrations – tik po sėkmės.
+    GET_LOCK: scheduleris ir rankinis paleidimas vienu metu nemigruoja.
+    """
+    path = path or migrations_dir()
+    with conn.cursor() as cur:
+        cur.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, lock_timeout))
+        if cur.fetchone()[0] != 1:
+            raise RuntimeError(f"Could not acquire migration lock '{LOCK_NAME}' in {lock_timeout}s")
+    try:
+        ensure_migrations_table(conn)
+        done = applied_migrations(conn)
+        applied = []
+        for version, file_path in list_migrations(path):
+            checksum = file_checksum(file_path)
+            if version in done:
+                if done[version] != checksum:
+                    log(f"[migrate] WARNING {version} changed after it was applied (checksum mismatch), not re-running")
+                continue
+            if dry_run:
+                log(f"[migrate] pending {version}")
+                applied.append(version)
+                continue
+
+            log(f"[migrate] applying {version} ...")
+            t0 = time.perf_counter()
+            if file_path.endswith(".py"):
+                _apply_py(conn, file_path, log)
+            else:
+                _apply_sql(conn, file_path, log)
+            took_ms = int((time.perf_counter() - t0) * 1000)
+
+            with conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, checksum, duration_ms) VALUES (%s, %s, %s)",
+                    (version, checksum, took_ms),
+                )
+            log(f"[migrate] applied {version} in {took_ms} ms")
+            applied.append(version)
+        return applied
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cur.fetchall()
+
+
+# -----------------------------
+# Online-safe table rebuild (naudoja .py migracijos)
+# -----------------------------
+def _table_columns(conn, table: str) -> List[str]:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY ORDINAL_POSITION
+            """,
+            (table,),
+        )
+        return [r[0] for r in cur.fetchall()]
+
+
+def table_exists(conn, table: str) -> bool:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table,),
+        )
+        return int(cur.fetchone()[0]) > 0
+
+
+def shadow_swap(
+    conn,
+    table: str,
+    alter_shadow: List[str],
+    batch: int = 10_000,
+    id_gap: int = 100_000,
+    log: Callable[[str], None] = print,
+) -> None:
+    """
+    Perstato append-only lentelę (id AUTO_INCREMENT) neblokuodamas rašymų:
+      1) {table}__new = CREATE TABLE LIKE (be FK) + alter_shadow ('{shadow}' -> vardas);
+      2) kopija id keyset batch'ais, kol senoji toliau priima INSERT'us;
+      3) AUTO_INCREMENT naujoje = MAX(id) + id_gap (kad nauji id nesusidurtų su vėluojančiais);
+      4) atominis RENAME TABLE {table} -> {table}__old, {table}__new -> {table};
+      5) dokopijuojamos eilutės, įrašytos į senąją tarp paskutinio batch'o ir RENAME.
+    UPDATE/DELETE senoje lentelėje kopijavimo metu neperkeliami – todėl tik append-only lentelėms.
+    {table}__old paliekama (rollback; jei lentelė buvo tuščia – ištrinama); ištrinti rankiniu būdu po patikrinimo.
+    """
+    shadow = f"{table}__new"
+    old = f"{table}__old"
+    if table_exists(conn, old):
+        raise RuntimeError(f"{old} already exists: drop it (or rename back) before rebuilding {table}")
+
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS `{shadow}`")
+        cur.execute(f"CREATE TABLE `{shadow}` LIKE `{table}`")
+        for stmt in alter_shadow:
+            cur.execute(stmt.format(shadow=f"`{shadow}`"))
+
+    cols = ", ".join(f"`{c}`" for c in _table_columns(conn, table))
+    copy_sql = f"INSERT IGNORE INTO `{{dst}}` ({cols}) SELECT {cols} FROM `{{src}}` WHERE id > %s AND id <= %s"
+
+    def copy_range(src: str, dst: str, lo: int, hi: int) -> int:
+        with conn.cursor() as cur:
+            return cur.execute(copy_sql.format(src=src, dst=dst), (lo, hi))
+
+    def max_id(t: str) -> int:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM `{t}`")
+            return int(cur.fetchone()[0])
+
+    t0 = time.perf_counter()
+    last, copied, batches = 0, 0, 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT id FROM `{table}` WHERE id > %s ORDER BY id ASC LIMIT 1 OFFSET %s",
+                (last, batch - 1),
+            )
+            row = cur.fetchone()
+        hi = int(row[0]) if row else max_id(table)
+        if hi <= last:
+            break
+        copied += copy_range(table, shadow, last, hi)
+        last = hi
+        batches += 1
+        if batches % 20 == 0:
+            rate = copied / max(time.perf_counter() - t0, 1e-9)
+            log(f"[migrate] {table}: copied {copied} rows ({rate:.0f}/s)")
+
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE `{shadow}` AUTO_INCREMENT = %s", (max_id(table) + id_gap,))
+    # paskutinis catch-up prieš swap, kad po jo liktų tik kelios eilutės
+    hi = max_id(table)
+    copied += copy_range(table, shadow, last, hi)
+    last = hi
+
+    with conn.cursor() as cur:
+        cur.execute(f"RENAME TABLE `{table}` TO `{old}`, `{shadow}` TO `{table}`")
+    late = copy_range(old, table, last, max_id(old))
+
+    if copied + late == 0:
+        # tuščia lentelė (pvz. naujas volume) – rollback kopija nereikalinga
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE `{old}`")
+        log(f"[migrate] {table}: swapped (empty table)")
+        return
+    log(
+        f"[migrate] {table}: swapped, {copied + late} rows copied in {time.perf_counter() - t0:.1f}s "
+        f"({late} after swap); old table kept as {old}"
+    )
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations (db/migrations) and record them in schema_migrations.")
+    parser.add_argument("--dir", type=str, default=None, help="Migracijų katalogas (default: $MIGRATIONS_DIR arba ../db/migrations)")
+    parser.add_argument("--status", action="store_true", help="Tik parodyti pritaikytas / laukiančias migracijas")
+    parser.add_argument("--dry-run", action="store_true", help="Parodyti, kas būtų pritaikyta")
+    args = parser.parse_args()
+
+    required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+    missing = [k for k in required_env if not os.environ.get(k)]
+    if missing:
+        raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+
+    path = args.dir or migrations_dir()
+    conn = db_connect()
+    try:
+        if args.status:
+            ensure_migrations_table(conn)
+            done = applied_migrations(conn)
+            for version, file_path in list_migrations(path):
+                state = "applied" if version in done else "pending"
+                if version in done and done[version] != file_checksum(file_path):
+                    state = "applied (changed!)"
+                print(f"{version}\t{state}")
+            return
+
+        applied = run_migrations(conn, path, dry_run=args.dry_run)
+        if not applied:
+            print("[migrate] up to date")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+# "hash:<dims>" -> HashingEncoder (be torch / HF; benchmark'ams ir offline testams)
+HASH_PREFIX = "hash:"
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEncoder:
+    """
+    Mažas deterministinis stand-in modelis su SentenceTransformer.encode() sąsaja:
+    feature hashing per žodžius (crc32 -> stulpelis, kitas bitas -> ženklas).
+    Semantikos nėra, bet bendri žodžiai duoda cosine > 0, todėl known-item paieška veikia,
+    o pipeline (encode -> insert -> load -> rank) kaina matuojama be modelio svorių.
+    """
+
+    def __init__(self, dims: int = 384):
+        if dims <= 0:
+            raise ValueError(f"dims must be > 0, got {dims}")
+        self.dims = dims
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dims
+
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+    ) -> np.ndarray:
+        out = np.zeros((len(texts), self.dims), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for tok in _TOKEN_RE.findall(text.lower()):
+                h = zlib.crc32(tok.encode("utf-8"))
+                out[i, h % self.dims] += 1.0 if (h >> 31) & 1 else -1.0
+        if normalize_embeddings:
+            out /= np.linalg.norm(out, axis=1, keepdims=True) + 1e-12
+        return out
+
+
+def is_stub_model(name: str) -> bool:
+    return name.startswith(HASH_PREFIX)
+
+
+def load_model(name: str, device=None):
+    """
+    Modelio vardas kaip embeddings.model: HF vardas -> SentenceTransformer,
+    "hash:384" -> HashingEncoder(384). sentence_transformers (torch) importuojamas tik čia.
+    """
+    if is_stub_model(name):
+        dims = name[len(HASH_PREFIX):].strip()
+        return HashingEncoder(int(dims) if dims else 384)
+
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(name, device=device)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+import os
+import re
+import time
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+from chunker import CHUNK_DUPLICATE
+
+
+# 64 bitai = BANDS juostos po BAND_BITS; Hamming <= MAX_DISTANCE < BANDS garantuoja,
+# kad bent viena juosta sutampa (pigeonhole), todėl LSH kandidatų paieška nepraleidžia dublikatų.
+SIMHASH_BITS = 64
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+MAX_DISTANCE = 3
+SHINGLE_WORDS = 2
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_BIT_SHIFTS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+
+
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+        autocommit=True,
+    )
+
+
+# -----------------------------
+# SimHash
+# -----------------------------
+def simhash(text: str, shingle: int = SHINGLE_WORDS) -> Optional[int]:
+    """
+    64 bitų SimHash per žodžių n-gramas (lowercase, default bigramos). None -> per trumpas tekstas.
+    Vienas pakeistas žodis paliečia tik ~shingle n-gramų, todėl pirštų atspaudas beveik nesikeičia.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < shingle:
+        return None
+    grams = [" ".join(tokens[i:i + shingle]) for i in range(len(tokens) - shingle + 1)]
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+    # kiekvienam bitui: +1 jei n-gramos hash'e bitas 1, -1 jei 0
+    ones = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).sum(axis=0)
+    bits = (ones * 2 > len(grams)).astype(np.uint64)
+    return int((bits << _BIT_SHIFTS).sum())
+
+
+def bands(h: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(h >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# -----------------------------
+# LSH index (article_simhash_bands)
+# -----------------------------
+def find_near_duplicate(conn, h: int, max_distance: int = MAX_DISTANCE) -> Optional[Tuple[int, int]]:
+    """
+    (article_id, distance) artimiausiam jau indeksuotam originalui su Hamming <= max_distance; None jei nėra.
+    Kandidatai = straipsniai, kurių bent viena juosta sutampa (BANDS PK lookup'ų).
+    """
+    parts = bands(h)
+    where = " OR ".join(["(b.band = %s AND b.band_value = %s)"] * BANDS)
+    params: List[int] = []
+    for i, v in enumerate(parts):
+        params += [i, v]
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT DISTINCT a.id, a.simhash
+            FROM article_simhash_bands b
+            JOIN articles a ON a.id = b.article_id
+            WHERE {where}
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+
+    best = None
+    for article_id, other in rows:
+        if other is None:
+            continue
+        d = hamming(h, int(other))
+        if d <= max_distance and (best is None or (d, article_id) < (best[1], best[0])):
+            best = (int(article_id), d)
+    return best
+
+
+def classify(conn, text: str, max_distance: int = MAX_DISTANCE) -> Tuple[Optional[int], Optional[int], int]:
+    """
+    Naujam straipsniui prieš INSERT: (simhash, duplicate_of, chunk_status).
+    Dublikatas -> chunk_status = CHUNK_DUPLICATE, todėl jo nekapoja chunkeris ir neembedina embedderis.
+    """
+    h = simhash(text or "")
+    hit = find_near_duplicate(conn, h, max_distance) if h is not None else None
+    if hit is None:
+        return h, None, 0
+    return h, hit[0], CHUNK_DUPLICATE
+
+
+def classify_batch(
+    conn, hashes: List[Optional[int]], max_distance: int = MAX_DISTANCE
+) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    classify atitikmuo paketui (backfill.py): visų paketo juostų kandidatai – viena IN užklausa,
+    dublikatai paketo viduje – per juostų dict'ą (tik paketo originalai, kaip ir indekse).
+    Kiekvienam hash'ui (duplicate_of, batch_original): duplicate_of – jau esamas article_id,
+    batch_original – ankstesnio paketo originalo indeksas hashes sąraše (jo id dar nežinomas);
+    abu None -> originalas. Lygus atstumas -> pirmenybė jau esamam straipsniui.
+    """
+    wanted: Dict[int, set] = {}
+    for h in hashes:
+        if h is not None:
+            for i, v in enumerate(bands(h)):
+                wanted.setdefault(i, set()).add(v)
+
+    candidates: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+    if wanted:
+        where, params = [], []
+        for band, values in sorted(wanted.items()):
+            where.append(f"(b.band = %s AND b.band_value IN ({', '.join(['%s'] * len(values))}))")
+            params += [band] + sorted(values)
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                SELECT b.band, b.band_value, a.id, a.simhash
+                FROM article_simhash_bands b
+                JOIN articles a ON a.id = b.article_id
+                WHERE {" OR ".join(where)}
+                """,
+                params,
+            )
+            for band, value, article_id, other in cur.fetchall():
+                if other is not None:
+                    candidates.setdefault((int(band), int(value)), []).append((int(article_id), int(other)))
+
+    out: List[Tuple[Optional[int], Optional[int]]] = []
+    local: Dict[Tuple[int, int], List[int]] = {}
+    for idx, h in enumerate(hashes):
+        if h is None:
+            out.append((None, None))
+            continue
+        keys = list(enumerate(bands(h)))
+        best = None  # (atstumas, 0 = DB / 1 = paketas, article_id / indeksas)
+        for key in keys:
+            for article_id, other in candidates.get(key, ()):
+                d = hamming(h, other)
+                if d <= max_distance and (best is None or (d, 0, article_id) < best):
+                    best = (d, 0, article_id)
+            for j in local.get(key, ()):
+                d = hamming(h, hashes[j])
+                if d <= max_distance and (best is None or (d, 1, j) < best):
+                    best = (d, 1, j)
+        if best is None:
+            for key in keys:
+                local.setdefault(key, []).append(idx)
+            out.append((None, None))
+        elif best[1] == 0:
+            out.append((best[2], None))
+        else:
+            out.append((None, best[2]))
+    return out
+
+
+def index_article(conn, article_id: int, h: int) -> None:
+    with conn.cursor() as cur:
+        cur.executemany(
+            "INSERT IGNORE INTO article_simhash_bands (band, band_value, article_id) VALUES (%s, %s, %s)",
+            [(i, v, article_id) for i, v in enumerate(bands(h))],
+        )
+
+
+def backfill(conn, batch: int = 1000, log=print) -> Tuple[int, int]:
+    """
+    Esamiems straipsniams (simhash IS NULL): apskaičiuoja ir įdeda į LSH indeksą.
+    Esami straipsniai nežymimi dublikatais (jie jau sukapoti / embedinti) – tik naujiems bus su kuo lyginti.
+    """
+    done, last_id = 0, 0
+    t0 = time.perf_counter()
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT id, text FROM articles
+                WHERE id > %s AND simhash IS NULL AND duplicate_of IS NULL
+                ORDER BY id LIMIT %s
+                """,
+                (last_id, batch),
+            )
+            rows = cur.fetchall()
+        if not rows:
+            break
+        for article_id, text in rows:
+            h = simhash(text or "")
+            if h is None:
+                continue
+            with conn.cursor() as cur:
+                cur.execute("UPDATE articles SET simhash = %s WHERE id = %s", (h, article_id))
+            index_article(conn, article_id, h)
+            done += 1
+        last_id = int(rows[-1][0])
+        log(f"[neardup] backfill: {done} articles indexed (last id {last_id})")
+    return done, int(time.perf_counter() - t0)
+
+
+def report(conn) -> Dict[str, float]:
+    """
+    Dublikatų dalis ir kiek chunk / embedding darbo sutaupyta (vid. chunkų per originalą x dublikatai).
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*), SUM(duplicate_of IS NOT NULL) FROM articles")
+        total, dups = cur.fetchone()
+        cur.execute("SELECT COUNT(*), COUNT(DISTINCT article_id) FROM article_chunks")
+        chunks, chunked_articles = cur.fetchone()
+    total, dups = int(total or 0), int(dups or 0)
+    avg_chunks = (int(chunks or 0) / int(chunked_articles)) if chunked_articles else 0.0
+    return {
+        "articles": total,
+        "near_duplicates": dups,
+        "duplicate_rate": round(dups / total, 4) if total else 0.0,
+        "avg_chunks_per_article": round(avg_chunks, 2),
+        "chunks_avoided_est": int(round(dups * avg_chunks)),
+    }
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate articles (SimHash + LSH bands): backfill index / report duplicate rate.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("backfill", help="Apskaičiuoti simhash esamiems straipsniams ir įdėti į LSH indeksą")
+    p.add_argument("--batch", type=int, default=1000)
+    sub.add_parser("report", help="Dublikatų dalis ir sutaupytas chunk / embedding darbas")
+    args = parser.parse_args()
+
+    required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+    missing = [k for k in required_env if not os.environ.get(k)]
+    if missing:
+        raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+
+    conn = db_connect()
+    try:
+        if args.cmd == "backfill":
+            n, took = backfill(conn, args.batch)
+            print(f"[neardup] done, {n} articles indexed in {took}s")
+        else:
+            for k, v in report(conn).items():
+                print(f"{k}\t{v}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
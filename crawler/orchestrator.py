@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+import chunker
+import embedder
+import metrics
+import migrate
+import models
+import partitions
+import reembed
+from sources import load_sources
+
+
+def _env_int(name: str, default: int) -> int:
+    v = os.environ.get(name, "")
+    return int(v) if v.strip() else default
+
+
+def _env_float(name: str, default: float) -> float:
+    v = os.environ.get(name, "")
+    return float(v) if v.strip() else default
+
+
+def _env_str(name: str, default: str) -> str:
+    v = os.environ.get(name)
+    return v if v is not None else default
+
+
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+        autocommit=True,
+    )
+
+
+# -----------------------------
+# Watermarks / lag
+# -----------------------------
+def embedded_chunk_max(conn, model_name: str, shards: int) -> Optional[int]:
+    """
+    Modelio watermark'as dabartiniam shard'ų išdėstymui (EMBED_WORKERS): MIN tik per jo eilutes.
+    Senų išdėstymų eilutės (pvz. (model, 1, 0) po EMBED_WORKERS padidinimo) nebejuda ir kitaip
+    amžinai laikytų backlog'ą. Trūkstamam shard'ui – tas pats fallback kaip embedder.get_watermark.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT COUNT(*), MIN(last_chunk_id) FROM embedding_watermarks WHERE model = %s AND shards = %s",
+            (model_name, shards),
+        )
+        count, low = cur.fetchone()
+        if count and int(count) >= shards:
+            return int(low)
+        cur.execute("SELECT MIN(last_chunk_id) FROM embedding_watermarks WHERE model = %s", (model_name,))
+        row = cur.fetchone()
+        return None if not row or row[0] is None else int(row[0])
+
+
+def read_watermarks(conn, model_names: List[str], scopes: List[str], shards: int = 1) -> Dict[str, Optional[int]]:
+    """
+    Pigūs (indeksuoti) skaitymai: kiek toli kiekviena stadija nuo savo upstream.
+    Chunkeris: articles.chunk_status; embedderis: embedding_watermarks (žr. 004_work_queue_state.sql),
+    labiausiai atsilikęs iš live modelių (serving + migruojami), žr. embedded_chunk_max.
+    scopes: crawlinamų šaltinių scope'ai – urls_due skaičiuoja tik eilutes, kurias spider'is gali paimti
+    (scope NULL, išjungti / --sources nepasirinkti šaltiniai niekada neclaim'inami).
+    """
+    def one(sql: str, params=()):
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            row = cur.fetchone()
+            return None if not row or row[0] is None else int(row[0])
+
+    embedded = [v for v in (embedded_chunk_max(conn, m, shards) for m in model_names) if v is not None]
+    wm = {
+        "chunk_pending": one("SELECT COUNT(*) FROM articles WHERE chunk_status = 0"),
+        "chunks_max": one("SELECT MAX(id) FROM article_chunks"),
+        "embedded_chunk_max": min(embedded) if embedded else None,
+        # tas pats filtras kaip spider'io _claim_next_url (ix_urls_claim)
+        "urls_due": one(
+            "SELECT COUNT(*) FROM urls WHERE status='queued' AND scope IN ("
+            + ", ".join(["%s"] * len(scopes))
+            + ") AND (next_fetch_at IS NULL OR next_fetch_at <= NOW())",
+            tuple(scopes),
+        ) if scopes else 0,
+        # perembedinimo likutis (chunk id intervalas, ne tikslus eilučių skaičius)
+        "reembed_pending": one(
+            "SELECT SUM(GREATEST(backfill_upto - backfill_chunk_id, 0)) FROM embedding_models WHERE state = 'migrating'"
+        ),
+    }
+    # sekundės nuo seniausio dar neapdoroto upstream įrašo sukūrimo
+    wm["chunk_lag_s"] = one(
+        "SELECT TIMESTAMPDIFF(SECOND, created_at, NOW()) FROM articles WHERE chunk_status = 0 ORDER BY id ASC LIMIT 1"
+    )
+    wm["embed_lag_s"] = one(
+        "SELECT TIMESTAMPDIFF(SECOND, created_at, NOW()) FROM article_chunks WHERE id > %s ORDER BY id ASC LIMIT 1",
+        (wm["embedded_chunk_max"] or 0,),
+    )
+    return wm
+
+
+# -----------------------------
+# Stages
+# -----------------------------
+class Stage:
+    """
+    Stadija = N worker thread'ų, kurie kartoja run_batch(worker, conn), kol yra darbo.
+    Kai darbo nėra – laukia wake event'o (upstream stadija jį pažadina) arba poll timeout'o.
+    blocked() -> True reiškia backpressure: downstream per daug atsilikęs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        run_batch: Callable[[int, object], int],
+        poll_sec: float,
+        stop: threading.Event,
+        downstream: Optional["Stage"] = None,
+        blocked: Optional[Callable[[], bool]] = None,
+        connect: Callable[[], object] = db_connect,
+    ):
+        self.name = name
+        self.workers = max(1, workers)
+        self.run_batch = run_batch
+        self.poll_sec = poll_sec
+        self.stop = stop
+        self.downstream = downstream
+        self.blocked = blocked or (lambda: False)
+        self.connect = connect
+        self.wake = threading.Event()
+
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.batches = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.paused = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for w in range(self.workers):
+            t = threading.Thread(target=self._loop, args=(w,), name=f"{self.name}-{w}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def join(self, timeout: float) -> None:
+        for t in self._threads:
+            t.join(timeout)
+
+    def _loop(self, worker: int) -> None:
+        # PROFILE=chunk,embed -> kiekvienas workerio thread'as profiliuojamas atskirai
+        with metrics.profiled(self.name):
+            self._run(worker)
+
+    def _run(self, worker: int) -> None:
+        conn = None
+        while not self.stop.is_set():
+            if self.blocked():
+                self.paused = True
+                self.stop.wait(self.poll_sec)
+                continue
+            self.paused = False
+
+            try:
+                if conn is None:
+                    conn = self.connect()
+                t0 = time.perf_counter()
+                n = self.run_batch(worker, conn)
+                took = time.perf_counter() - t0
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                metrics.ERRORS.inc(stage=self.name)
+                print(f"[orchestrator] {self.name}-{worker} error: {e!r}", flush=True)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                conn = None
+                self.stop.wait(self.poll_sec)
+                continue
+
+            if n:
+                metrics.BATCH_SECONDS.observe(took, stage=self.name)
+                with self._lock:
+                    self.processed += n
+                    self.batches += 1
+                    self.busy_s += took
+                if self.downstream is not None:
+                    self.downstream.wake.set()
+                continue
+
+            # nėra darbo -> laukiam upstream signalo arba poll
+            self.wake.wait(self.poll_sec)
+            self.wake.clear()
+
+        if conn is not None:
+            conn.close()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            rate = self.processed / self.busy_s if self.busy_s > 0 else 0.0
+            return {
+                "processed": self.processed,
+                "batches": self.batches,
+                "errors": self.errors,
+                "per_s_busy": round(rate, 2),
+                "paused": self.paused,
+            }
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="In-process pipeline orchestrator: crawl -> chunk -> embed as concurrent stages.")
+    # crawl
+    parser.add_argument("--spider", type=str, default="news_queue")
+    parser.add_argument("--sources", type=str, default=_env_str("CRAWL_SOURCES", ""), help="Šaltiniai (name / domain, per kablelį); tuščia = visi enabled")
+    parser.add_argument("--pagecount", type=int, default=_env_int("CLOSESPIDER_PAGECOUNT", 50), help="Puslapių limitas vienam spider paleidimui")
+    parser.add_argument("--crawl-idle-min", type=float, default=float(_env_int("CRAWL_EVERY_MIN", 15)), help="Max miego laikas, kai eilėje nėra URL (min)")
+    parser.add_argument("--parse-workers", type=int, default=_env_int("PARSE_WORKERS", 0), help="HTML ištraukimo procesų skaičius spider'yje; 0 = reactor thread'e")
+    parser.add_argument("--no-crawl", action="store_true", help="Nepaleisti spider'io (tik chunk + embed)")
+    # chunk
+    parser.add_argument("--chunk-limit", type=int, default=_env_int("CHUNK_LIMIT", 200))
+    parser.add_argument("--target-chars", type=int, default=_env_int("CHUNK_TARGET_CHARS", 1800))
+    parser.add_argument("--max-chars", type=int, default=_env_int("CHUNK_MAX_CHARS", 2600))
+    parser.add_argument("--overlap-paras", type=int, default=_env_int("CHUNK_OVERLAP_PARAS", 1))
+    parser.add_argument("--chunk-workers", type=int, default=_env_int("CHUNK_WORKERS", 1))
+    # embed
+    parser.add_argument("--model", type=str, default=_env_str("EMBED_MODEL", "intfloat/multilingual-e5-small"))
+    parser.add_argument("--embed-limit", type=int, default=_env_int("EMBED_LIMIT", 200))
+    parser.add_argument("--batch-size", type=int, default=_env_int("EMBED_BATCH_SIZE", 16))
+    parser.add_argument("--device", type=str, default=_env_str("EMBED_DEVICE", ""))
+    parser.add_argument("--normalize", type=int, choices=(0, 1), default=_env_int("EMBED_NORMALIZE", 1))
+    parser.add_argument("--prefix", type=str, default=_env_str("EMBED_PREFIX", "passage: "))
+    parser.add_argument("--embed-workers", type=int, default=_env_int("EMBED_WORKERS", 1))
+    # model upgrade (reembed.py start <model>)
+    parser.add_argument("--reembed-limit", type=int, default=_env_int("REEMBED_LIMIT", 64), help="Perembedinimo paketo dydis (chunkais)")
+    parser.add_argument("--reembed-rps", type=float, default=_env_float("REEMBED_ROWS_PER_SEC", 20.0), help="Perembedinimo biudžetas eilutėmis per sekundę, 0 = neribota")
+    parser.add_argument("--reembed-cpu", type=float, default=_env_float("REEMBED_CPU_SHARE", 0.25), help="Perembedinimo darbo laiko dalis (0..1]")
+    parser.add_argument("--reembed-max-backlog", type=int, default=_env_int("REEMBED_MAX_BACKLOG", 200), help="Perembedinimo pauzė, kai tiek šviežių chunkų laukia embeddingo")
+    parser.add_argument("--switch-check-sec", type=float, default=_env_float("REEMBED_SWITCH_CHECK_SEC", 60.0), help="Kas kiek sekundžių tikrinti naujo modelio coverage")
+    # flow control
+    parser.add_argument("--max-chunk-backlog", type=int, default=_env_int("MAX_CHUNK_BACKLOG", 2000), help="Crawl pauzė, kai tiek straipsnių laukia chunkinimo")
+    parser.add_argument("--max-embed-backlog", type=int, default=_env_int("MAX_EMBED_BACKLOG", 5000), help="Chunk pauzė, kai tiek chunkų laukia embeddingo")
+    parser.add_argument("--poll-sec", type=float, default=5.0, help="Kaip dažnai tikrinti DB, kai nėra signalo iš upstream")
+    parser.add_argument("--metrics-every", type=float, default=60.0, help="Kas kiek sekundžių loginti lag metrikas")
+    parser.add_argument("--profile", type=str, default=_env_str("PROFILE", ""), help="Stadijos profiliavimui, pvz. chunk,embed arba all (-> $PROFILE_DIR)")
+    # schema
+    parser.add_argument("--no-migrate", action="store_true", help="Nepaleisti db/migrations prieš startą")
+    parser.add_argument("--maintain-every-min", type=float, default=float(_env_int("PARTITION_MAINTAIN_MIN", 360)), help="Kas kiek minučių particijų priežiūra (fetches retention, model particijos)")
+    parser.add_argument("--retention-days", type=int, default=_env_int("FETCH_RETENTION_DAYS", partitions.FETCH_RETENTION_DAYS), help="fetches retention dienomis, 0 = netrinti")
+    args = parser.parse_args()
+
+    required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+    missing = [k for k in required_env if not os.environ.get(k)]
+    if missing:
+        raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+
+    if args.profile:
+        # metrics.profiled() skaito PROFILE; scrapy subprocess paveldi env
+        os.environ["PROFILE"] = args.profile
+    metrics.configure("orchestrator", serve_http=True)
+
+    conn = db_connect()
+    try:
+        if not args.no_migrate:
+            migrate.run_migrations(conn, log=lambda m: print(m, flush=True))
+        # EMBED_MODEL tampa serving tik tuščiam registrui; vėliau modelį keičia reembed.py
+        reembed.ensure_serving(conn, args.model)
+    finally:
+        conn.close()
+
+    device = args.device if str(args.device).strip() else None
+    stop = threading.Event()
+    watermarks: Dict[str, Optional[int]] = {}
+    # serving + migruojami modeliai; atnaujinama refresh_watermarks
+    live: Dict[str, List[str]] = {"models": [args.model], "migrating": []}
+
+    def chunk_backlog() -> int:
+        return watermarks.get("chunk_pending") or 0
+
+    def embed_backlog() -> int:
+        return max(0, (watermarks.get("chunks_max") or 0) - (watermarks.get("embedded_chunk_max") or 0))
+
+    # ---------- embed ----------
+    model_lock = threading.Lock()
+    model_holder: Dict[str, object] = {}
+
+    def get_model(model_name: str):
+        with model_lock:
+            # po switch'o retired modelio svoriai nebereikalingi
+            for m in [m for m in model_holder if m not in live["models"]]:
+                del model_holder[m]
+            if model_name not in model_holder:
+                print(f"[orchestrator] loading model: {model_name}", flush=True)
+                model_holder[model_name] = models.load_model(model_name, device=device)
+            return model_holder[model_name]
+
+    def run_embed(worker: int, conn) -> int:
+        # migracijos metu šviežius chunkus gauna ir naujas modelis (jo watermark'as = backfill_upto)
+        total = 0
+        for model_name in live["models"]:
+            requested, _ = embedder.embed_batch(
+                conn,
+                st_model=lambda: get_model(model_name),
+                model_name=model_name,
+                limit=args.embed_limit,
+                batch_size=args.batch_size,
+                normalize=bool(args.normalize),
+                prefix=args.prefix,
+                shard=worker,
+                shards=args.embed_workers,
+                log=lambda m: print(m, flush=True),
+            )
+            total += requested
+        return total
+
+    embed_stage = Stage(
+        "embed", args.embed_workers, run_embed, args.poll_sec, stop,
+        connect=embedder.db_connect,
+    )
+
+    # ---------- reembed (model upgrade backfill) ----------
+    throttle = reembed.Throttle(args.reembed_rps, args.reembed_cpu)
+    last_switch_check: Dict[str, float] = {}
+
+    def run_reembed(worker: int, conn) -> int:
+        total = 0
+        for model_name in list(live["migrating"]):
+            t0 = time.perf_counter()
+            requested, _ = reembed.backfill_batch(
+                conn,
+                st_model=lambda: get_model(model_name),
+                model_name=model_name,
+                limit=args.reembed_limit,
+                batch_size=args.batch_size,
+                normalize=bool(args.normalize),
+                prefix=args.prefix,
+                log=lambda m: print(m, flush=True),
+            )
+            busy = time.perf_counter() - t0
+            now = time.monotonic()
+            if not requested or now - last_switch_check.get(model_name, 0.0) >= args.switch_check_sec:
+                last_switch_check[model_name] = now
+                reembed.maybe_switch(conn, model_name, log=lambda m: print(m, flush=True))
+            total += requested
+            # biudžetas: pauzė po paketo (stop -> pabundam iškart)
+            stop.wait(throttle.pause_after(requested, busy))
+        return total
+
+    # fresh chunkai pirmiau: kol live embedderis atsilikęs, backfill stovi
+    reembed_stage = Stage(
+        "reembed", 1, run_reembed, args.switch_check_sec, stop,
+        blocked=lambda: embed_backlog() > args.reembed_max_backlog,
+        connect=reembed.db_connect,
+    )
+
+    # ---------- chunk ----------
+    def run_chunk(worker: int, conn) -> int:
+        fetched, _, _ = chunker.chunk_batch(
+            conn,
+            limit=args.chunk_limit,
+            target_chars=args.target_chars,
+            max_chars=args.max_chars,
+            overlap_paras=args.overlap_paras,
+            shard=worker,
+            shards=args.chunk_workers,
+            log=lambda m: print(m, flush=True),
+        )
+        return fetched
+
+    chunk_stage = Stage(
+        "chunk", args.chunk_workers, run_chunk, args.poll_sec, stop,
+        downstream=embed_stage,
+        blocked=lambda: embed_backlog() > args.max_embed_backlog,
+        connect=chunker.db_connect,
+    )
+
+    # ---------- crawl ----------
+    crawl_proc: Dict[str, subprocess.Popen] = {}
+
+    def fetches_max(conn) -> int:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM fetches")
+            return int(cur.fetchone()[0])
+
+    def run_crawl(worker: int, conn) -> int:
+        if not watermarks.get("urls_due"):
+            # eilė tuščia: miegam iki crawl_idle_min, bet pabundam kas poll_sec patikrinti
+            return 0
+        cmd = [
+            "scrapy", "crawl", args.spider,
+            "-s", "LOG_LEVEL=INFO",
+            "-s", f"CLOSESPIDER_PAGECOUNT={args.pagecount}",
+        ]
+        if args.sources:
+            cmd += ["-a", f"sources={args.sources}"]
+        if args.parse_workers > 0:
+            cmd += ["-s", f"PARSE_WORKERS={args.parse_workers}"]
+        print(f"[orchestrator] crawl: {' '.join(cmd)}", flush=True)
+        before = fetches_max(conn)
+        proc = subprocess.Popen(cmd, stdout=sys.stdout, stderr=sys.stderr)
+        crawl_proc["p"] = proc
+        rc = proc.wait()
+        crawl_proc.pop("p", None)
+        if rc != 0 and not stop.is_set():
+            raise RuntimeError(f"scrapy exited with code {rc}")
+        # nieko nepaėmė (pvz. kitas crawler'is paėmė tas pačias eilutes) -> laukiam poll, o ne iškart iš naujo
+        return 1 if fetches_max(conn) > before else 0
+
+    crawl_stage = Stage(
+        "crawl", 1, run_crawl, args.crawl_idle_min * 60.0, stop,
+        downstream=chunk_stage,
+        blocked=lambda: chunk_backlog() > args.max_chunk_backlog,
+    )
+
+    # ---------- maintenance ----------
+    def run_maintain(worker: int, conn) -> int:
+        partitions.maintain(
+            conn,
+            models=live["models"],
+            retention_days=args.retention_days,
+            log=lambda m: print(m, flush=True),
+        )
+        # visada 0 -> kitas paleidimas po maintain_every_min
+        return 0
+
+    maintain_stage = Stage("maintain", 1, run_maintain, args.maintain_every_min * 60.0, stop)
+
+    # ---------- monitor ----------
+    source_names = [n.strip() for n in args.sources.split(",") if n.strip()] or None
+
+    def refresh_watermarks(conn) -> None:
+        live["migrating"] = reembed.migrating_models(conn)
+        live["models"] = reembed.live_models(conn, args.model)
+        scopes = [scope for src in load_sources(conn, source_names) for scope in src.scopes]
+        wm = read_watermarks(conn, live["models"], scopes, args.embed_workers)
+        prev_due = watermarks.get("urls_due")
+        watermarks.update(wm)
+        metrics.QUEUE_DEPTH.set(wm["urls_due"] or 0, queue="urls_due")
+        metrics.QUEUE_DEPTH.set(chunk_backlog(), queue="chunk_backlog")
+        metrics.QUEUE_DEPTH.set(embed_backlog(), queue="embed_backlog")
+        metrics.QUEUE_DEPTH.set(wm["reembed_pending"] or 0, queue="reembed_backlog")
+        metrics.QUEUE_LAG.set(wm["chunk_lag_s"] or 0, queue="chunk")
+        metrics.QUEUE_LAG.set(wm["embed_lag_s"] or 0, queue="embed")
+        # atsirado darbo spider'iui (pvz. entrypoint next_fetch_at suėjo)
+        if wm["urls_due"] and not prev_due:
+            crawl_stage.wake.set()
+        if chunk_backlog():
+            chunk_stage.wake.set()
+        if embed_backlog():
+            embed_stage.wake.set()
+        if live["migrating"] and embed_backlog() <= args.reembed_max_backlog:
+            reembed_stage.wake.set()
+
+    def log_metrics() -> None:
+        print(
+            "[orchestrator] metrics "
+            f"urls_due={watermarks.get('urls_due')} "
+            f"chunk_backlog={chunk_backlog()} chunk_lag_s={watermarks.get('chunk_lag_s') or 0} "
+            f"embed_backlog={embed_backlog()} embed_lag_s={watermarks.get('embed_lag_s') or 0} "
+            f"models={live['models']} reembed_backlog={watermarks.get('reembed_pending') or 0} "
+            f"crawl={crawl_stage.snapshot()} chunk={chunk_stage.snapshot()} embed={embed_stage.snapshot()} "
+            f"reembed={reembed_stage.snapshot()}",
+            flush=True,
+        )
+        # kur realiai eina laikas (mean / p95 per operaciją)
+        print(f"[orchestrator] timings {metrics.summary()}", flush=True)
+
+    def handle_signal(signum, frame):
+        print(f"[orchestrator] signal {signum}, stopping...", flush=True)
+        stop.set()
+        p = crawl_proc.get("p")
+        if p is not None and p.poll() is None:
+            p.terminate()
+        for st in (crawl_stage, chunk_stage, embed_stage, reembed_stage, maintain_stage):
+            st.wake.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    mon_conn = db_connect()
+    refresh_watermarks(mon_conn)
+
+    stages = [chunk_stage, embed_stage, reembed_stage, maintain_stage]
+    if not args.no_crawl:
+        stages.insert(0, crawl_stage)
+    for st in stages:
+        st.start()
+    print(f"[orchestrator] started stages={[s.name for s in stages]}", flush=True)
+
+    last_metrics = 0.0
+    try:
+        while not stop.is_set():
+            try:
+                refresh_watermarks(mon_conn)
+            except pymysql.err.OperationalError as e:
+                print(f"[orchestrator] monitor reconnect: {e!r}", flush=True)
+                mon_conn = db_connect()
+            now = time.monotonic()
+            if now - last_metrics >= args.metrics_every:
+                log_metrics()
+                last_metrics = now
+            stop.wait(args.poll_sec)
+    finally:
+        stop.set()
+        for st in stages:
+            st.wake.set()
+            st.join(timeout=30)
+        log_metrics()
+        mon_conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+import os
+import re
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+# fetches: RANGE COLUMNS(created_at), viena particija per dieną + p_future (MAXVALUE)
+FETCH_RETENTION_DAYS = 90      # 0 = nieko netrinti
+FETCH_AHEAD_DAYS = 7
+# embeddings: LIST COLUMNS(model), viena particija per modelį + p_default (DEFAULT)
+DEFAULT_MODEL_PARTITION = "p_default"
+
+
+def _env_int(name: str, default: int) -> int:
+    v = os.environ.get(name, "")
+    return int(v) if v.strip() else default
+
+
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+        autocommit=True,
+    )
+
+
+def _sql_str(conn, s: str) -> str:
+    # particijų VALUES negali būti %s parametrai (DDL) -> escape'inam patys
+    return conn.escape(s)
+
+
+def list_partitions(conn, table: str) -> List[Tuple[str, str]]:
+    """
+    [(partition_name, description)] eilės tvarka; tuščias sąrašas, jei lentelė neparticijuota.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """,
+            (table,),
+        )
+        return [(name, desc or "") for name, desc in cur.fetchall()]
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return bool(list_partitions(conn, table))
+
+
+# -----------------------------
+# fetches (time range)
+# -----------------------------
+def day_partition_name(day: date) -> str:
+    return "p" + day.strftime("%Y%m%d")
+
+
+def _day_partition_sql(day: date) -> str:
+    # particija dienai `day` = visi created_at < day + 1
+    return f"PARTITION {day_partition_name(day)} VALUES LESS THAN ('{(day + timedelta(days=1)).isoformat()}')"
+
+
+def fetch_partition_clause(first_day: date, last_day: date) -> str:
+    """
+    PARTITION BY ... fetches lentelei: p_history (< first_day), dienos [first_day, last_day], p_future.
+    """
+    parts = [f"PARTITION p_history VALUES LESS THAN ('{first_day.isoformat()}')"]
+    day = first_day
+    while day <= last_day:
+        parts.append(_day_partition_sql(day))
+        day += timedelta(days=1)
+    parts.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+    return "PARTITION BY RANGE COLUMNS(created_at) (\n  " + ",\n  ".join(parts) + "\n)"
+
+
+def _bound_date(desc: str) -> Optional[date]:
+    # "'2026-10-21'" arba "'2026-10-21 00:00:00'"; MAXVALUE -> None
+    desc = desc.strip().strip("'")
+    if not desc or desc.upper() == "MAXVALUE":
+        return None
+    return datetime.fromisoformat(desc).date()
+
+
+def ensure_fetch_partitions(conn, ahead_days: int = FETCH_AHEAD_DAYS, today: Optional[date] = None, log: Callable[[str], None] = print) -> int:
+    """
+    Prideda dienos particijas iki today + ahead_days, skeldamas p_future (REORGANIZE).
+    p_future paprastai tuščia, todėl tai metadata operacija.
+    """
+    parts = list_partitions(conn, "fetches")
+    if not parts:
+        return 0
+    bounds = [b for b in (_bound_date(desc) for _, desc in parts) if b is not None]
+    # paskutinė dienos particija dengia [last_bound - 1, last_bound)
+    next_day = max(bounds) if bounds else (today or datetime.utcnow().date())
+    until = (today or datetime.utcnow().date()) + timedelta(days=ahead_days)
+
+    new_parts = []
+    while next_day <= until:
+        new_parts.append(_day_partition_sql(next_day))
+        next_day += timedelta(days=1)
+    if not new_parts:
+        return 0
+
+    new_parts.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+    with conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE fetches REORGANIZE PARTITION p_future INTO ({', '.join(new_parts)})")
+    log(f"[partitions] fetches: +{len(new_parts) - 1} day partitions (until {until.isoformat()})")
+    return len(new_parts) - 1
+
+
+def drop_old_fetch_partitions(conn, retention_days: int = FETCH_RETENTION_DAYS, today: Optional[date] = None, log: Callable[[str], None] = print) -> List[str]:
+    """
+    Retention: DROP PARTITION visoms particijoms, kurių viršutinė riba <= today - retention_days.
+    DROP PARTITION = failo pašalinimas, o ne DELETE per eilutes.
+    """
+    if retention_days <= 0:
+        return []
+    cutoff = (today or datetime.utcnow().date()) - timedelta(days=retention_days)
+    old = [name for name, desc in list_partitions(conn, "fetches") if (_bound_date(desc) or date.max) <= cutoff]
+    if old:
+        with conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE fetches DROP PARTITION {', '.join(old)}")
+        log(f"[partitions] fetches: dropped {len(old)} partitions older than {cutoff.isoformat()}")
+    return old
+
+
+# -----------------------------
+# embeddings (list by model)
+# -----------------------------
+def model_partition_name(model: str) -> str:
+    slug = re.sub(r"[^0-9a-zA-Z]+", "_", model).strip("_").lower()
+    return ("p_" + slug)[:64]
+
+
+def embedding_partition_clause(conn, models: Iterable[str]) -> str:
+    parts = [
+        f"PARTITION {model_partition_name(m)} VALUES IN ({_sql_str(conn, m)})"
+        for m in sorted(set(models))
+    ]
+    parts.append(f"PARTITION {DEFAULT_MODEL_PARTITION} DEFAULT")
+    return "PARTITION BY LIST COLUMNS(model) (\n  " + ",\n  ".join(parts) + "\n)"
+
+
+def model_partitions(conn) -> Dict[str, str]:
+    """
+    model -> particijos vardas (tik dedikuotos; DEFAULT neįtraukta).
+    """
+    out = {}
+    for name, desc in list_partitions(conn, "embeddings"):
+        if name == DEFAULT_MODEL_PARTITION:
+            continue
+        # LIST COLUMNS description: 'model-a','model-b'
+        for m in re.findall(r"'((?:[^'\\]|\\.)*)'", desc):
+            out[m] = name
+    return out
+
+
+def ensure_model_partition(conn, model: str, log: Callable[[str], None] = print) -> bool:
+    """
+    Naujam modeliui – sava particija (išskiriama iš p_default; perkeliamos tik to modelio eilutės,
+    kurios jau spėjo ten patekti).
+    """
+    if not is_partitioned(conn, "embeddings") or model in model_partitions(conn):
+        return False
+    name = model_partition_name(model)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            ALTER TABLE embeddings REORGANIZE PARTITION {DEFAULT_MODEL_PARTITION} INTO (
+              PARTITION {name} VALUES IN ({_sql_str(conn, model)}),
+              PARTITION {DEFAULT_MODEL_PARTITION} DEFAULT
+            )
+            """
+        )
+    log(f"[partitions] embeddings: added partition {name} for {model}")
+    return True
+
+
+def drop_model(conn, model: str, batch: int = 10_000, log: Callable[[str], None] = print) -> int:
+    """
+    Seno modelio valymas: dedikuota particija -> DROP PARTITION (momentinis);
+    modelis p_default'e -> DELETE batch'ais. Kartu išvalomi watermarks.
+    """
+    name = model_partitions(conn).get(model)
+    with conn.cursor() as cur:
+        if name is not None:
+            cur.execute(f"SELECT COUNT(*) FROM embeddings PARTITION ({name})")
+            removed = int(cur.fetchone()[0])
+            cur.execute(f"ALTER TABLE embeddings DROP PARTITION {name}")
+        else:
+            removed = 0
+            while True:
+                n = cur.execute("DELETE FROM embeddings WHERE model = %s LIMIT %s", (model, batch))
+                removed += n
+                if n < batch:
+                    break
+        cur.execute("DELETE FROM embedding_watermarks WHERE model = %s", (model,))
+    log(f"[partitions] embeddings: removed {removed} rows for {model}" + (f" (dropped {name})" if name else ""))
+    return removed
+
+
+def sweep_orphan_embeddings(conn, batch: int = 10_000, log: Callable[[str], None] = print) -> int:
+    """
+    Particijuota embeddings lentelė neturi FK (007), todėl ištrynus / perchunkinus straipsnį
+    jo chunkų embeddingai lieka. Keyset praėjimas per embeddings.id batch'ais: kiekviename
+    batch'e trinamos eilutės, kurių chunk_id nebėra article_chunks lentelėje.
+    """
+    removed = 0
+    after_id = 0
+    with conn.cursor() as cur:
+        while True:
+            cur.execute(
+                """
+                SELECT e.id, c.id IS NULL
+                FROM embeddings e
+                LEFT JOIN article_chunks c ON c.id = e.chunk_id
+                WHERE e.id > %s
+                ORDER BY e.id ASC
+                LIMIT %s
+                """,
+                (after_id, batch),
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            after_id = int(rows[-1][0])
+            orphans = [int(eid) for eid, orphan in rows if orphan]
+            if orphans:
+                removed += cur.execute(
+                    "DELETE FROM embeddings WHERE id IN (" + ", ".join(["%s"] * len(orphans)) + ")",
+                    orphans,
+                )
+            if len(rows) < batch:
+                break
+    if removed:
+        log(f"[partitions] embeddings: removed {removed} orphan rows (chunk deleted)")
+    return removed
+
+
+# -----------------------------
+# Maintenance (orchestrator kviečia periodiškai)
+# -----------------------------
+def maintain(
+    conn,
+    models: Iterable[str] = (),
+    retention_days: int = FETCH_RETENTION_DAYS,
+    ahead_days: int = FETCH_AHEAD_DAYS,
+    log: Callable[[str], None] = print,
+) -> int:
+    changes = 0
+    if is_partitioned(conn, "fetches"):
+        changes += ensure_fetch_partitions(conn, ahead_days, log=log)
+        changes += len(drop_old_fetch_partitions(conn, retention_days, log=log))
+    for m in models:
+        changes += int(ensure_model_partition(conn, m, log=log))
+    changes += sweep_orphan_embeddings(conn, log=log)
+    return changes
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Partition maintenance: fetches day partitions / retention, embeddings per-model partitions.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("maintain", help="Pridėti ateities dienų particijas, ištrinti senas (retention) ir embeddingus be chunko")
+    p.add_argument("--retention-days", type=int, default=_env_int("FETCH_RETENTION_DAYS", FETCH_RETENTION_DAYS))
+    p.add_argument("--ahead-days", type=int, default=_env_int("FETCH_AHEAD_DAYS", FETCH_AHEAD_DAYS))
+    p.add_argument("--model", action="append", default=[], help="Užtikrinti particiją šitam modeliui (galima kartoti)")
+
+    p = sub.add_parser("add-model", help="Sukurti particiją naujam modeliui")
+    p.add_argument("model")
+
+    p = sub.add_parser("drop-model", help="Ištrinti visus modelio embeddingus (DROP PARTITION)")
+    p.add_argument("model")
+    p.add_argument("--yes", action="store_true")
+
+    sub.add_parser("status", help="Parodyti particijas")
+    args = parser.parse_args()
+
+    required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+    missing = [k for k in required_env if not os.environ.get(k)]
+    if missing:
+        raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+
+    conn = db_connect()
+    try:
+        if args.cmd == "maintain":
+            n = maintain(conn, args.model, args.retention_days, args.ahead_days)
+            print(f"[partitions] done, {n} changes")
+        elif args.cmd == "add-model":
+            ensure_model_partition(conn, args.model)
+        elif args.cmd == "drop-model":
+            if not args.yes:
+                raise SystemExit(f"Refusing to drop embeddings for '{args.model}' without --yes")
+            drop_model(conn, args.model)
+        else:
+            with conn.cursor() as cur:
+                for table in ("fetches", "embeddings"):
+                    cur.execute(
+                        """
+                        SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+                        FROM information_schema.PARTITIONS
+                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+                        ORDER BY PARTITION_ORDINAL_POSITION
+                        """,
+                        (table,),
+                    )
+                    rows = cur.fetchall()
+                    print(f"{table}: {'not partitioned' if not rows else f'{len(rows)} partitions'}")
+                    for name, desc, n in rows:
+                        print(f"  {name}\t{desc}\t~{n} rows")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+import os
+import time
+import argparse
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+import embedder
+import metrics
+import partitions
+from models import load_model
+
+
+# -----------------------------
+# Modelių registras (embedding_models, žr. 010_embedding_models.sql)
+# -----------------------------
+# serving   – paieška (search.py be --model) naudoja šitą modelį; visada daugiausia vienas
+# migrating – naujas modelis: live embedderis daro šviežius chunkus (> backfill_upto),
+#             backfill_batch lėtai perembedina senus (<= backfill_upto)
+# retired   – buvęs serving; embeddingai lieka, kol neištrinami (partitions.py drop-model)
+DEFAULT_SWITCH_COVERAGE = 0.99
+
+
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+        autocommit=False,
+    )
+
+
+def serving_model(conn) -> Optional[str]:
+    """
+    None -> registras tuščias arba migracija 010 dar nepaleista.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT model FROM embedding_models WHERE state = 'serving' LIMIT 1")
+            row = cur.fetchone()
+    except pymysql.err.ProgrammingError:
+        return None
+    return row[0] if row else None
+
+
+def migrating_models(conn) -> List[str]:
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT model FROM embedding_models WHERE state = 'migrating' ORDER BY started_at, model")
+            return [r[0] for r in cur.fetchall()]
+    except pymysql.err.ProgrammingError:
+        return []
+
+
+def live_models(conn, default_model: str) -> List[str]:
+    """
+    Modeliai, kuriems live embedderis daro šviežius chunkus: serving + migruojami.
+    """
+    serving = serving_model(conn) or default_model
+    return [serving] + [m for m in migrating_models(conn) if m != serving]
+
+
+def ensure_serving(conn, model_name: str) -> None:
+    """
+    Pirmas paleidimas: jei serving modelio dar nėra, juo tampa model_name (EMBED_MODEL).
+    Esamo serving neperrašo – modelis keičiamas tik per start_migration / switch_model.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO embedding_models (model, state, switched_at)
+            SELECT %s, 'serving', NOW() FROM DUAL
+            WHERE NOT EXISTS (SELECT 1 FROM embedding_models WHERE state = 'serving')
+            ON DUPLICATE KEY UPDATE model = model
+            """,
+            (model_name,),
+        )
+    conn.commit()
+
+
+def start_migration(
+    conn,
+    model_name: str,
+    switch_coverage: float = DEFAULT_SWITCH_COVERAGE,
+    shards: int = 1,
+    log: Callable[[str], None] = print,
+) -> int:
+    """
+    Registruoja naują modelį kaip migrating. Live embedderio watermark'as naujam modeliui
+    pastatomas ant backfill_upto, todėl jis daro tik šviežius chunkus, o visa istorija
+    (<= backfill_upto) lieka lėtam backfill_batch. Pakartotinai iškvietus progresas nenumetamas.
+    shards: live embedderio shard'ų skaičius (EMBED_WORKERS) – watermark'as rašomas kiekvienam shard'ui,
+    kitaip (model, 1, 0) eilutė niekada nejudėtų ir laikytų orchestrator'iaus backlog'ą.
+    """
+    if serving_model(conn) == model_name:
+        raise ValueError(f"{model_name} is already the serving model")
+    # jaunesni (dar galimai necommitinti) chunkai lieka live embedderiui
+    upto = embedder.settled_id(conn, "article_chunks")
+    # nauja LIST particija embeddings lentelei (DDL -> atskirai nuo transakcijos)
+    partitions.ensure_model_partition(conn, model_name, log=log)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO embedding_models (model, state, backfill_upto, backfill_chunk_id, switch_coverage)
+            VALUES (%s, 'migrating', %s, 0, %s)
+            ON DUPLICATE KEY UPDATE
+              backfill_upto = IF(state = 'migrating', backfill_upto, VALUES(backfill_upto)),
+              backfill_chunk_id = IF(state = 'migrating', backfill_chunk_id, 0),
+              switch_coverage = VALUES(switch_coverage),
+              started_at = IF(state = 'migrating', started_at, NOW()),
+              state = 'migrating'
+            """,
+            (model_name, upto, switch_coverage),
+        )
+        cur.execute("SELECT backfill_upto FROM embedding_models WHERE model = %s", (model_name,))
+        upto = int(cur.fetchone()[0])
+    for shard in range(shards):
+        embedder.set_watermark(conn, model_name, upto, shard, shards)
+    conn.commit()
+    log(f"[reembed] migration started: model={model_name} backfill_upto={upto} switch_coverage={switch_coverage}")
+    return upto
+
+
+# -----------------------------
+# Backfill (senų chunkų perembedinimas)
+# -----------------------------
+def fetch_backfill_chunks(conn, model_name: str, after_id: int, upto_id: int, limit: int) -> List[Tuple[int, str]]:
+    sql = """
+        SELECT c.id, c.chunk_text
+        FROM article_chunks c
+        LEFT JOIN embeddings e
+          ON e.chunk_id = c.id AND e.model = %s
+        WHERE c.id > %s
+          AND c.id <= %s
+          AND e.id IS NULL
+          AND c.chunk_text <> ''
+        ORDER BY c.id ASC
+        LIMIT %s
+    """
+    with conn.cursor() as cur:
+        cur.execute(sql, (model_name, after_id, upto_id, limit))
+        return list(cur.fetchall())
+
+
+def backfill_batch(
+    conn,
+    st_model: Union[Any, Callable[[], Any]],
+    model_name: str,
+    limit: int,
+    batch_size: int,
+    normalize: bool,
+    prefix: str,
+    log=print,
+) -> Tuple[int, int]:
+    """
+    Vienas backfill paketas: iki limit senų chunkų (backfill_chunk_id, backfill_upto] be šito modelio
+    embeddingo -> encode -> insert + kursoriaus pastūmimas vienoje transakcijoje.
+    Grąžina (requested, inserted); requested == 0 -> backfill baigtas (arba modelis nebe migrating).
+    """
+    with metrics.DB_READ_SECONDS.time(stage="reembed"):
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT backfill_chunk_id, backfill_upto FROM embedding_models WHERE model = %s AND state = 'migrating'",
+                (model_name,),
+            )
+            row = cur.fetchone()
+        if row is None or int(row[0]) >= int(row[1]):
+            conn.commit()
+            return 0, 0
+        cursor, upto = int(row[0]), int(row[1])
+        chunks = fetch_backfill_chunks(conn, model_name, cursor, upto, limit)
+
+    if not chunks:
+        # likęs intervalas jau embedintas (pvz. modelis grąžintas iš retired)
+        with conn.cursor() as cur:
+            cur.execute("UPDATE embedding_models SET backfill_chunk_id = backfill_upto WHERE model = %s", (model_name,))
+        conn.commit()
+        return 0, 0
+
+    if not hasattr(st_model, "encode"):
+        st_model = st_model()
+
+    with metrics.ENCODE_SECONDS.time(model=model_name):
+        vectors = embedder.embed_texts(st_model, [t for _, t in chunks], batch_size, normalize, prefix)
+    dims = int(vectors.shape[1])
+
+    rows = list(zip([cid for cid, _ in chunks], list(vectors)))
+    with metrics.DB_WRITE_SECONDS.time(stage="reembed", op="insert_embeddings"):
+        inserted = embedder.insert_embeddings(conn, rows, model_name, dims)
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE embedding_models SET backfill_chunk_id = GREATEST(backfill_chunk_id, %s) WHERE model = %s",
+                (chunks[-1][0], model_name),
+            )
+        conn.commit()
+    metrics.ITEMS.inc(inserted, stage="reembed", kind="embeddings")
+
+    log(f"[reembed] model={model_name} inserted={inserted} requested={len(rows)} cursor={chunks[-1][0]}/{upto}")
+    return len(rows), inserted
+
+
+# -----------------------------
+# Coverage / atomic switch
+# -----------------------------
+def coverage(conn, model_name: str) -> float:
+    """
+    Embedintų chunkų dalis (abu COUNT'ai per indeksus: ix_embeddings_model, article_chunks PK).
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM embeddings WHERE model = %s", (model_name,))
+        embedded = int(cur.fetchone()[0])
+        cur.execute("SELECT COUNT(*) FROM article_chunks")
+        total = int(cur.fetchone()[0])
+    return embedded / total if total else 1.0
+
+
+def switch_model(conn, model_name: str, log: Callable[[str], None] = print) -> None:
+    """
+    Vienas UPDATE: naujas modelis -> serving, buvęs serving -> retired. InnoDB eilutės keičiamos
+    vienoje transakcijoje, todėl serving_model() niekada nemato nei dviejų, nei nulio serving modelių.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE embedding_models
+            SET state = IF(model = %s, 'serving', 'retired'),
+                switched_at = IF(model = %s, NOW(), switched_at)
+            WHERE model = %s OR state = 'serving'
+            """,
+            (model_name, model_name, model_name),
+        )
+    conn.commit()
+    metrics.ITEMS.inc(stage="reembed", kind="model_switches")
+    log(f"[reembed] switched serving model -> {model_name}")
+
+
+def maybe_switch(conn, model_name: str, log: Callable[[str], None] = print) -> bool:
+    """
+    Perskaičiuoja coverage (išsaugo registre); pasiekus switch_coverage – switch_model.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT switch_coverage FROM embedding_models WHERE model = %s AND state = 'migrating'",
+            (model_name,),
+        )
+        row = cur.fetchone()
+    if row is None:
+        conn.commit()
+        return False
+    cov = coverage(conn, model_name)
+    with conn.cursor() as cur:
+        cur.execute("UPDATE embedding_models SET coverage = %s WHERE model = %s", (cov, model_name))
+    conn.commit()
+    metrics.QUEUE_DEPTH.set(round(1.0 - cov, 6), queue=f"reembed_uncovered[{model_name}]")
+    if cov < float(row[0]):
+        return False
+    log(f"[reembed] model={model_name} coverage={cov:.4f} >= {float(row[0])}")
+    switch_model(conn, model_name, log=log)
+    return True
+
+
+def status(conn) -> List[Dict[str, Any]]:
+    with conn.cursor(pymysql.cursors.DictCursor) as cur:
+        cur.execute(
+            """
+            SELECT model, state, backfill_chunk_id, backfill_upto, switch_coverage, coverage,
+                   started_at, switched_at, updated_at
+            FROM embedding_models
+            ORDER BY state = 'serving' DESC, started_at
+            """
+        )
+        rows = list(cur.fetchall())
+    conn.commit()
+    return rows
+
+
+# -----------------------------
+# Throttle
+# -----------------------------
+class Throttle:
+    """
+    Po kiekvieno paketo – kiek laukti, kad būtų laikomasi abiejų biudžetų:
+      rows_per_sec – vidutinis embedinamų eilučių greitis (0 = neribota)
+      cpu_share    – darbo / (darbo + miego) dalis; 0.25 -> backfill dirba ~1/4 laiko (1.0 = be pauzių)
+    """
+
+    def __init__(self, rows_per_sec: float = 0.0, cpu_share: float = 1.0):
+        if not 0.0 < cpu_share <= 1.0:
+            raise ValueError(f"cpu_share must be in (0, 1], got {cpu_share}")
+        self.rows_per_sec = rows_per_sec
+        self.cpu_share = cpu_share
+
+    def pause_after(self, rows: int, busy_s: float) -> float:
+        pause = busy_s * (1.0 - self.cpu_share) / self.cpu_share
+        if self.rows_per_sec > 0:
+            pause = max(pause, rows / self.rows_per_sec - busy_s)
+        return max(0.0, pause)
+
+
+def run_standalone(conn, args) -> None:
+    if args.device is not None and not str(args.device).strip():
+        args.device = None
+    if args.nice:
+        os.nice(args.nice)
+    throttle = Throttle(args.rows_per_sec, args.cpu_share)
+    metrics.configure("reembed")
+
+    loaded: Dict[str, Any] = {}
+    last_check: Dict[str, float] = {}
+    while True:
+        targets = [args.model] if args.model else migrating_models(conn)
+        targets = [m for m in targets if m in migrating_models(conn)]
+        if not targets:
+            print("[reembed] No migrating models. Nothing to do.")
+            return
+        for model_name in targets:
+            def get_model():
+                if model_name not in loaded:
+                    print(f"[reembed] loading model: {model_name}")
+                    loaded[model_name] = load_model(model_name, device=args.device)
+                return loaded[model_name]
+
+            t0 = time.perf_counter()
+            requested, _ = backfill_batch(
+                conn, get_model, model_name, args.limit, args.batch_size, bool(args.normalize), args.prefix
+            )
+            busy = time.perf_counter() - t0
+            now = time.monotonic()
+            if not requested or now - last_check.get(model_name, 0.0) >= args.switch_check_sec:
+                last_check[model_name] = now
+                if maybe_switch(conn, model_name):
+                    continue
+                if not requested:
+                    # backfill baigtas, bet coverage dar mažas: šviežius chunkus daro live embedderis
+                    print(f"[reembed] model={model_name} backfill done; waiting for live embedder to reach coverage")
+                    time.sleep(args.switch_check_sec)
+                    continue
+            time.sleep(throttle.pause_after(requested, busy))
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Embedding model upgrade: throttled re-embedding of old chunks + atomic switch of the serving model.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("start", help="Pradėti migraciją į naują modelį")
+    p.add_argument("model")
+    p.add_argument("--switch-coverage", type=float, default=DEFAULT_SWITCH_COVERAGE, help="Perjungti, kai embedinta tokia chunkų dalis (default: 0.99)")
+    p.add_argument("--shards", type=int, default=int(os.environ.get("EMBED_WORKERS", "1")), help="Live embedderio shard'ai (default: $EMBED_WORKERS arba 1)")
+
+    p = sub.add_parser("run", help="Backfill'inti migruojamus modelius (be orchestrator'iaus)")
+    p.add_argument("--model", type=str, default=None, help="Tik šitą modelį (default: visus migrating)")
+    p.add_argument("--limit", type=int, default=64, help="Chunkų per paketą (default: 64)")
+    p.add_argument("--batch-size", type=int, default=16)
+    p.add_argument("--device", type=str, default=None)
+    p.add_argument("--normalize", type=int, choices=(0, 1), default=1)
+    p.add_argument("--prefix", type=str, default="passage: ")
+    p.add_argument("--rows-per-sec", type=float, default=20.0, help="Eilučių per sekundę biudžetas (0 = neribota)")
+    p.add_argument("--cpu-share", type=float, default=0.25, help="Darbo laiko dalis (0..1]; likusį laiką miegama")
+    p.add_argument("--nice", type=int, default=10, help="Proceso nice prioritetas (default: 10)")
+    p.add_argument("--switch-check-sec", type=float, default=60.0, help="Kas kiek sekundžių tikrinti coverage")
+
+    p = sub.add_parser("switch", help="Perjungti serving modelį dabar (nepaisant coverage)")
+    p.add_argument("model")
+
+    sub.add_parser("status", help="Parodyti modelių registrą ir progresą")
+    args = parser.parse_args()
+
+    required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+    missing = [k for k in required_env if not os.environ.get(k)]
+    if missing:
+        raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+
+    conn = db_connect()
+    try:
+        if args.cmd == "start":
+            start_migration(conn, args.model, args.switch_coverage, shards=args.shards)
+        elif args.cmd == "switch":
+            if args.model not in migrating_models(conn) + [r["model"] for r in status(conn) if r["state"] == "retired"]:
+                raise SystemExit(f"[reembed] unknown model {args.model} (reembed.py start {args.model})")
+            switch_model(conn, args.model)
+        elif args.cmd == "status":
+            for r in status(conn):
+                cov = "-" if r["coverage"] is None else f"{r['coverage']:.4f}"
+                print(
+                    f"{r['model']}\t{r['state']}\tbackfill={r['backfill_chunk_id']}/{r['backfill_upto']}\t"
+                    f"coverage={cov} (switch at {r['switch_coverage']})\tstarted={r['started_at']}\tswitched={r['switched_at']}"
+                )
+        else:
+            run_standalone(conn, args)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
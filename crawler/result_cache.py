@@ -0,0 +1,210 @@
+import os
+import json
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from search_index import NO_DATE, SearchIndex
+
+
+# -----------------------------
+# Search result cache
+# -----------------------------
+# <dir>/<model>/r-<key>.npz   – top-depth rezultatas + nusistovėjęs embeddings.id watermark, iki kurio jis tikslus
+#                              (eilutės virš jo gali jau būti rezultate – kitas delta scan'as jas perskenuoja)
+# <dir>/<model>/q-<hash>.npy  – užklausos tekstas -> query vektorius (kartojant užklausą modelio nekraunam)
+# key = sha1(model, query vektorius (arba tekstas lexical režimui), topk, režimas, filtrų argumentai).
+# Vektorinei paieškai (be sum grupavimo / collapse) top-k per (sena ∪ nauja) = top-k per
+# (cache'uotas top-k ∪ naujų eilučių top-k), todėl pasistūmus watermark'ui pakanka įvertinti tik naujas eilutes.
+# Kitiems režimams (BM25 statistika keičiasi su kiekvienu chunku) įrašas galioja tik iki watermark'o pokyčio.
+DEPTH_FACTOR = 2        # saugom 2 * topk: --last-days lange senstantys rezultatai iškrenta be pilnos paieškos
+DEFAULT_MAX_ENTRIES = 2000
+
+
+def default_cache_dir() -> str:
+    return os.path.join(os.environ.get("SEARCH_INDEX_DIR", ".index"), "result_cache")
+
+
+def _slug(model_name: str) -> str:
+    return "".join(c if c.isalnum() or c in "._-" else "_" for c in model_name)
+
+
+@dataclass
+class CachedResult:
+    watermark: int               # visi embeddings.id <= šito įvertinti (embedder.settled_id)
+    patchable: bool              # ar galima papildyti delta scan'u (kitaip – invalidacija)
+    group_by_article: bool       # max grupavimas: vienas geriausias chunk straipsniui
+    depth: int                   # kiek eilučių buvo prašyta (len < depth -> daugiau atitikmenų nėra)
+    chunk_ids: np.ndarray        # (n,) int64, score mažėjančia tvarka
+    article_ids: np.ndarray      # (n,) int64
+    scores: np.ndarray           # (n,) float32
+    published_ts: np.ndarray     # (n,) int64, NO_DATE jei NULL (laiko filtrų perskaičiavimui)
+
+    @property
+    def size(self) -> int:
+        return int(self.chunk_ids.size)
+
+    def within(self, since_ts: Optional[int], until_ts: Optional[int]) -> "CachedResult":
+        """
+        Tie patys laiko filtrai kaip build_filter_mask (--last-days langas slenka su laiku).
+        """
+        keep = np.ones(self.size, dtype=bool)
+        if since_ts is not None:
+            keep &= self.published_ts >= since_ts
+        if until_ts is not None:
+            keep &= (self.published_ts <= until_ts) & (self.published_ts != NO_DATE)
+        if keep.all():
+            return self
+        return CachedResult(
+            self.watermark, self.patchable, self.group_by_article, self.depth,
+            self.chunk_ids[keep], self.article_ids[keep], self.scores[keep], self.published_ts[keep],
+        )
+
+
+def result_from_rows(
+    index: SearchIndex,
+    rows: np.ndarray,
+    scores: np.ndarray,
+    watermark: int,
+    patchable: bool,
+    group_by_article: bool,
+    depth: int,
+) -> CachedResult:
+    return CachedResult(
+        watermark=int(watermark),
+        patchable=patchable,
+        group_by_article=group_by_article,
+        depth=depth,
+        chunk_ids=index.chunk_ids[rows].astype(np.int64),
+        article_ids=index.article_ids[rows].astype(np.int64),
+        scores=np.asarray(scores, dtype=np.float32),
+        published_ts=index.published_ts[rows].astype(np.int64),
+    )
+
+
+def merge_delta(cached: CachedResult, delta: CachedResult) -> CachedResult:
+    """
+    Cache'uotas top-depth + naujų eilučių top-depth -> naujas top-depth (watermark = delta).
+    Ta pati eilutė gali būti abiejose pusėse (nenusistovėjusi uodega perskenuojama), todėl chunk_id dedup.
+    group_by_article: straipsnio score = max, todėl paliekam geriausią jo chunką iš abiejų pusių.
+    """
+    chunk_ids = np.concatenate([cached.chunk_ids, delta.chunk_ids])
+    article_ids = np.concatenate([cached.article_ids, delta.article_ids])
+    scores = np.concatenate([cached.scores, delta.scores])
+    published_ts = np.concatenate([cached.published_ts, delta.published_ts])
+
+    order = np.argsort(-scores, kind="stable")
+    _, first = np.unique(chunk_ids[order], return_index=True)
+    order = order[np.sort(first)]
+    if cached.group_by_article:
+        _, first = np.unique(article_ids[order], return_index=True)
+        order = order[np.sort(first)]
+    order = order[: cached.depth]
+    return CachedResult(
+        max(cached.watermark, delta.watermark), cached.patchable, cached.group_by_article, cached.depth,
+        chunk_ids[order], article_ids[order], scores[order], published_ts[order],
+    )
+
+
+class ResultCache:
+    """
+    Failų cache (vienas .npz įrašui), kad jį dalintųsi atskiri search.py procesai.
+    Įrašymas atominis (tmp + rename); LRU pagal mtime, kai įrašų daugiau nei max_entries.
+    """
+
+    def __init__(self, path: str, model_name: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.dir = os.path.join(path, _slug(model_name))
+        self.model_name = model_name
+        self.max_entries = max_entries
+        os.makedirs(self.dir, exist_ok=True)
+
+    # ---------- query vector ----------
+    def _query_path(self, query: str, normalize: bool) -> str:
+        h = hashlib.sha1(f"{self.model_name}\x00{int(normalize)}\x00{query}".encode("utf-8")).hexdigest()
+        return os.path.join(self.dir, f"q-{h}.npy")
+
+    def query_vector(self, query: str, normalize: bool) -> Optional[np.ndarray]:
+        path = self._query_path(query, normalize)
+        try:
+            q_vec = np.load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        os.utime(path)
+        return q_vec
+
+    def put_query_vector(self, query: str, normalize: bool, q_vec: np.ndarray) -> None:
+        path = self._query_path(query, normalize)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(q_vec, dtype=np.float32))
+        os.replace(tmp, path)
+
+    # ---------- results ----------
+    def key(self, q_vec: Optional[np.ndarray], query: str, params: Dict[str, Any]) -> str:
+        h = hashlib.sha1(self.model_name.encode("utf-8"))
+        if q_vec is not None:
+            h.update(np.ascontiguousarray(q_vec, dtype=np.float32).tobytes())
+        else:
+            h.update(query.encode("utf-8"))
+        h.update(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return h.hexdigest()
+
+    def _result_path(self, key: str) -> str:
+        return os.path.join(self.dir, f"r-{key}.npz")
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        path = self._result_path(key)
+        try:
+            with np.load(path) as z:
+                meta = json.loads(str(z["meta"]))
+                res = CachedResult(
+                    watermark=int(meta["watermark"]),
+                    patchable=bool(meta["patchable"]),
+                    group_by_article=bool(meta["group_by_article"]),
+                    depth=int(meta["depth"]),
+                    chunk_ids=z["chunk_ids"],
+                    article_ids=z["article_ids"],
+                    scores=z["scores"],
+                    published_ts=z["published_ts"],
+                )
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return None
+        os.utime(path)
+        return res
+
+    def put(self, key: str, res: CachedResult) -> None:
+        path = self._result_path(key)
+        meta = {
+            "watermark": res.watermark,
+            "patchable": res.patchable,
+            "group_by_article": res.group_by_article,
+            "depth": res.depth,
+        }
+        # pid tmp faile: keli procesai gali vienu metu rašyti tą patį raktą
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps(meta)),
+                chunk_ids=res.chunk_ids,
+                article_ids=res.article_ids,
+                scores=res.scores,
+                published_ts=res.published_ts,
+            )
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        names = os.listdir(self.dir)
+        for prefix, ext in (("r-", ".npz"), ("q-", ".npy")):
+            files = [os.path.join(self.dir, f) for f in names if f.startswith(prefix) and f.endswith(ext)]
+            if len(files) <= self.max_entries:
+                continue
+            files.sort(key=lambda p: os.path.getmtime(p))
+            for p in files[: len(files) - self.max_entries]:
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
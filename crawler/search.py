@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 import os
+import time
 import argparse
-from typing import List, Dict, Any, Tuple
+from collections import OrderedDict
+from dataclasses import replace
+from typing import List, Dict, Any, Optional, Tuple
 
 import numpy as np
 import pymysql
@@ -12,7 +15,38 @@ try:
 except Exception:
     pass
 
-from sentence_transformers import SentenceTransformer
+import metrics
+from embedder import settled_id
+from lexical import BM25Index, default_index_path, load_or_sync
+from models import load_model
+from reembed import serving_model
+from result_cache import (
+    DEPTH_FACTOR,
+    CachedResult,
+    ResultCache,
+    default_cache_dir,
+    merge_delta,
+    result_from_rows,
+)
+from search_index import (
+    SearchFilters,
+    SearchIndex,
+    NO_DATE,
+    NO_ID,
+    allocate_index,
+    build_filter_mask,
+    coarse_candidates,
+    concat_indexes,
+    default_snapshot_path,
+    finalize_index,
+    last_days_ts,
+    load_snapshot,
+    parse_date_arg,
+    score_candidates,
+    score_rows,
+)
+
+DEFAULT_MODEL = "intfloat/multilingual-e5-small"
 
 
 def db_connect():
@@ -27,53 +61,203 @@ def db_connect():
     )
 
 
-def fetch_embeddings_with_context(
+def count_embeddings(conn, model_name: str, after_id: int = 0, upto_id: Optional[int] = None) -> Tuple[int, int]:
+    """
+    (eilučių skaičius, dims) modeliui (tik after_id < embeddings.id <= upto_id); dims turi būti vienodas visiems įrašams.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT COUNT(*), MIN(dims), MAX(dims) FROM embeddings WHERE model = %s AND id > %s AND id <= %s",
+            (model_name, after_id, _upper(upto_id)),
+        )
+        n, dmin, dmax = cur.fetchone()
+    if n and dmin != dmax:
+        raise ValueError(f"Mixed embedding dims for model {model_name}: {dmin}..{dmax}")
+    return int(n or 0), int(dmax or 0)
+
+
+def _upper(upto_id: Optional[int]) -> int:
+    return 2 ** 63 - 1 if upto_id is None else upto_id
+
+
+def load_index(
     conn,
     model_name: str,
     limit: int,
-) -> List[Dict[str, Any]]:
+    page_size: int = 50_000,
+    verbose: bool = True,
+    after_id: int = 0,
+    upto_id: Optional[int] = None,
+) -> Optional[SearchIndex]:
     """
-    Grąžina embeddingus + chunk tekstą + straipsnio metadata.
+    Streaming loaderis: keyset puslapiai per embeddings.id su unbuffered (SSCursor) kursoriumi.
+    Kiekvienas blob'as per np.frombuffer rašomas tiesiai į iš anksto išskirtą matricą,
+    todėl atmintyje laikoma ~ tik pati matrica (be tuple sąrašų / dict'ų / vstack kopijos).
+    Tekstas nekraunamas – jį vėliau atsiunčia hydrate_chunks tik top-k.
+    limit <= 0 -> visas modelio korpusas. after_id -> tik naujesni (snapshot'o delta),
+    upto_id -> ne aukščiau šito id (embedder.settled_id).
     """
+    t0 = time.perf_counter()
+    total, dims = count_embeddings(conn, model_name, after_id, upto_id)
+    n = min(total, limit) if limit and limit > 0 else total
+    if n == 0:
+        return None
+
     sql = """
         SELECT
-            e.id AS embedding_id,
+            e.id,
             e.chunk_id,
-            e.dims,
             e.embedding,
             c.article_id,
-            c.chunk_index,
-            c.chunk_text,
-            a.title,
-            a.canonical_url,
-            a.published_at
+            TIMESTAMPDIFF(SECOND, '1970-01-01', a.published_at) AS published_ts,
+            a.source_id,
+            a.topic_id,
+            SUBSTRING_INDEX(SUBSTRING_INDEX(a.canonical_url, '/', 5), '/', -2) AS section
         FROM embeddings e
         JOIN article_chunks c ON c.id = e.chunk_id
         JOIN articles a ON a.id = c.article_id
         WHERE e.model = %s
+          AND e.id > %s
+          AND e.id <= %s
         ORDER BY e.id ASC
         LIMIT %s
     """
-    with conn.cursor() as cur:
-        cur.execute(sql, (model_name, limit))
-        rows = cur.fetchall()
-
-    out = []
-    for r in rows:
-        out.append(
-            {
-                "embedding_id": r[0],
-                "chunk_id": r[1],
-                "dims": int(r[2]),
-                "embedding_blob": r[3],
-                "article_id": r[4],
-                "chunk_index": r[5],
-                "chunk_text": r[6],
-                "title": r[7],
-                "canonical_url": r[8],
-                "published_at": r[9],
-            }
+
+    index = allocate_index(n, dims)
+    vectors = index.vectors
+    expected_bytes = dims * 4
+    section_vocab: Dict[str, int] = {}
+
+    i = 0
+    last_id = after_id
+    while i < n:
+        page = min(page_size, n - i)
+        got = 0
+        with conn.cursor(pymysql.cursors.SSCursor) as cur:
+            cur.execute(sql, (model_name, last_id, _upper(upto_id), page))
+            for r in cur:
+                blob = r[2]
+                if len(blob) != expected_bytes:
+                    # jei DB įrašas blogas / dims nesutampa
+                    raise ValueError(f"Embedding dims mismatch: expected {dims}, got {len(blob) // 4} (embedding_id={r[0]})")
+                vectors[i] = np.frombuffer(blob, dtype=np.float32)
+                index.embedding_ids[i] = r[0]
+                index.chunk_ids[i] = r[1]
+                index.article_ids[i] = r[3]
+                index.published_ts[i] = NO_DATE if r[4] is None else r[4]
+                index.source_ids[i] = r[5]
+                index.topic_ids[i] = NO_ID if r[6] is None else r[6]
+                index.section_codes[i] = section_vocab.setdefault(r[7] or "", len(section_vocab))
+                last_id = r[0]
+                i += 1
+                got += 1
+        if got < page:
+            # eilučių mažiau nei COUNT (pvz. ištrinta tarp užklausų)
+            break
+
+    index = finalize_index(index, i, section_vocab)
+
+    if verbose:
+        took = time.perf_counter() - t0
+        print(
+            f"[search] loaded rows={i} dims={dims} matrix_mb={index.vectors.nbytes / 1e6:.1f} "
+            f"took={took:.2f}s rows_per_s={i / max(took, 1e-9):.0f}"
         )
+    return index
+
+
+def load_snapshot_synced(conn, model_name: str, path: str, page_size: int = 50_000) -> Optional[SearchIndex]:
+    """
+    build_index.py snapshot'as (vectors mmap + binary kodai) + DB eilutės, atsiradusios po jo.
+    float32 matrica visada lieka mmap (RAM ~ kodai + delta): delta prijungiama per StackedVectors.
+    """
+    if not os.path.exists(os.path.join(path, "index.json")):
+        print(f"[search] no snapshot at {path} (run build_index.py); loading from DB")
+        return load_index(conn, model_name, 0, page_size=page_size)
+    t0 = time.perf_counter()
+    index, info = load_snapshot(path)
+    if info["model"] != model_name:
+        raise SystemExit(f"Snapshot {path} is for model {info['model']}, not {model_name}")
+    delta = load_index(conn, model_name, 0, page_size=page_size, verbose=False, after_id=info["watermark"])
+    if delta is not None:
+        print(f"[search] snapshot is {delta.size} rows behind (run build_index.py)")
+        index = concat_indexes(index, delta, stack=True)
+    print(
+        f"[search] snapshot rows={index.size} dims={index.dims} codes_mb={index.codes.nbytes / 1e6:.1f} "
+        f"took={time.perf_counter() - t0:.2f}s"
+    )
+    return index
+
+
+# -----------------------------
+# Hydration (tik top-k)
+# -----------------------------
+class HydrationCache:
+    """
+    LRU: chunk_id -> hydruota eilutė (tekstas + straipsnio metadata).
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chunk_id: int) -> Optional[Dict[str, Any]]:
+        row = self._data.get(chunk_id)
+        if row is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(chunk_id)
+        self.hits += 1
+        return row
+
+    def put(self, chunk_id: int, row: Dict[str, Any]) -> None:
+        self._data[chunk_id] = row
+        self._data.move_to_end(chunk_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+_HYDRATION_CACHE = HydrationCache()
+
+
+def hydrate_chunks(conn, chunk_ids: List[int], cache: Optional[HydrationCache] = _HYDRATION_CACHE) -> Dict[int, Dict[str, Any]]:
+    """
+    Vienas WHERE c.id IN (...) užklausimas tik trūkstamiems (ne cache) chunkams.
+    Ištrinti chunkai rezultate tiesiog nebus (jų embeddingus vėliau išvalo partitions.sweep_orphan_embeddings).
+    """
+    out: Dict[int, Dict[str, Any]] = {}
+    missing = []
+    for cid in chunk_ids:
+        row = cache.get(cid) if cache is not None else None
+        if row is None:
+            missing.append(cid)
+        else:
+            out[cid] = row
+
+    if missing:
+        sql = f"""
+            SELECT c.id, c.article_id, c.chunk_index, c.chunk_text, a.title, a.canonical_url, a.published_at
+            FROM article_chunks c
+            JOIN articles a ON a.id = c.article_id
+            WHERE c.id IN ({", ".join(["%s"] * len(missing))})
+        """
+        with conn.cursor() as cur:
+            cur.execute(sql, missing)
+            for r in cur.fetchall():
+                row = {
+                    "chunk_id": r[0],
+                    "article_id": r[1],
+                    "chunk_index": r[2],
+                    "chunk_text": r[3],
+                    "title": r[4],
+                    "canonical_url": r[5],
+                    "published_at": r[6],
+                }
+                out[int(r[0])] = row
+                if cache is not None:
+                    cache.put(int(r[0]), row)
     return out
 
 
@@ -97,15 +281,368 @@ def cosine_sim_matrix(query_vec: np.ndarray, mat: np.ndarray) -> np.ndarray:
     return (m @ q) / (mn * qn)
 
 
+# -----------------------------
+# Ranking
+# -----------------------------
+def topk_rows(row_idxs: Optional[np.ndarray], scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k iš (row_idxs, scores). Grąžina (index eilutės, scores) mažėjančia tvarka.
+    row_idxs=None -> scores jau sulygiuoti su visu indeksu.
+    """
+    k = min(k, scores.size)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    idxs = np.argpartition(-scores, k - 1)[:k]
+    idxs = idxs[np.argsort(-scores[idxs])]
+    rows = idxs if row_idxs is None else row_idxs[idxs]
+    return rows, scores[idxs]
+
+
+def vector_search(index: SearchIndex, q_vec: np.ndarray, mask: Optional[np.ndarray], k: int, candidates: int = 0):
+    """
+    candidates > 0: dviejų etapų paieška – Hamming per binarinius kodus atrenka tiek eilučių,
+    jos perskaičiuojamos tiksliai float32. 0 -> tikslus cosine per visas (kaukės) eilutes.
+    """
+    if candidates > 0:
+        rows = coarse_candidates(index, q_vec, mask, max(candidates, k))
+        row_idxs, scores = score_rows(index, q_vec, rows)
+    else:
+        row_idxs, scores = score_candidates(index, q_vec, mask)
+    return topk_rows(row_idxs, scores, k)
+
+
+def lexical_search(index: SearchIndex, bm25: BM25Index, query: str, mask: Optional[np.ndarray], k: int):
+    """
+    BM25 per chunk tekstą; rezultatai be embeddingo šitam modeliui (nėra indekse) atmetami.
+    """
+    chunk_ids, scores = bm25.search(query)
+    found, rows = index.rows_for_chunk_ids(chunk_ids)
+    scores = scores[found]
+    if mask is not None:
+        keep = mask[rows]
+        rows, scores = rows[keep], scores[keep]
+    return topk_rows(rows, scores, k)
+
+
+def rrf_fuse(rankings: List[np.ndarray], k: int, rrf_k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reciprocal Rank Fusion: score(row) = sum 1 / (rrf_k + rank).
+    """
+    rankings = [r for r in rankings if r.size]
+    if not rankings:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    rows = np.concatenate(rankings)
+    weights = np.concatenate([1.0 / (rrf_k + np.arange(1, r.size + 1)) for r in rankings])
+    uniq, inv = np.unique(rows, return_inverse=True)
+    fused = np.bincount(inv, weights=weights).astype(np.float32)
+    return topk_rows(uniq, fused, k)
+
+
+def hybrid_search(
+    index: SearchIndex,
+    bm25: BM25Index,
+    query: str,
+    q_vec: np.ndarray,
+    mask: Optional[np.ndarray],
+    k: int,
+    depth: int = 100,
+    rrf_k: int = 60,
+    candidates: int = 0,
+):
+    v_rows, _ = vector_search(index, q_vec, mask, depth, candidates)
+    l_rows, _ = lexical_search(index, bm25, query, mask, depth)
+    return rrf_fuse([v_rows, l_rows], k, rrf_k)
+
+
+def grouped_topk(
+    index: SearchIndex,
+    row_idxs: Optional[np.ndarray],
+    scores: np.ndarray,
+    k: int,
+    agg: str = "max",
+    top_n: int = 3,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k skirtingų straipsnių. Straipsnio score = max arba geriausių top_n chunkų suma.
+    Grąžina (geriausio chunko eilutė kiekvienam straipsniui, straipsnio score).
+
+    Grupuojam tik kandidatų pool'ą (argpartition), kuris didinamas, kol garantuota,
+    kad už pool'o likęs straipsnis negali aplenkti k-ojo. Sum atveju pool'o
+    straipsnių sumos perskaičiuojamos tiksliai per index.article_rows.
+    """
+    n = scores.size
+    if n == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    full = None
+    if agg != "max":
+        # score kiekvienai indekso eilutei; ne kandidatai (filtras / lexical) -> -inf
+        if row_idxs is None:
+            full = scores
+        else:
+            full = np.full(index.size, -np.inf, dtype=np.float32)
+            full[row_idxs] = scores
+
+    pool = min(n, max(k * top_n * 4, 64))
+    while True:
+        idxs = np.argpartition(-scores, pool - 1)[:pool] if pool < n else np.arange(n)
+        cand_scores = scores[idxs]
+        cand_rows = idxs if row_idxs is None else row_idxs[idxs]
+        arts = index.article_ids[cand_rows]
+
+        # straipsnis ASC, score DESC -> kiekvienos grupės pirmas elementas = geriausias chunk
+        order = np.lexsort((-cand_scores, arts))
+        arts, cand_scores, cand_rows = arts[order], cand_scores[order], cand_rows[order]
+        starts = np.flatnonzero(np.r_[True, arts[1:] != arts[:-1]])
+
+        if agg == "max":
+            group_scores = cand_scores[starts]
+        else:
+            rows, group = index.article_rows(arts[starts])
+            vals = full[rows]
+            order = np.lexsort((-vals, group))
+            vals, group = vals[order], group[order]
+            g_starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+            rank_in_group = np.arange(group.size) - np.repeat(g_starts, np.diff(np.r_[g_starts, group.size]))
+            take = (rank_in_group < top_n) & np.isfinite(vals)
+            group_scores = np.bincount(group[take], weights=vals[take], minlength=starts.size)
+
+        top_groups, top_scores = topk_rows(None, group_scores.astype(np.float32), k)
+
+        if pool >= n:
+            break
+        floor = float(cand_scores.min())
+        bound = floor if agg == "max" else top_n * max(floor, 0.0) + min(floor, 0.0)
+        if top_groups.size >= k and float(top_scores[-1]) >= bound:
+            break
+        pool = min(n, pool * 4)
+
+    return cand_rows[starts[top_groups]], top_scores
+
+
+def collapse_near_duplicates(
+    index: SearchIndex,
+    rows: np.ndarray,
+    scores: np.ndarray,
+    k: int,
+    threshold: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Greedy: einam pagal score ir praleidžiam rezultatą, jei jo vektorius
+    cosine >= threshold su jau paimtu (agentūrinės kopijos). Tik indekso masyvai, be DB.
+    """
+    if rows.size == 0:
+        return rows, scores
+    vecs = index.vectors[rows] / (index.norms[rows, None] + 1e-12)
+    kept: List[int] = []
+    for i in range(rows.size):
+        if kept and float(np.max(vecs[kept] @ vecs[i])) >= threshold:
+            continue
+        kept.append(i)
+        if len(kept) >= k:
+            break
+    return rows[kept], scores[kept]
+
+
+def encode_query(st_model, query: str, normalize: bool) -> np.ndarray:
+    # E5: naudoti prefix "query: "
+    q_vec = st_model.encode([f"query: {query}"], convert_to_numpy=True, show_progress_bar=False)[0].astype(np.float32)
+    if normalize:
+        q_vec = q_vec / (np.linalg.norm(q_vec) + 1e-12)
+    return q_vec
+
+
+def rank(index: SearchIndex, bm25: Optional[BM25Index], query: str, q_vec: Optional[np.ndarray], mask, args):
+    """
+    Pagal CLI parametrus: mode -> (grupavimas per article_id) -> (near-dup collapse).
+    Grąžina (index eilutės, scores).
+    """
+    want = args.topk * 3 if args.collapse_dups else args.topk
+
+    def ranked(k: int):
+        if args.mode == "vector":
+            return vector_search(index, q_vec, mask, k, args.binary_candidates)
+        if args.mode == "lexical":
+            return lexical_search(index, bm25, query, mask, k)
+        return hybrid_search(
+            index, bm25, query, q_vec, mask, k,
+            depth=max(args.fuse_depth, k), rrf_k=args.rrf_k, candidates=args.binary_candidates,
+        )
+
+    if args.group_by_article:
+        if args.mode == "vector":
+            row_idxs, scores = score_candidates(index, q_vec, mask)
+        else:
+            row_idxs, scores = ranked(max(args.fuse_depth, want * args.group_top_n * 4))
+        top_rows, top_scores = grouped_topk(
+            index, row_idxs, scores, want, agg=args.group_agg, top_n=args.group_top_n
+        )
+    else:
+        top_rows, top_scores = ranked(want)
+
+    if args.collapse_dups:
+        top_rows, top_scores = collapse_near_duplicates(index, top_rows, top_scores, args.topk, args.collapse_dups)
+    return top_rows, top_scores
+
+
+# -----------------------------
+# Result cache (result_cache.py)
+# -----------------------------
+def cache_params(args) -> Dict[str, Any]:
+    """
+    Viskas, kas keičia rezultatą, išskyrus užklausą. Filtrai – CLI argumentai (ne išspręsti ts),
+    todėl --last-days raktas nesikeičia, o slenkantis langas pritaikomas per CachedResult.within.
+    """
+    return {
+        "mode": args.mode,
+        "topk": args.topk,
+        "candidates": args.binary_candidates,
+        "group": [args.group_agg, args.group_top_n] if args.group_by_article else None,
+        "collapse": args.collapse_dups,
+        "fuse": [args.fuse_depth, args.rrf_k] if args.mode == "hybrid" else None,
+        "since": args.since,
+        "until": args.until,
+        "last_days": args.last_days,
+        "source": sorted(args.source or []),
+        "topic": sorted(args.topic or []),
+        "section": sorted(args.section or []),
+        "article_id": sorted(args.article_id or []),
+    }
+
+
+def cache_patchable(args) -> bool:
+    """
+    Tik tikslus cosine top-k (ir max grupavimas) išlieka tikslus papildžius naujų eilučių top-k;
+    BM25 / RRF / sum / collapse rezultatai priklauso nuo viso korpuso -> invalidacija.
+    """
+    return args.mode == "vector" and not args.collapse_dups and (not args.group_by_article or args.group_agg == "max")
+
+
+def cached_search(
+    conn, cache: ResultCache, key: str, q_vec: Optional[np.ndarray], filters: SearchFilters, args
+) -> Optional[Tuple[CachedResult, str]]:
+    """
+    (rezultatas, būsena) iš cache; None -> cache nėra / nebetinka, reikia pilnos paieškos.
+    Įrašo watermark'as – nusistovėjęs embeddings.id (embedder.settled_id): lygiagrečiai commitinami
+    embeddingai gali atsirasti žemiau MAX(id). Tikslioje vektorinėje paieškoje kaskart įvertinamos visos
+    eilutės virš watermark'o (nauja nusistovėjusi dalis + jaunesnė uodega) ir sulyginamos su saugomu top-k;
+    uodega perskenuojama, kol nusistovi (merge_delta dubliką pašalina).
+    """
+    entry = cache.get(key)
+    if entry is None:
+        metrics.ITEMS.inc(stage="search", kind="cache_miss")
+        return None
+    settled = settled_id(conn, "embeddings", args.model)
+    if not entry.patchable:
+        if settled > entry.watermark:
+            metrics.ITEMS.inc(stage="search", kind="cache_invalidated")
+            return None
+        metrics.ITEMS.inc(stage="search", kind="cache_hit")
+        status = "hit"
+    else:
+        stored_watermark = entry.watermark
+        delta = load_index(conn, args.model, 0, page_size=args.page_size, verbose=False, after_id=entry.watermark)
+        if delta is None:
+            status = "hit"
+        else:
+            mask = build_filter_mask(delta, filters)
+            if args.group_by_article:
+                row_idxs, scores = score_candidates(delta, q_vec, mask)
+                rows, top = grouped_topk(delta, row_idxs, scores, entry.depth, agg="max")
+            else:
+                rows, top = vector_search(delta, q_vec, mask, entry.depth)
+            delta_top = result_from_rows(delta, rows, top, settled, True, entry.group_by_article, entry.depth)
+            entry = merge_delta(entry, delta_top)
+            status = f"patched(+{delta.size})"
+        if settled > entry.watermark:
+            # naujos eilutės be chunko / straipsnio (ištrinta) – nieko nepridės, bet watermark'as juda
+            entry = replace(entry, watermark=settled)
+        if delta is not None or entry.watermark != stored_watermark:
+            cache.put(key, entry)
+        metrics.ITEMS.inc(stage="search", kind="cache_hit" if delta is None else "cache_patched")
+
+    visible = entry.within(filters.since_ts, filters.until_ts)
+    if visible.size < args.topk and entry.size >= entry.depth:
+        # langas nuslinko: iškritusius pakeistų rezultatai už saugomo gylio
+        return None
+    return visible, status
+
+
+def _resolve_ids(conn, sql: str, values: List[str]) -> List[int]:
+    """
+    Skaitinės reikšmės -> id tiesiogiai, kitos -> per lookup lentelę (sources / topics).
+    """
+    ids = [int(v) for v in values if v.strip().isdigit()]
+    names = [v.strip() for v in values if v.strip() and not v.strip().isdigit()]
+    if names:
+        with conn.cursor() as cur:
+            for name in names:
+                cur.execute(sql, (name, name))
+                found = [int(r[0]) for r in cur.fetchall()]
+                if not found:
+                    raise SystemExit(f"Unknown filter value: {name}")
+                ids.extend(found)
+    return ids
+
+
+def resolve_source_ids(conn, values: List[str]) -> List[int]:
+    return _resolve_ids(conn, "SELECT id FROM sources WHERE name = %s OR domain = %s", values)
+
+
+def resolve_topic_ids(conn, values: List[str]) -> List[int]:
+    return _resolve_ids(conn, "SELECT id FROM topics WHERE code = %s OR name = %s", values)
+
+
+def build_filters(conn, args) -> SearchFilters:
+    since_ts = parse_date_arg(args.since) if args.since else None
+    if args.last_days is not None:
+        last = last_days_ts(args.last_days)
+        since_ts = last if since_ts is None else max(since_ts, last)
+
+    return SearchFilters(
+        since_ts=since_ts,
+        until_ts=parse_date_arg(args.until) if args.until else None,
+        source_ids=resolve_source_ids(conn, args.source) if args.source else None,
+        topic_ids=resolve_topic_ids(conn, args.topic) if args.topic else None,
+        sections=args.section or None,
+        article_ids=args.article_id or None,
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(description="Semantic search prototype over stored chunk embeddings.")
     parser.add_argument("query", type=str, help="Vartotojo claim / užklausa (lietuviškai)")
-    parser.add_argument("--model", type=str, default="intfloat/multilingual-e5-small", help="Model name (must match embeddings.model)")
+    parser.add_argument("--model", type=str, default=None, help="Model name (must match embeddings.model; default: serving modelis iš embedding_models, kitaip $EMBED_MODEL)")
     parser.add_argument("--topk", type=int, default=10, help="Kiek rezultatų grąžinti (default: 10)")
-    parser.add_argument("--limit", type=int, default=5000, help="Kiek embeddingų iš DB užkrauti į RAM (default: 5000)")
+    parser.add_argument("--limit", type=int, default=5000, help="Kiek embeddingų iš DB užkrauti į RAM, 0 = visus (default: 5000)")
+    parser.add_argument("--page-size", type=int, default=50_000, help="Keyset puslapio dydis kraunant embeddingus (default: 50000)")
     parser.add_argument("--device", type=str, default=None, help="cpu/cuda (default: auto)")
     parser.add_argument("--normalize-query", action="store_true", help="Normalizuoti query embedding (rekomenduojama)")
     parser.add_argument("--show-chars", type=int, default=350, help="Kiek chunk teksto simbolių parodyti (default: 350)")
+    parser.add_argument("--mode", choices=("vector", "lexical", "hybrid"), default="vector", help="Paieškos režimas (default: vector)")
+    parser.add_argument("--lexical-index", type=str, default=default_index_path(), help="BM25 indekso failas (default: $SEARCH_INDEX_DIR/bm25.npz)")
+    parser.add_argument("--fuse-depth", type=int, default=100, help="Hybrid: kiek kandidatų iš kiekvieno ranking'o fuzuoti (default: 100)")
+    parser.add_argument("--rrf-k", type=int, default=60, help="Hybrid: RRF konstanta (default: 60)")
+    parser.add_argument("--group-by-article", action="store_true", help="Grąžinti k skirtingų straipsnių (vienas geriausias chunk kiekvienam)")
+    parser.add_argument("--group-agg", choices=("max", "sum"), default="max", help="Straipsnio score: max arba top-n chunkų suma (default: max)")
+    parser.add_argument("--group-top-n", type=int, default=3, help="--group-agg sum: kiek geriausių chunkų sumuoti (default: 3)")
+    parser.add_argument("--binary-candidates", type=int, default=0, help="Dviejų etapų paieška: tiek kandidatų pagal Hamming (binarinius kodus), tada tikslus rerank (pvz. 300; 0 = tikslus)")
+    parser.add_argument("--snapshot", action="store_true", help="Krauti build_index.py snapshot'ą ($SEARCH_INDEX_DIR/vectors/<model>) + naujas DB eilutes vietoj viso DB")
+    parser.add_argument("--cache", action="store_true", default=os.environ.get("SEARCH_CACHE", "") == "1", help="Rezultatų cache (default: $SEARCH_CACHE=1); naujos eilutės pridedamos delta scan'u")
+    parser.add_argument("--cache-dir", type=str, default=default_cache_dir(), help="Cache katalogas (default: $SEARCH_INDEX_DIR/result_cache)")
+    parser.add_argument("--cache-max-entries", type=int, default=2000, help="Kiek rezultatų laikyti modeliui (LRU, default: 2000)")
+    parser.add_argument("--collapse-dups", type=float, default=0.0, help="Sutraukti beveik identiškus rezultatus, jei cosine >= šitos reikšmės (pvz. 0.95; 0 = išjungta)")
+
+    # filtrai (taikomi prieš top-k)
+    parser.add_argument("--since", type=str, default=None, help="published_at >= (YYYY-MM-DD[THH:MM], UTC)")
+    parser.add_argument("--until", type=str, default=None, help="published_at <= (YYYY-MM-DD[THH:MM], UTC)")
+    parser.add_argument("--last-days", type=float, default=None, help="Tik paskutinių N dienų straipsniai")
+    parser.add_argument("--source", action="append", default=None, help="Source id / name / domain (galima kartoti)")
+    parser.add_argument("--topic", action="append", default=None, help="Topic id / code (galima kartoti)")
+    parser.add_argument("--section", action="append", default=None, help="URL sekcija, pvz. verslas arba naujienos/verslas (galima kartoti)")
+    parser.add_argument("--article-id", action="append", type=int, default=None, help="Tik šitie article_id (galima kartoti)")
+    parser.add_argument("--timings", action="store_true", help="Atspausdinti laiką per fazę (load / encode / rank / hydrate)")
+    parser.add_argument("--profile", action="store_true", help="cProfile / pyinstrument (PROFILER env) -> $PROFILE_DIR")
     args = parser.parse_args()
 
     required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
@@ -113,54 +650,118 @@ def main():
     if missing:
         raise SystemExit(f"Missing env vars: {', '.join(missing)}")
 
+    if args.device is not None and not str(args.device).strip():
+        args.device = None
+
+    metrics.configure("search")
+    timer = metrics.SEARCH_SECONDS.time
     conn = db_connect()
     try:
-        rows = fetch_embeddings_with_context(conn, args.model, args.limit)
-    finally:
-        conn.close()
+        with metrics.profiled("search", enabled=args.profile or None):
+            # vienas skaitymas užklausos pradžioje: perjungimas (reembed.switch_model) atomiškas,
+            # todėl visa užklausa (indeksas + query encoder) naudoja tą patį modelį
+            args.model = args.model or serving_model(conn) or os.environ.get("EMBED_MODEL") or DEFAULT_MODEL
+            filters = build_filters(conn, args)
+            group = f" group={args.group_agg}" if args.group_by_article else ""
+            cache = ResultCache(args.cache_dir, args.model, args.cache_max_entries) if args.cache else None
 
-    if not rows:
-        print("[search] No embeddings found for this model. (embeddings table empty or model mismatch)")
-        return
+            def query_vector() -> np.ndarray:
+                # kartojama užklausa -> vektorius iš cache, modelis nekraunamas
+                vec = cache.query_vector(args.query, args.normalize_query) if cache is not None else None
+                if vec is None:
+                    with timer(phase="model_load"):
+                        st_model = load_model(args.model, device=args.device)
+                    with timer(phase="encode"):
+                        vec = encode_query(st_model, args.query, args.normalize_query)
+                    if cache is not None:
+                        cache.put_query_vector(args.query, args.normalize_query, vec)
+                return vec
 
-    dims = rows[0]["dims"]
-    # load matrix
-    vecs = np.vstack([blob_to_vec(r["embedding_blob"], dims) for r in rows]).astype(np.float32)
+            q_vec = None
+            cached = None
+            if cache is not None:
+                if args.mode != "lexical":
+                    q_vec = query_vector()
+                key = cache.key(q_vec, args.query, cache_params(args))
+                with timer(phase="cache"):
+                    cached = cached_search(conn, cache, key, q_vec, filters, args)
 
-    # embed query (E5: naudoti prefix "query: ")
-    st_model = SentenceTransformer(args.model, device=args.device)
-    
-    if args.device is not None and not str(args.device).strip():
-        args.device = None
+            if cached is not None:
+                res, status = cached
+                chunk_ids = res.chunk_ids[: args.topk].tolist()
+                top_scores = res.scores[: args.topk]
+                header = f"mode={args.mode}{group} cache={status} watermark={res.watermark}"
+            else:
+                with timer(phase="load"):
+                    # prieš krovimą: visos eilutės <= settled jau commitintos ir pateks į indeksą
+                    settled = settled_id(conn, "embeddings", args.model) if cache is not None else 0
+                    if args.snapshot:
+                        index = load_snapshot_synced(conn, args.model, default_snapshot_path(args.model), page_size=args.page_size)
+                    else:
+                        index = load_index(conn, args.model, args.limit, page_size=args.page_size)
+                if index is None:
+                    print("[search] No embeddings found for this model. (embeddings table empty or model mismatch)")
+                    return
+                with timer(phase="lexical_load"):
+                    bm25 = load_or_sync(conn, args.lexical_index) if args.mode != "vector" else None
 
-    q_text = f"query: {args.query}"
-    q_vec = st_model.encode([q_text], convert_to_numpy=True, show_progress_bar=False)[0].astype(np.float32)
+                truncated = not args.snapshot and args.limit > 0 and index.size >= args.limit
+                if truncated and not filters.is_empty():
+                    print(f"[search] warning: corpus truncated to --limit {args.limit}; filters apply only to loaded rows (use --limit 0)")
+                if truncated and cache is not None:
+                    print(f"[search] cache: corpus truncated to --limit {args.limit}; result not cached (use --limit 0 or --snapshot)")
+                store = cache is not None and not truncated
 
-    if args.normalize_query:
-        n = np.linalg.norm(q_vec) + 1e-12
-        q_vec = q_vec / n
+                with timer(phase="filter"):
+                    mask = build_filter_mask(index, filters)
+                if mask is not None and not mask.any():
+                    print(f"[search] model={args.model} dims={index.dims} searched=0 (no rows match filters)")
+                    return
 
-    scores = cosine_sim_matrix(q_vec, vecs)
-    topk = min(args.topk, scores.size)
-    idxs = np.argpartition(-scores, topk - 1)[:topk]
-    idxs = idxs[np.argsort(-scores[idxs])]
+                if q_vec is None and args.mode != "lexical":
+                    q_vec = query_vector()
 
-    print(f"[search] model={args.model} dims={dims} searched={len(rows)} topk={topk}\n")
+                # cache'ui – DEPTH_FACTOR kartų giliau, kad slenkantis laiko langas neištuštintų įrašo
+                depth = args.topk * DEPTH_FACTOR if store else args.topk
+                with timer(phase="rank"):
+                    top_rows, top_scores = rank(index, bm25, args.query, q_vec, mask, argparse.Namespace(**{**vars(args), "topk": depth}))
+                if store:
+                    cache.put(key, result_from_rows(
+                        index, top_rows, top_scores, settled, cache_patchable(args),
+                        args.group_by_article and args.group_agg == "max", depth,
+                    ))
+                top_rows, top_scores = top_rows[: args.topk], top_scores[: args.topk]
+                chunk_ids = index.chunk_ids[top_rows].tolist()
+                searched = index.size if mask is None else int(mask.sum())
+                header = f"dims={index.dims} mode={args.mode}{group} searched={searched}/{index.size}"
 
-    for rank, i in enumerate(idxs, start=1):
-        r = rows[int(i)]
-        s = float(scores[int(i)])
+            with timer(phase="hydrate"):
+                hydrated = hydrate_chunks(conn, chunk_ids)
+    finally:
+        conn.close()
+
+    print(f"[search] model={args.model} {header} topk={len(chunk_ids)}\n")
+
+    for pos, (chunk_id, s) in enumerate(zip(chunk_ids, top_scores.tolist()), start=1):
+        r = hydrated.get(chunk_id)
+        if r is None:
+            # chunkas ištrintas po indekso užkrovimo
+            continue
         snippet = (r["chunk_text"] or "").strip().replace("\n", " ")
         if len(snippet) > args.show_chars:
             snippet = snippet[: args.show_chars] + "…"
 
-        print(f"{rank}. score={s:.4f}  article_id={r['article_id']}  chunk_id={r['chunk_id']}  idx={r['chunk_index']}")
+        print(f"{pos}. score={s:.4f}  article_id={r['article_id']}  chunk_id={r['chunk_id']}  idx={r['chunk_index']}")
         print(f"   title: {r['title']}")
         print(f"   url:   {r['canonical_url']}")
         if r["published_at"]:
             print(f"   published_at: {r['published_at']}")
         print(f"   text:  {snippet}\n")
 
+    if args.timings:
+        phases = metrics.SEARCH_SECONDS.summary()
+        print("[search] timings ms: " + " ".join(f"{k.split('=', 1)[1]}={v['mean_ms']}" for k, v in phases.items()))
+
 
 if __name__ == "__main__":
     main()
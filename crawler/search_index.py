@@ -0,0 +1,431 @@
+import os
+import json
+import shutil
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# published_at IS NULL -> šita reikšmė (nepraeina jokio datos filtro)
+NO_DATE = np.iinfo(np.int64).min
+NO_ID = -1
+
+# popcount(0..65535): Hamming per uint16 žodžius – pusė tiek lookup'ų kaip per baitus
+_POPCOUNT8 = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+POPCOUNT16 = (_POPCOUNT8[:, None] + _POPCOUNT8[None, :]).ravel()
+
+
+# -----------------------------
+# Index
+# -----------------------------
+@dataclass
+class SearchIndex:
+    """
+    Vektorių matrica + su ja sulygiuoti (tas pats eilučių indeksas) metadata masyvai.
+    Filtrai skaičiuojami vektoriškai per šituos masyvus, dar prieš scoring / top-k.
+    """
+    vectors: np.ndarray          # (N, D) float32
+    norms: np.ndarray            # (N,) float32, ||v||
+    embedding_ids: np.ndarray    # (N,) int64
+    chunk_ids: np.ndarray        # (N,) int64
+    article_ids: np.ndarray      # (N,) int64
+    published_ts: np.ndarray     # (N,) int64 unix sekundės (UTC), NO_DATE jei NULL
+    source_ids: np.ndarray       # (N,) int32
+    topic_ids: np.ndarray        # (N,) int32, NO_ID jei NULL
+    section_codes: np.ndarray    # (N,) int32 -> sections[code]
+    sections: List[str] = field(default_factory=list)
+    codes: Optional[np.ndarray] = field(default=None, repr=False)        # (N, B) uint8, sign(v - center) bitai
+    code_center: Optional[np.ndarray] = field(default=None, repr=False)  # (D,) float32
+    _chunk_order: Optional[np.ndarray] = field(default=None, repr=False)
+    _article_order: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def size(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @property
+    def dims(self) -> int:
+        return int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0
+
+    def rows_for_chunk_ids(self, chunk_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        chunk_id -> eilutės indeksas (per searchsorted).
+        Grąžina (found bool kaukė chunk_ids ilgio, rows tik rastiems).
+        """
+        if self._chunk_order is None:
+            self._chunk_order = np.argsort(self.chunk_ids, kind="stable")
+        sorted_ids = self.chunk_ids[self._chunk_order]
+        pos = np.searchsorted(sorted_ids, chunk_ids)
+        pos = np.minimum(pos, max(sorted_ids.size - 1, 0))
+        found = sorted_ids[pos] == chunk_ids if sorted_ids.size else np.zeros(len(chunk_ids), dtype=bool)
+        return found, self._chunk_order[pos[found]]
+
+    def article_rows(self, article_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Visos nurodytų straipsnių eilutės (CSR per article_id surūšiuotą tvarką).
+        Grąžina (rows, group) kur group[i] = pozicija article_ids masyve.
+        """
+        if self._article_order is None:
+            self._article_order = np.argsort(self.article_ids, kind="stable")
+        sorted_ids = self.article_ids[self._article_order]
+        lo = np.searchsorted(sorted_ids, article_ids, side="left")
+        hi = np.searchsorted(sorted_ids, article_ids, side="right")
+        lengths = hi - lo
+        group = np.repeat(np.arange(len(article_ids)), lengths)
+        offsets = np.repeat(lo - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+        return self._article_order[offsets + np.arange(group.size)], group
+
+
+class StackedVectors:
+    """
+    Kelios (N_i, D) matricos kaip viena (N, D) be kopijos: snapshot'o mmap + maža DB delta.
+    Palaiko tik tai, ką daro paieška: shape / ndim / nbytes, v[rows], v[a:b] ir v @ q.
+    """
+
+    ndim = 2
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, parts: Sequence[np.ndarray]):
+        self.parts = list(parts)
+        self._starts = np.cumsum([0] + [p.shape[0] for p in self.parts])
+        self.shape = (int(self._starts[-1]), int(self.parts[0].shape[1]))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(int(p.nbytes) for p in self.parts)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        if isinstance(rows, slice):
+            rows = np.arange(self.shape[0])[rows]
+        rows = np.asarray(rows, dtype=np.int64)
+        part = np.searchsorted(self._starts, rows, side="right") - 1
+        out = np.empty((rows.size, self.shape[1]), dtype=np.float32)
+        for i, p in enumerate(self.parts):
+            sel = part == i
+            if sel.any():
+                out[sel] = p[rows[sel] - self._starts[i]]
+        return out
+
+    def __matmul__(self, q: np.ndarray) -> np.ndarray:
+        return np.concatenate([p @ q for p in self.parts])
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        out = np.concatenate(self.parts)
+        return out if dtype is None else out.astype(dtype)
+
+
+def allocate_index(n: int, dims: int) -> SearchIndex:
+    """
+    Tušti (N, ...) masyvai, kuriuos loaderis užpildo eilutė po eilutės.
+    """
+    return SearchIndex(
+        vectors=np.empty((n, dims), dtype=np.float32),
+        norms=np.empty(0, dtype=np.float32),
+        embedding_ids=np.empty(n, dtype=np.int64),
+        chunk_ids=np.empty(n, dtype=np.int64),
+        article_ids=np.empty(n, dtype=np.int64),
+        published_ts=np.empty(n, dtype=np.int64),
+        source_ids=np.empty(n, dtype=np.int32),
+        topic_ids=np.empty(n, dtype=np.int32),
+        section_codes=np.empty(n, dtype=np.int32),
+    )
+
+
+def finalize_index(index: SearchIndex, n: int, section_vocab: Dict[str, int]) -> SearchIndex:
+    """
+    Nukerpa iki n užpildytų eilučių (view, be kopijos), suskaičiuoja normas.
+    section_vocab: sekcija -> kodas (kaip užpildyta section_codes).
+    """
+    index.vectors = index.vectors[:n]
+    index.embedding_ids = index.embedding_ids[:n]
+    index.chunk_ids = index.chunk_ids[:n]
+    index.article_ids = index.article_ids[:n]
+    index.published_ts = index.published_ts[:n]
+    index.source_ids = index.source_ids[:n]
+    index.topic_ids = index.topic_ids[:n]
+    index.section_codes = index.section_codes[:n]
+    # einsum vietoj np.linalg.norm(axis=1): be (N, D) laikinos kopijos
+    index.norms = np.sqrt(np.einsum("ij,ij->i", index.vectors, index.vectors)).astype(np.float32)
+
+    sections = [""] * len(section_vocab)
+    for section, code in section_vocab.items():
+        sections[code] = section
+    index.sections = sections
+    return index
+
+
+def concat_indexes(a: SearchIndex, b: SearchIndex, stack: bool = False) -> SearchIndex:
+    """
+    a + b eilutės (b sekcijų kodai perrašomi į a žodyną). Binariniai kodai b eilutėms skaičiuojami
+    su a centru, todėl atstumai lieka palyginami.
+    stack=True: vektoriai nekopijuojami (StackedVectors) – a.vectors lieka mmap, sujungiami tik
+    kodai ir metadata; saugoti (save_snapshot) tokio indekso nereikia.
+    """
+    vocab = {section: code for code, section in enumerate(a.sections)}
+    remap = np.asarray([vocab.setdefault(section, len(vocab)) for section in b.sections], dtype=np.int32)
+    b_sections = remap[b.section_codes] if b.size else b.section_codes
+
+    out = SearchIndex(
+        vectors=StackedVectors([a.vectors, b.vectors]) if stack else np.concatenate([a.vectors, b.vectors]),
+        norms=np.concatenate([a.norms, b.norms]),
+        embedding_ids=np.concatenate([a.embedding_ids, b.embedding_ids]),
+        chunk_ids=np.concatenate([a.chunk_ids, b.chunk_ids]),
+        article_ids=np.concatenate([a.article_ids, b.article_ids]),
+        published_ts=np.concatenate([a.published_ts, b.published_ts]),
+        source_ids=np.concatenate([a.source_ids, b.source_ids]),
+        topic_ids=np.concatenate([a.topic_ids, b.topic_ids]),
+        section_codes=np.concatenate([a.section_codes, b_sections]),
+        sections=[""] * len(vocab),
+    )
+    for section, code in vocab.items():
+        out.sections[code] = section
+    if a.codes is not None:
+        out.code_center = a.code_center
+        out.codes = np.concatenate([a.codes, binarize(b.vectors, a.code_center)])
+    return out
+
+
+# -----------------------------
+# Snapshot (build_index.py)
+# -----------------------------
+# <dir>/vectors.npy + codes.npy – np.load(mmap_mode="r"): coarse scan skaito tik kodus (~D/8 baitų eilutei),
+# float32 eilutės iš page cache paimamos tik rerank kandidatams.
+_SNAPSHOT_COLUMNS = ("norms", "embedding_ids", "chunk_ids", "article_ids", "published_ts", "source_ids", "topic_ids", "section_codes")
+
+
+def default_snapshot_path(model_name: str) -> str:
+    slug = "".join(c if c.isalnum() or c in "._-" else "_" for c in model_name)
+    return os.path.join(os.environ.get("SEARCH_INDEX_DIR", ".index"), "vectors", slug)
+
+
+def save_snapshot(index: SearchIndex, path: str, model_name: str, watermark: Optional[int] = None) -> None:
+    """
+    Atomiškai: rašoma į <path>.tmp, tada rename (senas katalogas ištrinamas).
+    watermark – iki kurio embeddings.id snapshot'as pilnas (embedder.settled_id); None -> didžiausias id.
+    """
+    ensure_codes(index)
+    tmp = path.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "vectors.npy"), index.vectors)
+    np.save(os.path.join(tmp, "codes.npy"), index.codes)
+    np.savez(
+        os.path.join(tmp, "meta.npz"),
+        code_center=index.code_center,
+        **{name: getattr(index, name) for name in _SNAPSHOT_COLUMNS},
+    )
+    with open(os.path.join(tmp, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"model": model_name, "rows": index.size, "dims": index.dims, "sections": index.sections,
+             "watermark": watermark if watermark is not None else int(index.embedding_ids.max()) if index.size else 0},
+            f,
+            ensure_ascii=False,
+        )
+    old = path.rstrip("/") + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load_snapshot(path: str, mmap: bool = True) -> Tuple[SearchIndex, Dict]:
+    """
+    (index, info), info = index.json (model, rows, dims, watermark = iki kurio embeddings.id snapshot'as pilnas).
+    """
+    with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+        info = json.load(f)
+    mode = "r" if mmap else None
+    with np.load(os.path.join(path, "meta.npz")) as z:
+        columns = {name: z[name] for name in _SNAPSHOT_COLUMNS}
+        center = z["code_center"]
+    index = SearchIndex(
+        vectors=np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode),
+        sections=list(info["sections"]),
+        codes=np.load(os.path.join(path, "codes.npy")),
+        code_center=center,
+        **columns,
+    )
+    return index, info
+
+
+# -----------------------------
+# Filters
+# -----------------------------
+@dataclass
+class SearchFilters:
+    since_ts: Optional[int] = None
+    until_ts: Optional[int] = None
+    source_ids: Optional[Sequence[int]] = None
+    topic_ids: Optional[Sequence[int]] = None
+    sections: Optional[Sequence[str]] = None
+    article_ids: Optional[Sequence[int]] = None
+
+    def is_empty(self) -> bool:
+        return all(
+            v is None
+            for v in (self.since_ts, self.until_ts, self.source_ids, self.topic_ids, self.sections, self.article_ids)
+        )
+
+
+def to_unix_ts(dt: datetime) -> int:
+    # DB datetime'ai yra UTC-naive (žr. extract.parse_iso_datetime_to_utc_naive)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def parse_date_arg(s: str) -> int:
+    """
+    '2026-01-31' arba '2026-01-31T12:00' -> unix sekundės (UTC).
+    """
+    return to_unix_ts(datetime.fromisoformat(s.strip()))
+
+
+def last_days_ts(days: float, now: Optional[datetime] = None) -> int:
+    now = now or datetime.now(timezone.utc)
+    return to_unix_ts(now - timedelta(days=days))
+
+
+def _section_matches(section: str, wanted: str) -> bool:
+    wanted = wanted.strip("/")
+    if not wanted:
+        return False
+    return section == wanted or section.startswith(wanted + "/") or section.endswith("/" + wanted)
+
+
+def section_codes_for(index: SearchIndex, wanted: Sequence[str]) -> np.ndarray:
+    codes = [
+        code
+        for code, section in enumerate(index.sections)
+        if any(_section_matches(section, w) for w in wanted)
+    ]
+    return np.asarray(codes, dtype=np.int32)
+
+
+def build_filter_mask(index: SearchIndex, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+    """
+    Grąžina bool kaukę (N,) sulygiuotą su index.vectors, arba None jei filtrų nėra.
+    Visos sąlygos AND'inamos.
+    """
+    if filters is None or filters.is_empty():
+        return None
+
+    mask = np.ones(index.size, dtype=bool)
+
+    if filters.since_ts is not None:
+        # NO_DATE yra int64 min, todėl NULL datos atkrenta automatiškai
+        mask &= index.published_ts >= filters.since_ts
+    if filters.until_ts is not None:
+        mask &= (index.published_ts <= filters.until_ts) & (index.published_ts != NO_DATE)
+    if filters.source_ids is not None:
+        mask &= np.isin(index.source_ids, np.asarray(filters.source_ids, dtype=np.int32))
+    if filters.topic_ids is not None:
+        mask &= np.isin(index.topic_ids, np.asarray(filters.topic_ids, dtype=np.int32))
+    if filters.sections is not None:
+        mask &= np.isin(index.section_codes, section_codes_for(index, filters.sections))
+    if filters.article_ids is not None:
+        mask &= np.isin(index.article_ids, np.asarray(filters.article_ids, dtype=np.int64))
+
+    return mask
+
+
+# -----------------------------
+# Scoring
+# -----------------------------
+def score_candidates(index: SearchIndex, query_vec: np.ndarray, mask: Optional[np.ndarray]):
+    """
+    Cosine tik per kaukę praėjusias eilutes (kaina ~ selektyvumui).
+    Grąžina (row_idxs, scores); be kaukės row_idxs = None (visos eilutės).
+    """
+    if mask is None:
+        q = np.asarray(query_vec, dtype=np.float32)
+        qn = float(np.linalg.norm(q)) + 1e-12
+        return None, (index.vectors @ q) / (index.norms * qn + 1e-12)
+    return score_rows(index, query_vec, np.flatnonzero(mask))
+
+
+def score_rows(index: SearchIndex, query_vec: np.ndarray, rows: np.ndarray):
+    """
+    Tikslus float32 cosine nurodytoms eilutėms (filtrai / binary rerank). Grąžina (rows, scores).
+    """
+    if rows.size == 0:
+        return rows, np.empty(0, dtype=np.float32)
+    q = np.asarray(query_vec, dtype=np.float32)
+    qn = float(np.linalg.norm(q)) + 1e-12
+    return rows, (index.vectors[rows] @ q) / (index.norms[rows] * qn + 1e-12)
+
+
+# -----------------------------
+# Binary coarse stage (1 bit / dim)
+# -----------------------------
+def binarize(vectors: np.ndarray, center: np.ndarray, block: int = 65536) -> np.ndarray:
+    """
+    sign(v - center) -> np.packbits, (N, B) uint8; B suapvalinamas iki lyginio (uint16 view Hamming'ui).
+    Centras (korpuso vidurkis) svarbus: sakinių embeddingai anizotropiški, be jo daug bitų visiems vienodi.
+    """
+    n, dims = vectors.shape
+    width = (dims + 15) // 16 * 2
+    out = np.zeros((n, width), dtype=np.uint8)
+    for start in range(0, n, block):
+        end = min(n, start + block)
+        out[start:end, : (dims + 7) // 8] = np.packbits(vectors[start:end] > center, axis=1)
+    return out
+
+
+def ensure_codes(index: SearchIndex) -> SearchIndex:
+    if index.codes is None:
+        if index.size:
+            center = np.zeros(index.dims, dtype=np.float64)
+            for start in range(0, index.size, 65536):
+                center += index.vectors[start:start + 65536].sum(axis=0, dtype=np.float64)
+            index.code_center = (center / index.size).astype(np.float32)
+        else:
+            index.code_center = np.zeros(index.dims, dtype=np.float32)
+        index.codes = binarize(index.vectors, index.code_center)
+    return index
+
+
+def hamming_distances(codes: np.ndarray, q_code: np.ndarray, block: int = 32768) -> np.ndarray:
+    """
+    Hamming(codes[i], q_code) per POPCOUNT16 lentelę, blokais (xor + lookup buferiai lieka cache'e).
+    """
+    n = codes.shape[0]
+    words = codes.view(np.uint16)
+    q_words = q_code.view(np.uint16)
+    out = np.empty(n, dtype=np.uint16)
+    xor = np.empty((min(block, n), words.shape[1]), dtype=np.uint16)
+    bits = np.empty(xor.shape, dtype=np.uint8)
+    for start in range(0, n, block):
+        end = min(n, start + block)
+        m = end - start
+        np.bitwise_xor(words[start:end], q_words, out=xor[:m])
+        np.take(POPCOUNT16, xor[:m], out=bits[:m])
+        out[start:end] = bits[:m].sum(axis=1, dtype=np.uint16)
+    return out
+
+
+def nearest_by_distance(dist: np.ndarray, n: int) -> np.ndarray:
+    """
+    n pozicijų su mažiausiu atstumu (be tvarkos). Atstumai maži sveikieji, todėl vietoj argpartition –
+    histograma + slenkstis (du tiesiniai praėjimai).
+    """
+    if dist.size <= n:
+        return np.arange(dist.size)
+    cutoff = int(np.searchsorted(np.cumsum(np.bincount(dist)), n))
+    below = np.flatnonzero(dist < cutoff)
+    ties = np.flatnonzero(dist == cutoff)[: n - below.size]
+    return np.concatenate([below, ties])
+
+
+def coarse_candidates(index: SearchIndex, query_vec: np.ndarray, mask: Optional[np.ndarray], n: int) -> np.ndarray:
+    """
+    n eilučių, artimiausių užklausai pagal binarinius kodus (tik per kaukę praėjusios).
+    """
+    ensure_codes(index)
+    q_code = binarize(np.asarray(query_vec, dtype=np.float32)[None, :], index.code_center)[0]
+    if mask is None:
+        return nearest_by_distance(hamming_distances(index.codes, q_code), n)
+    rows = np.flatnonzero(mask)
+    return rows[nearest_by_distance(hamming_distances(index.codes[rows], q_code), n)]
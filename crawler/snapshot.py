@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import argparse
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+from embedder import settled_id
+from search_index import NO_DATE, NO_ID, SearchIndex, allocate_index, finalize_index
+
+# <dir>/
+#   _state.json                                 watermark'ai: {"articles": id, "article_chunks": id, "embeddings": {model: id}}
+#   articles/part-<lo>-<hi>.parquet             zstd (tekstai)
+#   article_chunks/part-<lo>-<hi>.parquet
+#   embeddings/model=<slug>/part-<lo>-<hi>.arrow  Arrow IPC be suspaudimo: mmap -> NumPy view be kopijos
+# Part failų vardai deterministiniai (id intervalas), todėl nutrūkęs eksportas tiesiog perrašo tą patį failą.
+STATE_FILE = "_state.json"
+DEFAULT_BATCH = 50_000
+
+ARTICLES_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("source_id", pa.int32()),
+    ("url_id", pa.int64()),
+    ("canonical_url", pa.string()),
+    ("title", pa.string()),
+    ("published_at", pa.timestamp("s")),
+    ("author", pa.string()),
+    ("topic_id", pa.int32()),
+    ("text", pa.string()),
+    ("chunk_status", pa.int8()),
+    ("duplicate_of", pa.int64()),
+    ("created_at", pa.timestamp("s")),
+])
+
+CHUNKS_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("article_id", pa.int64()),
+    ("chunk_index", pa.int32()),
+    ("chunk_text", pa.string()),
+])
+
+
+def embeddings_schema(dims: int) -> pa.Schema:
+    return pa.schema([
+        ("id", pa.int64()),
+        ("chunk_id", pa.int64()),
+        ("embedding", pa.list_(pa.float32(), dims)),
+    ])
+
+
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+        autocommit=True,
+    )
+
+
+def default_snapshot_dir() -> str:
+    return os.environ.get("SNAPSHOT_DIR", ".snapshot")
+
+
+def model_slug(model_name: str) -> str:
+    return "".join(c if c.isalnum() or c in "._-" else "_" for c in model_name)
+
+
+# -----------------------------
+# State (watermarks)
+# -----------------------------
+def load_state(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"articles": 0, "article_chunks": 0, "embeddings": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(out_dir: str, state: Dict[str, Any]) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+# -----------------------------
+# Writers
+# -----------------------------
+def _part_path(table_dir: str, lo: int, hi: int, ext: str) -> str:
+    return os.path.join(table_dir, f"part-{lo:012d}-{hi:012d}.{ext}")
+
+
+def write_parquet(table: pa.Table, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+
+def write_arrow(table: pa.Table, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with pa.OSFile(path + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + ".tmp", path)
+
+
+def articles_table(rows: List[Tuple]) -> pa.Table:
+    cols = list(zip(*rows)) if rows else [()] * len(ARTICLES_SCHEMA)
+    return pa.table([pa.array(c, type=f.type) for c, f in zip(cols, ARTICLES_SCHEMA)], schema=ARTICLES_SCHEMA)
+
+
+def chunks_table(rows: List[Tuple]) -> pa.Table:
+    cols = list(zip(*rows)) if rows else [()] * len(CHUNKS_SCHEMA)
+    return pa.table([pa.array(c, type=f.type) for c, f in zip(cols, CHUNKS_SCHEMA)], schema=CHUNKS_SCHEMA)
+
+
+def embeddings_table(ids: List[int], chunk_ids: List[int], blobs: List[bytes], dims: int) -> pa.Table:
+    """
+    float32 blob'ai -> FixedSizeList<float32>[dims]: viena ištisinė values buferio kopija.
+    """
+    flat = np.frombuffer(b"".join(blobs), dtype=np.float32)
+    if flat.size != len(blobs) * dims:
+        raise ValueError(f"Embedding dims mismatch: expected {dims} per row")
+    return pa.table(
+        [
+            pa.array(ids, type=pa.int64()),
+            pa.array(chunk_ids, type=pa.int64()),
+            pa.FixedSizeListArray.from_arrays(pa.array(flat), dims),
+        ],
+        schema=embeddings_schema(dims),
+    )
+
+
+# -----------------------------
+# Export (DB -> snapshot)
+# -----------------------------
+def _keyset_batches(conn, sql: str, params: Tuple, after_id: int, upto_id: int, batch: int) -> Iterator[List[Tuple]]:
+    """
+    sql: ... WHERE <filtrai> AND id > %s AND id <= %s ORDER BY id LIMIT %s; pirmas stulpelis – id.
+    """
+    while after_id < upto_id:
+        with conn.cursor(pymysql.cursors.SSCursor) as cur:
+            cur.execute(sql, params + (after_id, upto_id, batch))
+            rows = list(cur)
+        if not rows:
+            return
+        yield rows
+        after_id = int(rows[-1][0])
+
+
+def list_models(conn) -> List[str]:
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT model FROM embedding_watermarks ORDER BY model")
+        return [r[0] for r in cur.fetchall()]
+
+
+def export(
+    conn,
+    out_dir: str,
+    models: Optional[List[str]] = None,
+    batch: int = DEFAULT_BATCH,
+    log: Callable[[str], None] = print,
+) -> Dict[str, int]:
+    """
+    Inkrementinis eksportas: tik eilutės su watermark < id <= nusistovėjęs id (embedder.settled_id). Viršutinės
+    ribos imamos atvirkštine priklausomybių tvarka (embeddings -> chunks -> articles), todėl kiekvienas
+    eksportuotas embeddingas turi savo chunką ir straipsnį snapshot'e. Straipsnių UPDATE'ai / DELETE'ai nesekami (--rebuild).
+    """
+    state = load_state(out_dir)
+    models = models if models is not None else list_models(conn)
+    upto = {("embeddings", m): settled_id(conn, "embeddings", m) for m in models}
+    upto["article_chunks"] = settled_id(conn, "article_chunks")
+    upto["articles"] = settled_id(conn, "articles")
+    written: Dict[str, int] = {}
+
+    # articles
+    sql = """
+        SELECT id, source_id, url_id, canonical_url, title, published_at, author, topic_id, text,
+               chunk_status, duplicate_of, created_at
+        FROM articles
+        WHERE id > %s AND id <= %s
+        ORDER BY id LIMIT %s
+    """
+    n = 0
+    for rows in _keyset_batches(conn, sql, (), state["articles"], upto["articles"], batch):
+        write_parquet(articles_table(rows), _part_path(os.path.join(out_dir, "articles"), rows[0][0], rows[-1][0], "parquet"))
+        n += len(rows)
+        state["articles"] = int(rows[-1][0])
+        save_state(out_dir, state)
+    written["articles"] = n
+
+    # article_chunks
+    sql = """
+        SELECT id, article_id, chunk_index, chunk_text
+        FROM article_chunks
+        WHERE id > %s AND id <= %s
+        ORDER BY id LIMIT %s
+    """
+    n = 0
+    for rows in _keyset_batches(conn, sql, (), state["article_chunks"], upto["article_chunks"], batch):
+        write_parquet(chunks_table(rows), _part_path(os.path.join(out_dir, "article_chunks"), rows[0][0], rows[-1][0], "parquet"))
+        n += len(rows)
+        state["article_chunks"] = int(rows[-1][0])
+        save_state(out_dir, state)
+    written["article_chunks"] = n
+
+    # embeddings (particija per modelį, kaip ir DB)
+    sql = """
+        SELECT id, chunk_id, dims, embedding
+        FROM embeddings
+        WHERE model = %s AND id > %s AND id <= %s
+        ORDER BY id LIMIT %s
+    """
+    for model in models:
+        n = 0
+        model_dir = os.path.join(out_dir, "embeddings", f"model={model_slug(model)}")
+        after = int(state["embeddings"].get(model, 0))
+        for rows in _keyset_batches(conn, sql, (model,), after, upto[("embeddings", model)], batch):
+            dims = int(rows[0][2])
+            table = embeddings_table([r[0] for r in rows], [r[1] for r in rows], [r[3] for r in rows], dims)
+            write_arrow(table, _part_path(model_dir, rows[0][0], rows[-1][0], "arrow"))
+            n += len(rows)
+            state["embeddings"][model] = int(rows[-1][0])
+            save_state(out_dir, state)
+        written[f"embeddings[{model}]"] = n
+
+    save_state(out_dir, state)
+    for k, v in written.items():
+        log(f"[snapshot] {k}: +{v} rows")
+    return written
+
+
+# -----------------------------
+# Readers (be OLTP DB)
+# -----------------------------
+def _parts(table_dir: str, ext: str) -> List[str]:
+    if not os.path.isdir(table_dir):
+        return []
+    return sorted(os.path.join(table_dir, f) for f in os.listdir(table_dir) if f.endswith("." + ext))
+
+
+def read_table(out_dir: str, name: str, columns: Optional[List[str]] = None) -> pa.Table:
+    """
+    articles / article_chunks -> vienas pa.Table (tik nurodyti stulpeliai; parquet skaito tik juos).
+    """
+    schema = ARTICLES_SCHEMA if name == "articles" else CHUNKS_SCHEMA
+    parts = _parts(os.path.join(out_dir, name), "parquet")
+    if not parts:
+        return schema.empty_table().select(columns) if columns else schema.empty_table()
+    return pa.concat_tables([pq.read_table(p, columns=columns) for p in parts])
+
+
+def iter_embeddings(out_dir: str, model_name: str) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    (ids, chunk_ids, vectors (n, dims) float32) kiekvienam part failui. Failas memory-mapped,
+    masyvai – view'ai į tą patį mmap (be kopijos); galioja tol, kol laikoma nuoroda.
+    """
+    for path in _parts(os.path.join(out_dir, "embeddings", f"model={model_slug(model_name)}"), "arrow"):
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        for b in table.to_batches():
+            emb = b.column(2)
+            dims = emb.type.list_size
+            vectors = emb.values.to_numpy(zero_copy_only=True).reshape(-1, dims)
+            yield (
+                b.column(0).to_numpy(zero_copy_only=True),
+                b.column(1).to_numpy(zero_copy_only=True),
+                vectors,
+            )
+
+
+def _section(url: str) -> str:
+    # == SUBSTRING_INDEX(SUBSTRING_INDEX(canonical_url, '/', 5), '/', -2) search.load_index užklausoje
+    return "/".join(url.split("/")[:5][-2:])
+
+
+def load_search_index(
+    out_dir: str, model_name: str, limit: int = 0, verbose: bool = True, after_id: int = 0
+) -> Optional[SearchIndex]:
+    """
+    search.load_index atitikmuo iš snapshot'o: embeddings -> chunk -> article per surūšiuotus id masyvus
+    (searchsorted), vietoj trijų lentelių JOIN'o DB. Eilutės be chunko / straipsnio praleidžiamos.
+    after_id -> tik embeddings.id > after_id (build_index.py inkrementinis režimas).
+    """
+    t0 = time.perf_counter()
+    chunks = read_table(out_dir, "article_chunks", ["id", "article_id"])
+    arts = read_table(out_dir, "articles", ["id", "published_at", "source_id", "topic_id", "canonical_url"])
+
+    chunk_ids = chunks.column("id").to_numpy()
+    chunk_order = np.argsort(chunk_ids, kind="stable")
+    chunk_sorted = chunk_ids[chunk_order]
+    chunk_article = chunks.column("article_id").to_numpy()[chunk_order]
+
+    art_ids = arts.column("id").to_numpy()
+    art_order = np.argsort(art_ids, kind="stable")
+    art_sorted = art_ids[art_order]
+    # parquet sekundžių nesaugo (grįžta timestamp[ms]) -> atgal į unix sekundes kaip TIMESTAMPDIFF
+    published = arts.column("published_at").cast(pa.timestamp("s")).cast(pa.int64()).fill_null(NO_DATE).to_numpy()[art_order]
+    source_ids = arts.column("source_id").to_numpy()[art_order]
+    topic_ids = arts.column("topic_id").fill_null(NO_ID).to_numpy()[art_order]
+    section_vocab: Dict[str, int] = {}
+    section_codes = np.asarray(
+        [section_vocab.setdefault(_section(u or ""), len(section_vocab)) for u in arts.column("canonical_url").to_pylist()],
+        dtype=np.int32,
+    )[art_order]
+
+    if chunk_sorted.size == 0 or art_sorted.size == 0:
+        return None
+    batches = [
+        (ids[ids > after_id], emb_chunk_ids[ids > after_id], vectors[ids > after_id]) if after_id else (ids, emb_chunk_ids, vectors)
+        for ids, emb_chunk_ids, vectors in iter_embeddings(out_dir, model_name)
+        if ids.size and ids[-1] > after_id
+    ]
+    total = sum(len(ids) for ids, _, _ in batches)
+    n = min(total, limit) if limit and limit > 0 else total
+    if n == 0:
+        return None
+    dims = batches[0][2].shape[1]
+
+    index = allocate_index(n, dims)
+    i = 0
+    for ids, emb_chunk_ids, vectors in batches:
+        if i >= n:
+            break
+        # chunk -> article; be atitikmens (ištrinta / dar neeksportuota) -> atmetama
+        pos = np.minimum(np.searchsorted(chunk_sorted, emb_chunk_ids), chunk_sorted.size - 1)
+        ok = chunk_sorted[pos] == emb_chunk_ids
+        article_ids = chunk_article[pos]
+        apos = np.minimum(np.searchsorted(art_sorted, article_ids), art_sorted.size - 1)
+        ok &= art_sorted[apos] == article_ids
+        rows = np.flatnonzero(ok)[: n - i]
+        m = rows.size
+        index.vectors[i:i + m] = vectors[rows]
+        index.embedding_ids[i:i + m] = ids[rows]
+        index.chunk_ids[i:i + m] = emb_chunk_ids[rows]
+        index.article_ids[i:i + m] = article_ids[rows]
+        index.published_ts[i:i + m] = published[apos[rows]]
+        index.source_ids[i:i + m] = source_ids[apos[rows]]
+        index.topic_ids[i:i + m] = topic_ids[apos[rows]]
+        index.section_codes[i:i + m] = section_codes[apos[rows]]
+        i += m
+
+    index = finalize_index(index, i, section_vocab)
+    if verbose:
+        took = time.perf_counter() - t0
+        print(
+            f"[snapshot] loaded rows={i} dims={dims} matrix_mb={index.vectors.nbytes / 1e6:.1f} "
+            f"took={took:.2f}s rows_per_s={i / max(took, 1e-9):.0f}"
+        )
+    return index
+
+
+def iter_chunk_texts(out_dir: str, after_id: int = 0, batch: int = 5000) -> Iterator[List[Tuple[int, str]]]:
+    """
+    lexical.iter_new_chunks atitikmuo: [(chunk_id, chunk_text), ...] su id > after_id, id tvarka.
+    """
+    for path in _parts(os.path.join(out_dir, "article_chunks"), "parquet"):
+        pf = pq.ParquetFile(path)
+        if pf.metadata.num_rows == 0:
+            continue
+        for b in pf.iter_batches(batch_size=batch, columns=["id", "chunk_text"]):
+            rows = [(cid, text) for cid, text in zip(b.column(0).to_pylist(), b.column(1).to_pylist()) if cid > after_id]
+            if rows:
+                yield rows
+
+
+def sync_lexical(out_dir: str, bm25, batch: int = 5000) -> int:
+    """
+    lexical.sync_index, tik chunkai iš snapshot'o (BM25Index.watermark = paskutinis chunk id).
+    """
+    added = 0
+    for rows in iter_chunk_texts(out_dir, bm25.watermark, batch):
+        for chunk_id, text in rows:
+            bm25.add(chunk_id, text)
+        added += len(rows)
+    return added
+
+
+def article_titles(out_dir: str, article_ids: np.ndarray) -> Dict[int, str]:
+    arts = read_table(out_dir, "articles", ["id", "title"])
+    wanted = set(int(x) for x in article_ids)
+    return {aid: title for aid, title in zip(arts.column("id").to_pylist(), arts.column("title").to_pylist()) if aid in wanted}
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Columnar snapshot of articles / article_chunks / embeddings (Parquet + Arrow IPC) for offline jobs.")
+    parser.add_argument("--dir", type=str, default=default_snapshot_dir(), help="Snapshot katalogas (default: $SNAPSHOT_DIR arba .snapshot)")
+    parser.add_argument("--model", action="append", default=None, help="Eksportuoti tik šitų modelių embeddingus (galima kartoti; default: visi)")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="Eilučių per part failą (default: 50000)")
+    parser.add_argument("--rebuild", action="store_true", help="Ištrinti snapshot'ą ir eksportuoti iš naujo")
+    parser.add_argument("--info", action="store_true", help="Tik parodyti watermark'us ir eilučių skaičius (be DB)")
+    args = parser.parse_args()
+
+    if args.info:
+        state = load_state(args.dir)
+        print(json.dumps(state, indent=2, ensure_ascii=False))
+        for name in ("articles", "article_chunks"):
+            print(f"{name}\t{sum(pq.ParquetFile(p).metadata.num_rows for p in _parts(os.path.join(args.dir, name), 'parquet'))}")
+        for model in state["embeddings"]:
+            print(f"embeddings[{model}]\t{sum(len(ids) for ids, _, _ in iter_embeddings(args.dir, model))}")
+        return
+
+    required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+    missing = [k for k in required_env if not os.environ.get(k)]
+    if missing:
+        raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+
+    if args.rebuild and os.path.isdir(args.dir):
+        import shutil
+
+        shutil.rmtree(args.dir)
+
+    t0 = time.perf_counter()
+    conn = db_connect()
+    try:
+        export(conn, args.dir, models=args.model, batch=args.batch)
+    finally:
+        conn.close()
+    print(f"[snapshot] done. dir={args.dir} took={time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
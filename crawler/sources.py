@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import argparse
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import pymysql
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+
+# -----------------------------
+# LRT (source_id=1) – buvę hardcoded lrt_queue.py nustatymai; 008 migracija juos įrašo į sources
+# -----------------------------
+LRT_BASE_URL = "https://www.lrt.lt"
+
+# ✅ LRT SOURCE WHITELIST (tik šitos šaknys)
+LRT_ALLOWED_ROOTS = [
+    "https://www.lrt.lt/naujienos/lietuvoje",
+    "https://www.lrt.lt/naujienos/verslas",
+    "https://www.lrt.lt/naujienos/pasaulyje",
+    "https://www.lrt.lt/naujienos/mokslas-ir-it",
+]
+
+# root -> urls.scope (sekcija), skaičiuojama enqueue metu
+LRT_SCOPES = {root: root.rstrip("/").rsplit("/", 1)[-1] for root in LRT_ALLOWED_ROOTS}
+
+# ✅ URL blacklist (papildomas filtras – net jei kur nors praslystų linkai)
+BAD_URL_SUBSTRINGS = (
+    "/sportas", "/kultura", "/gyvenimas", "/pramogos",
+    "/video", "/fotogalerija", "/tiesiogiai", "/live", "/muzika",
+    "/tavo-lrt", "/eismas", "/verslo-pozicija", "/sveikata",
+    "/laisvalaikis", "/svietimas", "/nuomones",
+)
+
+# sources.extract_rules: trūkstami raktai imami iš čia
+DEFAULT_EXTRACT = {
+    "container": "article",                      # puslapis be šito elemento – ne straipsnis
+    "title": "article h1::text, h1::text",
+    "text": "article p::text",
+    "min_chars": 300,
+    "skip": ["/fotogalerija", "/video", "/tiesiogiai", "/live"],
+    "default_author": None,
+}
+
+LRT_URL_RULES = {"roots": LRT_SCOPES, "deny": list(BAD_URL_SUBSTRINGS), "refetch_min": 15}
+LRT_EXTRACT_RULES = {"default_author": "LRT.lt"}
+
+DEFAULT_MIN_DELAY_MS = 1000
+DEFAULT_REFETCH_MIN = 15
+
+
+def db_connect():
+    return pymysql.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        database=os.environ["DB_NAME"],
+        charset="utf8mb4",
+        autocommit=True,
+    )
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+@dataclass
+class Source:
+    """
+    Viena sources eilutė: URL taisyklės (roots -> scope, deny), ištraukimo selektoriai, politeness.
+    urls.scope reikšmės turi būti unikalios per visus šaltinius (claim eina per scope).
+    """
+    id: int
+    name: str
+    domain: str
+    base_url: str
+    roots: Dict[str, str]                       # absoliutus root URL -> urls.scope
+    deny: List[str] = field(default_factory=list)
+    extract: Dict[str, Any] = field(default_factory=lambda: dict(DEFAULT_EXTRACT))
+    min_delay_ms: int = DEFAULT_MIN_DELAY_MS
+    max_concurrency: int = 1
+    refetch_min: int = DEFAULT_REFETCH_MIN
+    enabled: bool = True
+
+    @property
+    def scopes(self) -> List[str]:
+        return list(dict.fromkeys(self.roots.values()))
+
+    @property
+    def slot(self) -> str:
+        # Scrapy download slot: delay / concurrency per šaltinį, ne per host'ą
+        return f"source-{self.id}"
+
+    def rebase(self, base_url: str) -> "Source":
+        """
+        Tos pačios taisyklės kitam host'ui (pvz. bench_e2e fixture site): roots prefiksas pakeičiamas.
+        """
+        base_url = base_url.rstrip("/")
+        roots = {base_url + root[len(self.base_url):]: scope for root, scope in self.roots.items()}
+        return replace(self, base_url=base_url, roots=roots)
+
+
+def _json(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def source_from_row(row: Tuple) -> Source:
+    sid, name, domain, base_url, url_rules, extract_rules, min_delay_ms, max_concurrency, enabled = row
+    rules = _json(url_rules, {})
+    extract = dict(DEFAULT_EXTRACT)
+    extract.update(_json(extract_rules, {}))
+    return Source(
+        id=int(sid),
+        name=name,
+        domain=domain,
+        base_url=(base_url or f"https://www.{domain}").rstrip("/"),
+        roots=dict(rules.get("roots") or {}),
+        deny=list(rules.get("deny") or []),
+        extract=extract,
+        min_delay_ms=int(min_delay_ms if min_delay_ms is not None else DEFAULT_MIN_DELAY_MS),
+        max_concurrency=max(1, int(max_concurrency or 1)),
+        refetch_min=int(rules.get("refetch_min") or DEFAULT_REFETCH_MIN),
+        enabled=bool(enabled),
+    )
+
+
+def load_sources(conn, names: Optional[Iterable[str]] = None, include_disabled: bool = False) -> List[Source]:
+    """
+    Šaltiniai iš sources lentelės (id tvarka). names: filtras pagal name arba domain (case-insensitive).
+    Šaltiniai be roots praleidžiami – jiems nėra ką crawlinti.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT id, name, domain, base_url, url_rules, extract_rules, min_delay_ms, max_concurrency, enabled
+            FROM sources
+            ORDER BY id
+            """
+        )
+        out = [source_from_row(r) for r in cur.fetchall()]
+
+    if names:
+        wanted = {n.strip().lower() for n in names if n and n.strip()}
+        out = [s for s in out if s.name.lower() in wanted or s.domain.lower() in wanted]
+    if not include_disabled:
+        out = [s for s in out if s.enabled]
+    return [s for s in out if s.roots]
+
+
+# -----------------------------
+# URL matcher
+# -----------------------------
+class UrlMatcher:
+    """
+    URL -> (Source, scope) visiems šaltiniams vienu metu.
+    scheme://host -> dict lookup; to host'o root keliai -> vienas sukompiliuotas regex
+    (ilgiausi pirma, named group = kuris root); deny -> vienas regex per šaltinį.
+    Kaina nepriklauso nuo šaltinių skaičiaus (tik nuo vieno host'o roots).
+    """
+
+    def __init__(self, sources: Iterable[Source]):
+        self.sources = list(sources)
+        self._hosts: Dict[str, Tuple[re.Pattern, Dict[str, Tuple[Source, str]]]] = {}
+        self._deny: Dict[int, Optional[re.Pattern]] = {}
+
+        scope_owner: Dict[str, str] = {}
+        by_host: Dict[str, List[Tuple[str, Source, str]]] = {}
+        for src in self.sources:
+            self._deny[src.id] = re.compile("|".join(re.escape(d) for d in src.deny)) if src.deny else None
+            for root, scope in src.roots.items():
+                owner = scope_owner.setdefault(scope, src.name)
+                if owner != src.name:
+                    raise ValueError(f"scope '{scope}' is used by both {owner} and {src.name}")
+                host, path = self.split_url(root)
+                if host is None:
+                    raise ValueError(f"{src.name}: root must be an absolute http(s) URL, got {root!r}")
+                by_host.setdefault(host, []).append((path, src, scope))
+
+        for host, entries in by_host.items():
+            entries.sort(key=lambda e: -len(e[0]))
+            groups, targets = [], {}
+            for i, (path, src, scope) in enumerate(entries):
+                groups.append(f"(?P<r{i}>{re.escape(path)})")
+                targets[f"r{i}"] = (src, scope)
+            self._hosts[host] = (re.compile("|".join(groups)), targets)
+
+    @staticmethod
+    def split_url(url: str) -> Tuple[Optional[str], str]:
+        # "https://Host/a/b" -> ("https://host", "/a/b"); be urlsplit (karštas kelias)
+        parts = url.split("/", 3)
+        if len(parts) < 3 or parts[1] != "" or parts[0] not in ("http:", "https:"):
+            return None, ""
+        return f"{parts[0]}//{parts[2].lower()}", "/" + (parts[3] if len(parts) == 4 else "")
+
+    def match(self, url: str) -> Optional[Tuple[Source, str]]:
+        host, path = self.split_url(url)
+        entry = self._hosts.get(host) if host else None
+        if entry is None:
+            return None
+        rx, targets = entry
+        m = rx.match(path)
+        if m is None:
+            return None
+        src, scope = targets[m.lastgroup]
+        deny = self._deny[src.id]
+        if deny is not None and deny.search(url):
+            return None
+        return src, scope
+
+    def scope(self, url: str) -> Optional[str]:
+        hit = self.match(url)
+        return hit[1] if hit else None
+
+
+# -----------------------------
+# Link extraction / canonicalization
+# -----------------------------
+# query parametrai, kurie nekeičia turinio (tas pats straipsnis iš skirtingų kampanijų / share mygtukų)
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "igshid", "twclid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "ref_src", "ref_url", "spm", "share",
+})
+TRACKING_PREFIXES = ("utm_",)
+_SKIP_SCHEMES = ("mailto:", "javascript:", "tel:", "data:", "sms:", "whatsapp:", "viber:")
+
+
+def _is_tracking(param: str) -> bool:
+    key = param.split("=", 1)[0].lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Kanoninis URL forma urls.url_hash'ui: be #fragmento, be tracking parametrų (utm_*, fbclid, ...),
+    host mažosiomis, be default porto, be galinio "/" (ir "https://x.lt/" -> "https://x.lt").
+    Likusių parametrų tvarka nekeičiama (kai kuriems portalams ji reikšminga).
+    """
+    url = url.partition("#")[0]
+    query = ""
+    if "?" in url:
+        url, _, query = url.partition("?")
+        if query:
+            query = "&".join(p for p in query.split("&") if p and not _is_tracking(p))
+
+    scheme, sep, rest = url.partition("://")
+    if sep:
+        host, slash, path = rest.partition("/")
+        scheme = scheme.lower()
+        host = host.lower()
+        if (scheme == "https" and host.endswith(":443")) or (scheme == "http" and host.endswith(":80")):
+            host = host.rsplit(":", 1)[0]
+        url = f"{scheme}://{host}{(slash + path).rstrip('/')}"
+    return f"{url}?{query}" if query else url
+
+
+def url_origin(url: str) -> str:
+    # "https://host/a/b?c" -> "https://host"
+    parts = url.split("/", 3)
+    return "/".join(parts[:3]) if len(parts) >= 3 else url
+
+
+def extract_links(base_url: str, hrefs: Iterable[str], matcher: UrlMatcher) -> List[Tuple[str, Source, str]]:
+    """
+    <a href> sąrašas -> unikalūs (tvarka išlaikoma) kanoniniai URL, kuriuos priima matcher: [(url, source, scope)].
+    Dažni atvejai (absoliutus http(s), "/kelias") be urljoin; kiti (santykiniai, "//host", "..")
+    per urllib.parse.urljoin. base_url: puslapio bazė (Scrapy get_base_url(response), t.y. su <base>).
+    """
+    origin = url_origin(base_url)
+    seen: Dict[str, Optional[Tuple[Source, str]]] = {}
+    for href in hrefs:
+        if not href:
+            continue
+        href = href.strip()
+        if not href or href[0] == "#":
+            continue
+        if href.startswith(("https://", "http://")):
+            url = href
+        elif href[0] == "/" and not href.startswith("//"):
+            url = origin + href
+        elif href.lower().startswith(_SKIP_SCHEMES):
+            continue
+        else:
+            url = urljoin(base_url, href)
+
+        url = canonicalize_url(url)
+        if url not in seen:
+            seen[url] = matcher.match(url)
+    return [(url, hit[0], hit[1]) for url, hit in seen.items() if hit is not None]
+
+
+# -----------------------------
+# Admin
+# -----------------------------
+def add_source(
+    conn,
+    name: str,
+    domain: str,
+    base_url: str,
+    roots: Dict[str, str],
+    deny: List[str],
+    extract: Dict[str, Any],
+    min_delay_ms: int,
+    max_concurrency: int,
+    refetch_min: int,
+) -> int:
+    url_rules = {"roots": roots, "deny": deny, "refetch_min": refetch_min}
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO sources (name, domain, base_url, url_rules, extract_rules, min_delay_ms, max_concurrency, enabled)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 1)
+            ON DUPLICATE KEY UPDATE
+              name = VALUES(name),
+              base_url = VALUES(base_url),
+              url_rules = VALUES(url_rules),
+              extract_rules = VALUES(extract_rules),
+              min_delay_ms = VALUES(min_delay_ms),
+              max_concurrency = VALUES(max_concurrency)
+            """,
+            (name, domain, base_url, json.dumps(url_rules), json.dumps(extract), min_delay_ms, max_concurrency),
+        )
+        cur.execute("SELECT id FROM sources WHERE domain = %s", (domain,))
+        return int(cur.fetchone()[0])
+
+
+def seed_entrypoints(conn, src: Source, priority: int = 10) -> int:
+    """
+    Kiekvienas root -> entrypoint URL (priority >= 10 -> periodiškai perskaitomas).
+    """
+    rows = [(src.id, root, root, priority, scope) for root, scope in src.roots.items()]
+    with conn.cursor() as cur:
+        cur.executemany(
+            """
+            INSERT IGNORE INTO urls (source_id, url, url_hash, status, priority, scope)
+            VALUES (%s, %s, UNHEX(MD5(%s)), 'queued', %s, %s)
+            """,
+            rows,
+        )
+        return cur.rowcount
+
+
+def _parse_root(value: str) -> Tuple[str, str]:
+    # "https://x.lt/verslas=x-verslas" arba be "=" -> scope = paskutinis kelio segmentas
+    root, _, scope = value.partition("=")
+    return root.rstrip("/"), scope or root.rstrip("/").rsplit("/", 1)[-1]
+
+
+# -----------------------------
+# Main
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Crawl source registry (sources table): list / add / seed / enable / disable.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("list", help="Parodyti šaltinius ir jų taisykles")
+
+    p = sub.add_parser("add", help="Pridėti / atnaujinti šaltinį (pagal domain)")
+    p.add_argument("name")
+    p.add_argument("--domain", required=True, help="pvz. delfi.lt")
+    p.add_argument("--base-url", default=None, help="Default: https://www.<domain>")
+    p.add_argument("--root", action="append", required=True, help="Root URL[=scope]; galima kartoti. scope turi būti unikalus per visus šaltinius")
+    p.add_argument("--deny", action="append", default=[], help="URL substring, kurio neimti (galima kartoti)")
+    p.add_argument("--title", default=None, help="CSS selektorius antraštei")
+    p.add_argument("--text", default=None, help="CSS selektorius pastraipoms")
+    p.add_argument("--container", default=None, help="CSS elementas, be kurio puslapis nelaikomas straipsniu")
+    p.add_argument("--default-author", default=None)
+    p.add_argument("--delay-ms", type=int, default=DEFAULT_MIN_DELAY_MS, help="Min. tarpas tarp užklausų šitam šaltiniui")
+    p.add_argument("--concurrency", type=int, default=1, help="Kiek lygiagrečių užklausų šitam šaltiniui")
+    p.add_argument("--refetch-min", type=int, default=DEFAULT_REFETCH_MIN, help="Entrypoint'ų perskaitymo intervalas")
+    p.add_argument("--seed", action="store_true", help="Iškart įdėti roots kaip entrypoint'us")
+
+    p = sub.add_parser("seed", help="Įdėti šaltinio roots į urls kaip entrypoint'us")
+    p.add_argument("name")
+
+    for cmd in ("enable", "disable"):
+        p = sub.add_parser(cmd, help=f"{cmd} šaltinį")
+        p.add_argument("name")
+    args = parser.parse_args()
+
+    required_env = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+    missing = [k for k in required_env if not os.environ.get(k)]
+    if missing:
+        raise SystemExit(f"Missing env vars: {', '.join(missing)}")
+
+    conn = db_connect()
+    try:
+        if args.cmd == "list":
+            for s in load_sources(conn, include_disabled=True):
+                state = "" if s.enabled else " [disabled]"
+                print(f"{s.id}\t{s.name}\t{s.base_url}\tdelay={s.min_delay_ms}ms concurrency={s.max_concurrency}{state}")
+                for root, scope in s.roots.items():
+                    print(f"  {scope}\t{root}")
+        elif args.cmd == "add":
+            extract = {
+                k: v
+                for k, v in {
+                    "title": args.title,
+                    "text": args.text,
+                    "container": args.container,
+                    "default_author": args.default_author,
+                }.items()
+                if v is not None
+            }
+            new = Source(
+                id=0,
+                name=args.name,
+                domain=args.domain,
+                base_url=(args.base_url or f"https://www.{args.domain}").rstrip("/"),
+                roots=dict(_parse_root(r) for r in args.root),
+                deny=args.deny,
+                min_delay_ms=args.delay_ms,
+                max_concurrency=args.concurrency,
+                refetch_min=args.refetch_min,
+            )
+            # validacija prieš įrašant: scope konfliktai su kitais šaltiniais, ne absoliutūs roots
+            others = [s for s in load_sources(conn, include_disabled=True) if s.domain != args.domain]
+            try:
+                UrlMatcher(others + [new])
+            except ValueError as e:
+                raise SystemExit(f"[sources] {e}")
+            sid = add_source(
+                conn,
+                name=new.name,
+                domain=new.domain,
+                base_url=new.base_url,
+                roots=new.roots,
+                deny=new.deny,
+                extract=extract,
+                min_delay_ms=new.min_delay_ms,
+                max_concurrency=new.max_concurrency,
+                refetch_min=new.refetch_min,
+            )
+            print(f"[sources] {args.name} -> id={sid}")
+            if args.seed:
+                (src,) = load_sources(conn, [args.domain], include_disabled=True)
+                print(f"[sources] seeded {seed_entrypoints(conn, src)} entrypoints")
+        elif args.cmd == "seed":
+            found = load_sources(conn, [args.name], include_disabled=True)
+            if not found:
+                raise SystemExit(f"Unknown source or no roots: {args.name}")
+            print(f"[sources] seeded {seed_entrypoints(conn, found[0])} entrypoints")
+        else:
+            with conn.cursor() as cur:
+                n = cur.execute(
+                    "UPDATE sources SET enabled = %s WHERE LOWER(name) = LOWER(%s) OR domain = %s",
+                    (int(args.cmd == "enable"), args.name, args.name),
+                )
+            print(f"[sources] {args.cmd}d {n} source(s)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
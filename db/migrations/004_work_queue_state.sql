@@ -0,0 +1,35 @@
+-- Darbo eilių būsena: chunkeris / embedderis randa kitą paketą per indeksuotą range scan,
+-- o ne per LEFT JOIN ... IS NULL nuo lentelės pradžios.
+-- Idempotentiška (IF NOT EXISTS), todėl galima paleisti ir ant esamos DB.
+
+-- 0 = laukia chunkinimo, 1 = sukapota, 2 = nėra ką kapoti (tuščias tekstas / 0 chunkų)
+ALTER TABLE articles
+  ADD COLUMN IF NOT EXISTS chunk_status TINYINT NOT NULL DEFAULT 0,
+  ADD INDEX IF NOT EXISTS ix_articles_chunk_status (chunk_status, id);
+
+UPDATE articles a
+SET a.chunk_status = 1
+WHERE a.chunk_status = 0
+  AND EXISTS (SELECT 1 FROM article_chunks c WHERE c.article_id = a.id);
+
+-- Per-model embedderio progresas: visi article_chunks.id <= last_chunk_id jau apdoroti.
+-- shard / shards: kai keli embedder workeriai dalinasi chunkus pagal id % shards.
+CREATE TABLE IF NOT EXISTS embedding_watermarks (
+  model VARCHAR(255) NOT NULL,
+  shards INT NOT NULL DEFAULT 1,
+  shard INT NOT NULL DEFAULT 0,
+  last_chunk_id BIGINT NOT NULL DEFAULT 0,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (model, shards, shard)
+) CHARACTER SET utf8mb4;
+
+-- esamiems modeliams: watermark = ilgiausias ištisinis jau embedintų chunkų prefiksas
+INSERT IGNORE INTO embedding_watermarks (model, shards, shard, last_chunk_id)
+SELECT m.model, 1, 0,
+       COALESCE((
+         SELECT MIN(c.id) - 1
+         FROM article_chunks c
+         LEFT JOIN embeddings e ON e.chunk_id = c.id AND e.model = m.model
+         WHERE e.id IS NULL
+       ), (SELECT COALESCE(MAX(id), 0) FROM article_chunks))
+FROM (SELECT DISTINCT model FROM embeddings) m;
@@ -0,0 +1,27 @@
+-- URL claim per indeksą: urls.scope = leidžiama sekcija (žr. LrtQueueSpider._url_scope),
+-- NULL = out-of-scope (niekada neklaimina). Vietoj url LIKE 'root%' OR ... per TEXT stulpelį
+-- + filesort per visas queued eilutes, claim daro po vieną LIMIT 1 index range scan kiekvienam scope.
+-- Idempotentiška (IF NOT EXISTS), todėl galima paleisti ir ant esamos DB.
+
+ALTER TABLE urls
+  ADD COLUMN IF NOT EXISTS scope VARCHAR(64) NULL,
+  ADD INDEX IF NOT EXISTS ix_urls_claim (status, scope, priority DESC, id, next_fetch_at);
+
+-- backfill: ta pati logika kaip _url_scope (root prefiksas + BAD_URL_SUBSTRINGS)
+UPDATE urls
+SET scope = CASE
+  WHEN url LIKE 'https://www.lrt.lt/naujienos/lietuvoje%' THEN 'lietuvoje'
+  WHEN url LIKE 'https://www.lrt.lt/naujienos/verslas%' THEN 'verslas'
+  WHEN url LIKE 'https://www.lrt.lt/naujienos/pasaulyje%' THEN 'pasaulyje'
+  WHEN url LIKE 'https://www.lrt.lt/naujienos/mokslas-ir-it%' THEN 'mokslas-ir-it'
+END
+WHERE scope IS NULL
+  AND url LIKE 'https://www.lrt.lt/naujienos/%'
+  AND url NOT LIKE '%/sportas%' AND url NOT LIKE '%/kultura%'
+  AND url NOT LIKE '%/gyvenimas%' AND url NOT LIKE '%/pramogos%'
+  AND url NOT LIKE '%/video%' AND url NOT LIKE '%/fotogalerija%'
+  AND url NOT LIKE '%/tiesiogiai%' AND url NOT LIKE '%/live%'
+  AND url NOT LIKE '%/muzika%' AND url NOT LIKE '%/tavo-lrt%'
+  AND url NOT LIKE '%/eismas%' AND url NOT LIKE '%/verslo-pozicija%'
+  AND url NOT LIKE '%/sveikata%' AND url NOT LIKE '%/laisvalaikis%'
+  AND url NOT LIKE '%/svietimas%' AND url NOT LIKE '%/nuomones%';
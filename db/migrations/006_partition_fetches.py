@@ -0,0 +1,37 @@
+"""
+fetches -> RANGE COLUMNS(created_at) dienos particijos (retention = DROP PARTITION, žr. partitions.py).
+
+Particijuota InnoDB lentelė negali turėti FOREIGN KEY, o kiekvienas UNIQUE raktas turi apimti
+particijavimo stulpelį: fk_fetches_url nuimamas, PK (id) -> (id, created_at).
+Perstatoma per shadow_swap (spider'is gali toliau rašyti).
+"""
+import os
+from datetime import datetime, timedelta
+
+from migrate import shadow_swap
+from partitions import FETCH_AHEAD_DAYS, fetch_partition_clause, is_partitioned
+
+# kiek paskutinių dienų gauna savo particijas iškart; visa kas senesnė -> p_history
+HISTORY_DAYS = 7
+
+
+def up(conn, log):
+    if is_partitioned(conn, "fetches"):
+        log("[migrate] fetches already partitioned, skipping")
+        return
+
+    today = datetime.utcnow().date()
+    clause = fetch_partition_clause(
+        today - timedelta(days=HISTORY_DAYS),
+        today + timedelta(days=int(os.environ.get("FETCH_AHEAD_DAYS") or FETCH_AHEAD_DAYS)),
+    )
+    shadow_swap(
+        conn,
+        "fetches",
+        [
+            "ALTER TABLE {shadow} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)",
+            "ALTER TABLE {shadow} " + clause,
+        ],
+        batch=5_000,
+        log=log,
+    )
@@ -0,0 +1,35 @@
+"""
+embeddings -> LIST COLUMNS(model): viena particija per modelį + p_default (DEFAULT).
+Per-model skenavimas (search.load_index, embedder) skaito tik savo particiją, o seno modelio
+išvalymas = DROP PARTITION (partitions.py drop-model), o ne DELETE per milijonus eilučių.
+
+fk_embeddings_chunk nuimamas (particijuotos lentelės FK nepalaiko), PK (id) -> (id, model);
+uq_embeddings_chunk_model jau apima model. Perstatoma per shadow_swap.
+"""
+import os
+
+from migrate import shadow_swap
+from partitions import embedding_partition_clause, is_partitioned
+
+
+def up(conn, log):
+    if is_partitioned(conn, "embeddings"):
+        log("[migrate] embeddings already partitioned, skipping")
+        return
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT DISTINCT model FROM embeddings")
+        models = [r[0] for r in cur.fetchall()]
+    if os.environ.get("EMBED_MODEL"):
+        models.append(os.environ["EMBED_MODEL"])
+
+    shadow_swap(
+        conn,
+        "embeddings",
+        [
+            "ALTER TABLE {shadow} DROP PRIMARY KEY, ADD PRIMARY KEY (id, model)",
+            "ALTER TABLE {shadow} " + embedding_partition_clause(conn, models),
+        ],
+        batch=2_000,
+        log=log,
+    )
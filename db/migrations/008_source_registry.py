@@ -0,0 +1,37 @@
+"""
+sources -> crawl registry: per-šaltinio URL taisyklės (roots -> urls.scope, deny substrings,
+entrypoint refetch), ištraukimo selektoriai ir politeness (min_delay_ms, max_concurrency).
+news_queue spider'is crawlina visus enabled šaltinius vienu metu; naujas portalas =
+nauja sources eilutė (sources.py add), o ne naujas spider'is.
+
+LRT (id=1) gauna iki šiol lrt_queue.py hardcoded taisykles, todėl esami urls.scope nesikeičia.
+"""
+import json
+
+from sources import LRT_BASE_URL, LRT_EXTRACT_RULES, LRT_URL_RULES
+
+
+def up(conn, log):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            ALTER TABLE sources
+              ADD COLUMN IF NOT EXISTS base_url VARCHAR(255) NULL,
+              ADD COLUMN IF NOT EXISTS url_rules JSON NULL,
+              ADD COLUMN IF NOT EXISTS extract_rules JSON NULL,
+              ADD COLUMN IF NOT EXISTS min_delay_ms INT NOT NULL DEFAULT 1000,
+              ADD COLUMN IF NOT EXISTS max_concurrency INT NOT NULL DEFAULT 1,
+              ADD COLUMN IF NOT EXISTS enabled TINYINT(1) NOT NULL DEFAULT 1
+            """
+        )
+        # senas spider'is: AUTOTHROTTLE_START_DELAY=0.5, viena užklausa vienu metu
+        n = cur.execute(
+            """
+            UPDATE sources
+            SET base_url = %s, url_rules = %s, extract_rules = %s, min_delay_ms = 500, max_concurrency = 1
+            WHERE id = 1 AND url_rules IS NULL
+            """,
+            (LRT_BASE_URL, json.dumps(LRT_URL_RULES), json.dumps(LRT_EXTRACT_RULES)),
+        )
+    if n:
+        log("[migrate] sources: LRT rules moved from lrt_queue.py into sources")
@@ -0,0 +1,18 @@
+-- Near-duplicate straipsniai (neardup.py): articles.simhash = 64 bitų SimHash per žodžių bigramas,
+-- article_simhash_bands = LSH indeksas (4 juostos po 16 bitų). Hamming <= 3 -> bent viena juosta
+-- sutampa, todėl kandidatai randami per PK lookup'us, o ne skenuojant visus straipsnius.
+-- Dublikatas įrašomas su duplicate_of = originalas ir chunk_status = 3 (chunkeris / embedderis jo neima).
+-- Idempotentiška (IF NOT EXISTS), todėl galima paleisti ir ant esamos DB.
+
+ALTER TABLE articles
+  ADD COLUMN IF NOT EXISTS simhash BIGINT UNSIGNED NULL,
+  ADD COLUMN IF NOT EXISTS duplicate_of BIGINT NULL,
+  ADD INDEX IF NOT EXISTS ix_articles_duplicate_of (duplicate_of);
+
+CREATE TABLE IF NOT EXISTS article_simhash_bands (
+  band TINYINT UNSIGNED NOT NULL,
+  band_value SMALLINT UNSIGNED NOT NULL,
+  article_id BIGINT NOT NULL,
+  PRIMARY KEY (band, band_value, article_id),
+  KEY ix_simhash_bands_article (article_id)
+) CHARACTER SET utf8mb4;
@@ -0,0 +1,28 @@
+-- Embedding modelių registras (reembed.py): kuris modelis aptarnauja paiešką ir kiek pažengęs
+-- naujo modelio perembedinimas.
+--   state: serving (paieška naudoja šitą; vienas) / migrating (backfill'inamas) / retired
+--   backfill_upto: paskutinis chunk id, kurį perembedina backfill; virš jo – live embedderio darbas
+--   backfill_chunk_id: iki kur (imtinai) backfill jau nuėjo
+--   switch_coverage: kai embedintų chunkų dalis >= šitos, modelis atomiškai tampa serving
+-- Idempotentiška (IF NOT EXISTS), todėl galima paleisti ir ant esamos DB.
+
+CREATE TABLE IF NOT EXISTS embedding_models (
+  model VARCHAR(255) NOT NULL,
+  state VARCHAR(16) NOT NULL DEFAULT 'migrating',
+  backfill_upto BIGINT NOT NULL DEFAULT 0,
+  backfill_chunk_id BIGINT NOT NULL DEFAULT 0,
+  switch_coverage DOUBLE NOT NULL DEFAULT 0.99,
+  coverage DOUBLE NULL,
+  started_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  switched_at DATETIME NULL,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (model),
+  KEY ix_embedding_models_state (state)
+) CHARACTER SET utf8mb4;
+
+-- vienintelis jau embedinamas modelis -> serving (kai modelių keli, serving nustato orchestrator / reembed.py)
+INSERT IGNORE INTO embedding_models (model, state, switched_at)
+SELECT w.model, 'serving', NOW()
+FROM embedding_watermarks w
+GROUP BY w.model
+HAVING (SELECT COUNT(DISTINCT model) FROM embedding_watermarks) = 1;